@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Compare recall and memory of float32, float16 and int8 index storage on the
+configured knowledge base (run after `pip install -e .`)
+"""
+import argparse
+import os
+import sys
+
+import faiss
+import numpy as np
+
+from rag.config import Config
+from rag.context_packing import split_sentences
+from rag.embedding_pipeline import encode_batches
+from rag.hashing_embedder import HashingEmbedder
+from rag.index_factory import (
+    STORAGE_TYPES,
+    build_index,
+    recall_at_k,
+    set_search_params,
+)
+from rag.knowledge_base_file import load_documents
+
+
+def load_embedder(config):
+    """Load the configured embedding model"""
+    if HashingEmbedder.handles(config.EMBEDDING_MODEL):
+        return HashingEmbedder.from_name(config.EMBEDDING_MODEL)
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(config.EMBEDDING_MODEL)
+
+
+def encode(embedder, texts, config):
+    """Encode texts into one float32 matrix"""
+    batches = encode_batches(
+        embedder, texts, config.EMBED_BATCH_SIZE, config.EMBED_WORKERS
+    )
+    return np.concatenate([embeddings for _, embeddings in batches])
+
+
+def main():
+    """Print bytes per vector and recall@k against exact float32 search"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200, help="Queries to run")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--index-type", help="Index type (default: INDEX_TYPE)")
+    args = parser.parse_args()
+
+    config = Config()
+    kb_path = os.path.join(config.DATASET_DIR, config.KNOWLEDGE_BASE_FILE)
+    documents = list(load_documents(kb_path)[0])
+    if not documents:
+        print(f"No documents in {kb_path}")
+        return 1
+
+    embedder = load_embedder(config)
+    embeddings = encode(embedder, documents, config)
+
+    # Query with the opening sentence of a sample of documents
+    rng = np.random.default_rng(0)
+    rows = rng.choice(
+        len(documents), size=min(args.queries, len(documents)), replace=False
+    )
+    query_texts = [(split_sentences(documents[row]) or [""])[0] for row in rows]
+    queries = encode(embedder, query_texts, config)
+    k = min(args.k, len(documents))
+
+    exact = faiss.IndexFlatL2(embeddings.shape[1])
+    exact.add(embeddings)
+    _, expected = exact.search(queries, k)
+
+    index_type = args.index_type or config.INDEX_TYPE
+    print(f"{len(documents)} documents, {len(queries)} queries, {index_type} index")
+    print(f"{'storage':<10}{'bytes/vector':>14}{f'recall@{k}':>12}")
+    for storage in STORAGE_TYPES:
+        index = build_index(
+            embeddings,
+            index_type=index_type,
+            nlist=config.INDEX_NLIST,
+            hnsw_m=config.INDEX_HNSW_M,
+            ef_construction=config.INDEX_EF_CONSTRUCTION,
+            pq_m=config.INDEX_PQ_M,
+            train_size=config.INDEX_TRAIN_SIZE,
+            storage=storage,
+        )
+        index.add(embeddings)
+        set_search_params(index, config.INDEX_NPROBE, config.INDEX_EF_SEARCH)
+        _, found = index.search(queries, k)
+
+        size = faiss.serialize_index(index).nbytes / len(documents)
+        print(f"{storage:<10}{size:>14.1f}{recall_at_k(expected, found):>12.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Compare int8 dynamically quantized models with float32 on a fixed prompt set:
+model size, latency and output agreement (run after `pip install -e .`)
+"""
+import argparse
+import copy
+import sys
+import time
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+from rag.config import Config
+from rag.model_quantization import model_size, quantize_dynamic
+
+PROMPTS = [
+    "What is machine learning?",
+    "Explain the difference between supervised and unsupervised learning.",
+    "How do neural networks learn from data?",
+    "What is overfitting and how can it be prevented?",
+    "Summarize the plot of Interstellar.",
+    "Who directed Blade Runner?",
+    "What happens inside a black hole?",
+    "How far away is the Andromeda galaxy?",
+    "Why is the sky blue?",
+    "What is a light year?",
+]
+
+
+def timed(function, repeats):
+    """Result of the last call and the median seconds per call"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, float(np.median(times))
+
+
+def main():
+    """Print size, latency and agreement of float32 and int8 models"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs each")
+    parser.add_argument("--threads", type=int, help="torch CPU threads")
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    config = Config()
+    embedder = SentenceTransformer(config.EMBEDDING_MODEL, device="cpu")
+    tokenizer = AutoTokenizer.from_pretrained(config.GENERATOR_MODEL)
+    generator = AutoModelForSeq2SeqLM.from_pretrained(config.GENERATOR_MODEL)
+    generator.eval()
+    inputs = tokenizer(PROMPTS, return_tensors="pt", padding=True)
+
+    def embed(model):
+        return model.encode(PROMPTS, normalize_embeddings=True)
+
+    def generate(model):
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs, max_length=config.MAX_LENGTH, do_sample=False, num_beams=1
+            )
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    rows = []
+    results = {}
+    for precision in ("float32", "int8"):
+        if precision == "int8":
+            embedder = quantize_dynamic(copy.deepcopy(embedder))
+            generator = quantize_dynamic(copy.deepcopy(generator))
+        embeddings, embed_time = timed(lambda: embed(embedder), args.repeats)
+        answers, generate_time = timed(lambda: generate(generator), args.repeats)
+        results[precision] = (embeddings, answers)
+        size = model_size(embedder) + model_size(generator)
+        rows.append((precision, size, embed_time, generate_time))
+
+    print(f"{len(PROMPTS)} prompts, {torch.get_num_threads()} threads")
+    print(f"{'precision':<10}{'size MB':>10}{'embed ms':>11}{'generate ms':>13}")
+    for precision, size, embed_time, generate_time in rows:
+        print(
+            f"{precision:<10}{size / 1e6:>10.1f}"
+            f"{embed_time * 1e3:>11.1f}{generate_time * 1e3:>13.1f}"
+        )
+
+    reference_embeddings, reference_answers = results["float32"]
+    embeddings, answers = results["int8"]
+    similarity = np.sum(reference_embeddings * embeddings, axis=1)
+    matches = sum(a == b for a, b in zip(reference_answers, answers))
+    print(
+        f"int8 embedding cosine similarity: mean {similarity.mean():.4f}, "
+        f"min {similarity.min():.4f}"
+    )
+    print(f"int8 answers identical to float32: {matches}/{len(PROMPTS)}")
+    for prompt, reference, answer in zip(PROMPTS, reference_answers, answers):
+        if reference != answer:
+            print(f"- {prompt}\n  float32: {reference}\n  int8:    {answer}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
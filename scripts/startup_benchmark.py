@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Guard CLI start-up latency: time `import rag`, `rag --help` and
+`rag --version` under `python -X importtime` and fail if they import a heavy
+dependency or exceed the time budget (run after `pip install -e .`)
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules that only the engine needs; none may load for --help / --version
+HEAVY_MODULES = (
+    "faiss",
+    "numpy",
+    "onnxruntime",
+    "optimum",
+    "rich",
+    "sentence_transformers",
+    "torch",
+    "transformers",
+)
+
+COMMANDS = {
+    "import rag": ["-c", "import rag"],
+    "rag --help": ["-c", "import sys, rag; sys.argv = ['rag', '--help']; rag.main()"],
+    "rag --version": [
+        "-c",
+        "import sys, rag; sys.argv = ['rag', '--version']; rag.main()",
+    ],
+}
+
+
+def parse_importtime(stderr):
+    """(module, cumulative microseconds) for each -X importtime line"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        imports.append((name.strip(), int(cumulative)))
+    return imports
+
+
+def measure(args, repeats):
+    """Median wall time in ms and the modules imported by one command"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], capture_output=True, check=False)
+        times.append((time.perf_counter() - start) * 1e3)
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return statistics.median(times), parse_importtime(result.stderr)
+
+
+def main():
+    """Print start-up times and return 1 if a command breaks the budget"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs each")
+    parser.add_argument(
+        "--max-ms", type=float, default=300.0, help="Wall time budget per command"
+    )
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports shown")
+    args = parser.parse_args()
+
+    failed = False
+    for label, command in COMMANDS.items():
+        wall_ms, imports = measure(command, args.repeats)
+        heavy = sorted(
+            {name for name, _ in imports if name.split(".")[0] in HEAVY_MODULES}
+        )
+        over_budget = wall_ms > args.max_ms
+        status = "FAIL" if heavy or over_budget else "ok"
+        print(f"{status:<5}{label:<16}{wall_ms:>8.1f} ms")
+        for name, cumulative in sorted(imports, key=lambda i: -i[1])[: args.top]:
+            print(f"       {cumulative / 1e3:>8.1f} ms  {name}")
+        if heavy:
+            print(f"       heavy imports: {', '.join(heavy)}")
+        failed = failed or status == "FAIL"
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
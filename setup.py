@@ -39,6 +39,10 @@ setup(
             "pytest-cov>=4.0.0",
             "pytest-mock>=3.10.0",
         ],
+        "onnx": [
+            "onnxruntime>=1.17.0",
+            "optimum[onnxruntime]>=1.20.0",
+        ],
         "dev": [
             "black>=23.0.0",
             "flake8>=6.0.0",
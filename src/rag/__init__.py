@@ -1,10 +1,12 @@
+import functools
 import logging
 import os
-import subprocess
-from importlib.metadata import PackageNotFoundError, version
+import sys
+from types import ModuleType
 from typing import Optional
 
 # Import main at the top to avoid E402, but use a different name to avoid circular imports
+# (the CLI module is light; the engine and its dependencies load on first use)
 from .__main__ import main as _main  # noqa: F401
 
 # Set up logging
@@ -20,6 +22,8 @@ def get_version_from_git() -> Optional[str]:
     Returns:
         Optional[str]: Version string (without 'v' prefix) or None if not available.
     """
+    import subprocess
+
     try:
         # Check if we're in a git repository
         if not os.path.exists(".git") and not os.environ.get("GIT_DIR"):
@@ -53,20 +57,42 @@ def get_version_from_git() -> Optional[str]:
     return None
 
 
-# Allow version to be overridden by environment variable
-__version__ = os.environ.get("RAG_VERSION")
+@functools.lru_cache(maxsize=None)
+def _resolve_version() -> str:
+    """Version from RAG_VERSION, the latest git tag or the package metadata"""
+    # Allow version to be overridden by environment variable
+    resolved = os.environ.get("RAG_VERSION")
+    if resolved:
+        return resolved
 
-if not __version__:
     # First try to get version from git tag (for development and releases)
-    __version__ = get_version_from_git()
+    resolved = get_version_from_git()
+    if resolved:
+        return resolved
 
     # If not in a git repo or no tags, fall back to package metadata
-    if not __version__:
-        try:
-            __version__ = version("rag")
-        except PackageNotFoundError:
-            # Fallback for development installs without package metadata
-            __version__ = "0.0.0-dev"
-            logger.debug("Using development version (0.0.0-dev)")
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("rag")
+    except PackageNotFoundError:
+        # Fallback for development installs without package metadata
+        logger.debug("Using development version (0.0.0-dev)")
+        return "0.0.0-dev"
+
+
+class _Package(ModuleType):
+    """The rag package, with a version resolved on first access"""
+
+    @property
+    def __version__(self) -> str:
+        """Package version, looked up lazily so importing rag never runs git"""
+        return _resolve_version()
+
+
+# The property takes precedence over the ``__version__`` submodule that
+# importing the CLI bound to this name
+sys.modules[__name__].__class__ = _Package
+
 
 __all__ = ["__version__", "main"]
@@ -5,11 +5,23 @@ Main entry point for the RAG Transformer application
 import argparse
 import os
 import sys
+import threading
 import traceback
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, Optional
 
 from .__version__ import __version__
-from .rag_engine import RAGEngine
+from .config import Config
+from .server import connect, stream_response
+
+if TYPE_CHECKING:
+    from .rag_engine import RAGEngine
+
+
+def create_engine() -> "RAGEngine":
+    """Create the RAG engine, so --help and --version never import it"""
+    from .rag_engine import RAGEngine
+
+    return RAGEngine()
 
 
 def should_use_color(no_color: bool = False) -> bool:
@@ -43,6 +55,7 @@ def create_parser() -> argparse.ArgumentParser:
 Examples:
   rag                           Start interactive mode
   rag --query "What is ML?"     Ask a single question
+  rag serve                     Keep a warm engine running for --query
   rag --quiet --query "test"    Ask a question with minimal output
   rag --version                 Show version information
   rag --help                    Show this help message
@@ -53,6 +66,13 @@ For more information, visit: https://github.com/harpertoken/rag
 
     parser.add_argument("--version", action="version", version=f"version {__version__}")
 
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["serve"],
+        help="'serve' runs a query server that --query uses while it is up",
+    )
+
     parser.add_argument(
         "--query",
         type=str,
@@ -83,6 +103,17 @@ For more information, visit: https://github.com/harpertoken/rag
     return parser
 
 
+def print_stream(pieces: Iterable[str], prefix: str = "") -> str:
+    """Print text pieces on one line as they arrive and return the full text"""
+    print(prefix, end="", flush=True)
+    text = ""
+    for piece in pieces:
+        print(piece, end="", flush=True)
+        text += piece
+    print()
+    return text
+
+
 def print_welcome_message(
     verbose: bool = False, quiet: bool = False, no_color: bool = False
 ) -> None:
@@ -112,9 +143,15 @@ def handle_single_query(
         print(f"Processing query: {query}")
 
     try:
-        rag_engine = RAGEngine()
-        response = rag_engine.generate_response(query)
-        print(response)
+        config = Config()
+        server = connect(config.SERVER_ADDRESS) if config.USE_SERVER else None
+        if server is not None:
+            if verbose and not quiet:
+                print(f"Using server at {config.SERVER_ADDRESS}")
+            print_stream(stream_response(server, query))
+        else:
+            rag_engine = create_engine()
+            print_stream(rag_engine.generate_response_stream(query))
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -145,10 +182,12 @@ def interactive_mode(
     print_welcome_message(verbose, quiet, no_color)
 
     try:
-        rag_engine = RAGEngine()
+        rag_engine = create_engine()
     except Exception as e:
         print(f"Failed to initialize RAG engine: {e}", file=sys.stderr)
         sys.exit(1)
+    if rag_engine.config.WARM_UP:
+        rag_engine.warm_up()
 
     while True:
         try:
@@ -182,9 +221,10 @@ def interactive_mode(
             if verbose:
                 print(f"Processing: {query}")
 
-            response = rag_engine.generate_response(query)
-            response_msg = format_message(response, "💡", no_color)
-            print(f"\n{response_msg}")
+            print_stream(
+                rag_engine.generate_response_stream(query),
+                f"\n{format_message('', '💡', no_color)}",
+            )
 
         except KeyboardInterrupt:
             print(f"\n{format_message('Goodbye!', '👋', no_color)}")
@@ -199,11 +239,44 @@ def interactive_mode(
             print(error_msg, file=sys.stderr)
 
 
+def run_server(verbose: bool = False, quiet: bool = False) -> None:
+    """Serve queries from one warm engine until interrupted"""
+    from .server import QueryServer
+
+    try:
+        rag_engine = create_engine()
+        if not quiet:
+            print("Loading models and knowledge base...")
+        rag_engine.warm_up(background=False)
+        server = QueryServer(rag_engine, rag_engine.config.SERVER_ADDRESS)
+    except Exception as e:
+        print(f"Failed to start server: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if not quiet:
+        print(f"Serving on {rag_engine.config.SERVER_ADDRESS} (Ctrl+C to stop)")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        if verbose and not quiet:
+            print("Shutting down server")
+    finally:
+        server.shutdown()
+        thread.join()
+
+
 def main(args: Optional[list] = None) -> None:
     """Main entry point with argument parsing and CLI policy enforcement"""
     parser = create_parser()
     parsed_args = parser.parse_args(args)
 
+    if parsed_args.command == "serve":
+        run_server(parsed_args.verbose, parsed_args.quiet)
+        return
+
     # Handle single query mode
     if parsed_args.query:
         handle_single_query(
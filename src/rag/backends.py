@@ -0,0 +1,161 @@
+"""
+Inference backends: how the embedding and generator models are loaded and run
+"""
+
+from importlib import import_module
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Optional, Tuple, Union
+
+INFERENCE_BACKENDS = ("torch", "onnx")
+
+
+def _sentence_transformer() -> Any:
+    """The SentenceTransformer class, imported (with torch) only when needed"""
+    try:
+        module: Optional[ModuleType] = import_module("sentence_transformers")
+    except ImportError:
+        module = None
+    model_class = getattr(module, "SentenceTransformer", None)
+    if model_class is None:
+        raise ImportError("sentence_transformers is not installed")
+    return model_class
+
+
+class EmbeddingBackend:
+    """Loads embedding models.
+
+    A loaded model has a ``SentenceTransformer``-style ``encode(texts)``
+    method returning one embedding row per text.
+    """
+
+    name = ""
+
+    def load(self, model_name: str) -> Any:
+        """Load the named embedding model"""
+        raise NotImplementedError
+
+
+class GeneratorBackend:
+    """Loads seq2seq generators with their tokenizers.
+
+    A loaded generator has the transformers ``generate`` and ``get_encoder``
+    methods, so the agent loop, batching, encoder reuse and streaming work
+    the same on every backend.
+    """
+
+    name = ""
+
+    def load(self, model_name: str) -> Tuple[Any, Any]:
+        """Load the named model as (tokenizer, generator)"""
+        raise NotImplementedError
+
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """sentence-transformers models run by PyTorch"""
+
+    name = "torch"
+
+    def load(self, model_name: str) -> Any:
+        return _sentence_transformer()(model_name)
+
+
+class TorchGeneratorBackend(GeneratorBackend):
+    """transformers seq2seq models run by PyTorch"""
+
+    name = "torch"
+
+    def load(self, model_name: str) -> Tuple[Any, Any]:
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        generator = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        return tokenizer, generator
+
+
+def _onnx_model_kwargs() -> Dict[str, Any]:
+    """ONNX Runtime session settings: CPU with all graph optimizations"""
+    import onnxruntime
+
+    session_options = onnxruntime.SessionOptions()
+    session_options.graph_optimization_level = (
+        onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    )
+    return {"provider": "CPUExecutionProvider", "session_options": session_options}
+
+
+def _export_dir(cache_dir: Path, model_name: str) -> Path:
+    """Directory an exported model is cached in"""
+    return cache_dir / "onnx" / model_name.replace("/", "--")
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """sentence-transformers models exported to ONNX and run by ONNX Runtime.
+
+    The first load exports the model (or downloads the export its repository
+    ships) and saves it under ``CACHE_DIR/onnx``; later loads read it from
+    there.
+    """
+
+    name = "onnx"
+
+    def __init__(self, cache_dir: Union[str, Path]):
+        self.cache_dir = Path(cache_dir)
+
+    def load(self, model_name: str) -> Any:
+        SentenceTransformer = _sentence_transformer()
+        path = _export_dir(self.cache_dir, model_name)
+        model_kwargs = _onnx_model_kwargs()
+        if path.exists():
+            return SentenceTransformer(
+                str(path), backend="onnx", model_kwargs=model_kwargs
+            )
+
+        model = SentenceTransformer(
+            model_name, backend="onnx", model_kwargs=model_kwargs
+        )
+        model.save(str(path))
+        return model
+
+
+class OnnxGeneratorBackend(GeneratorBackend):
+    """Seq2seq models exported to ONNX (encoder and decoder graphs) with
+    optimum and run by ONNX Runtime.
+
+    The first load exports the model and saves it under ``CACHE_DIR/onnx``;
+    later loads read it from there.
+    """
+
+    name = "onnx"
+
+    def __init__(self, cache_dir: Union[str, Path]):
+        self.cache_dir = Path(cache_dir)
+
+    def load(self, model_name: str) -> Tuple[Any, Any]:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        from transformers import AutoTokenizer
+
+        path = _export_dir(self.cache_dir, model_name)
+        model_kwargs = _onnx_model_kwargs()
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if (path / "config.json").exists():
+            generator = ORTModelForSeq2SeqLM.from_pretrained(path, **model_kwargs)
+        else:
+            generator = ORTModelForSeq2SeqLM.from_pretrained(
+                model_name, export=True, **model_kwargs
+            )
+            generator.save_pretrained(path)
+        return tokenizer, generator
+
+
+def get_backends(
+    name: str, cache_dir: Union[str, Path]
+) -> Tuple[EmbeddingBackend, GeneratorBackend]:
+    """Embedding and generator backends for a name from INFERENCE_BACKENDS"""
+    if name == "torch":
+        return TorchEmbeddingBackend(), TorchGeneratorBackend()
+    if name == "onnx":
+        return OnnxEmbeddingBackend(cache_dir), OnnxGeneratorBackend(cache_dir)
+    raise ValueError(
+        f"Unknown inference backend '{name}', expected one of {INFERENCE_BACKENDS}"
+    )
@@ -0,0 +1,85 @@
+"""
+Token-window chunking of documents and merging of retrieved chunks
+"""
+
+import re
+from typing import Dict, List, Sequence, Tuple
+
+# (parent document id, start character, end character)
+ChunkSource = Tuple[int, int, int]
+
+WORD_PATTERN = re.compile(r"\S+")
+GAP_SEPARATOR = " ... "
+
+
+def word_offsets(text: str) -> List[Tuple[int, int]]:
+    """Character offsets of whitespace-separated words, a tokenizer fallback"""
+    return [match.span() for match in WORD_PATTERN.finditer(text)]
+
+
+def chunk_spans(
+    offsets: Sequence[Tuple[int, int]],
+    text_length: int,
+    window: int,
+    overlap: int = 0,
+) -> List[Tuple[int, int]]:
+    """Split a document into overlapping windows of ``window`` tokens.
+
+    Args:
+        offsets: (start, end) character offsets of the document's tokens
+        text_length: Length of the document in characters
+        window: Tokens per chunk, 0 or less to keep the document whole
+        overlap: Tokens shared by consecutive chunks
+
+    Returns:
+        (start, end) character spans, one per chunk. A document that fits in
+        one window (or has no tokens) is a single chunk covering all of it.
+    """
+    if window <= 0 or len(offsets) <= window:
+        return [(0, text_length)]
+
+    stride = max(1, window - max(0, overlap))
+    spans = []
+    for first in range(0, len(offsets), stride):
+        last = min(first + window, len(offsets)) - 1
+        spans.append((offsets[first][0], offsets[last][1]))
+        if last == len(offsets) - 1:
+            break
+    return spans
+
+
+def merge_chunks(
+    ranked: Sequence[Tuple[ChunkSource, str]],
+) -> List[Tuple[List[int], str]]:
+    """Merge ranked chunks of the same document into one passage per document.
+
+    Overlapping chunks are stitched together using their character offsets;
+    chunks with a gap between them are joined with an ellipsis.
+
+    Args:
+        ranked: (source, text) pairs in rank order
+
+    Returns:
+        (positions, passage) pairs ordered by each document's best chunk,
+        where positions are the indices in ``ranked`` that were merged
+    """
+    groups: Dict[int, List[int]] = {}
+    for position, ((doc_id, _, _), _) in enumerate(ranked):
+        groups.setdefault(doc_id, []).append(position)
+
+    merged = []
+    for positions in groups.values():
+        parts: List[str] = []
+        end = -1
+        for position in sorted(positions, key=lambda p: ranked[p][0][1]):
+            (_, chunk_start, chunk_end), text = ranked[position]
+            if not parts:
+                parts.append(text)
+            elif chunk_start <= end:
+                if chunk_end > end:
+                    parts[-1] += text[end - chunk_start :]
+            else:
+                parts.append(text)
+            end = max(end, chunk_end)
+        merged.append((positions, GAP_SEPARATOR.join(parts)))
+    return merged
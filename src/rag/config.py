@@ -5,6 +5,12 @@ Configuration for RAG Transformer
 import logging
 import os
 from pathlib import Path
+from typing import Sequence
+
+# Index types and stored vector precisions build_index accepts; defined here
+# so that Config can check them without importing numpy
+INDEX_TYPES = ("auto", "flat", "ivf", "hnsw", "ivfpq")
+STORAGE_TYPES = ("float32", "float16", "int8")
 
 
 class Config:
@@ -31,11 +37,111 @@ class Config:
         self.OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "outputs"))
         self.CACHE_DIR = Path(os.getenv("CACHE_DIR", ".cache"))
 
+        # Index snapshot (FAISS index + document table cached under CACHE_DIR)
+        self.INDEX_SNAPSHOT = self._get_bool_env("INDEX_SNAPSHOT", True)
+        self.INDEX_MMAP = self._get_bool_env("INDEX_MMAP", False)
+
+        # Index type: auto, flat, ivf, hnsw or ivfpq (auto chooses by corpus size)
+        self.INDEX_TYPE = self._get_choice_env("INDEX_TYPE", INDEX_TYPES, "auto")
+        self.INDEX_NLIST = self._get_int_env("INDEX_NLIST", 0)
+        self.INDEX_HNSW_M = self._get_int_env("INDEX_HNSW_M", 32)
+        self.INDEX_EF_CONSTRUCTION = self._get_int_env("INDEX_EF_CONSTRUCTION", 40)
+        self.INDEX_PQ_M = self._get_int_env("INDEX_PQ_M", 0)
+        self.INDEX_TRAIN_SIZE = self._get_int_env("INDEX_TRAIN_SIZE", 100_000)
+        # Stored vector precision: float32, float16 or int8 (scalar quantized)
+        self.INDEX_STORAGE = self._get_choice_env(
+            "INDEX_STORAGE", STORAGE_TYPES, "float32"
+        )
+        self.INDEX_NPROBE = self._get_int_env("INDEX_NPROBE", 16)
+        self.INDEX_EF_SEARCH = self._get_int_env("INDEX_EF_SEARCH", 64)
+
+        # Knowledge base documents read, chunked and indexed per batch
+        self.KB_BATCH_SIZE = self._get_int_env("KB_BATCH_SIZE", 1000)
+
+        # Index build: documents encoded per batch (each batch is streamed into
+        # the index) and encoder processes (0 or 1 encodes in this process)
+        self.EMBED_BATCH_SIZE = self._get_int_env("EMBED_BATCH_SIZE", 256)
+        self.EMBED_WORKERS = self._get_int_env("EMBED_WORKERS", 0)
+
+        # Query embedding cache (LRU; TTL in seconds, 0 disables expiry) and
+        # the number of files its optional disk tier may hold
+        self.QUERY_CACHE_SIZE = self._get_int_env("QUERY_CACHE_SIZE", 1024)
+        self.QUERY_CACHE_TTL = self._get_int_env("QUERY_CACHE_TTL", 0)
+        self.QUERY_CACHE_DISK = self._get_bool_env("QUERY_CACHE_DISK", False)
+        self.QUERY_CACHE_DISK_MAX = self._get_int_env("QUERY_CACHE_DISK_MAX", 10000)
+
+        # Semantic response cache: answers reused for queries whose embedding
+        # has at least this cosine similarity to an earlier one (size 0 = off).
+        # Off by default: sentence embeddings barely separate negations and
+        # reordered questions ("flights to X from Y" / "from X to Y"), which
+        # often score above 0.95 and would be given each other's answers.
+        self.RESPONSE_CACHE_SIZE = self._get_int_env("RESPONSE_CACHE_SIZE", 0)
+        self.RESPONSE_CACHE_THRESHOLD = self._get_float_env(
+            "RESPONSE_CACHE_THRESHOLD", 0.95
+        )
+
+        # Decoding: sample (default), or deterministic greedy / beam search.
+        # Deterministic modes answer repeated questions from an exact cache
+        # keyed by query, retrieved context, model and decoding settings.
+        self.DECODING = os.getenv("DECODING", "sample").lower()
+        self.NUM_BEAMS = self._get_int_env("NUM_BEAMS", 4)
+        self.EXACT_CACHE_SIZE = self._get_int_env("EXACT_CACHE_SIZE", 1024)
+        self.EXACT_CACHE_DISK = self._get_bool_env("EXACT_CACHE_DISK", False)
+
+        # Inference backend: torch, or onnx (models exported once to
+        # CACHE_DIR/onnx and run by ONNX Runtime)
+        self.INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+
+        # `rag serve`: Unix socket path, or host:port for localhost TCP;
+        # `rag --query` uses a running server unless USE_SERVER is false
+        self.SERVER_ADDRESS = os.getenv(
+            "SERVER_ADDRESS", str(self.CACHE_DIR / "rag.sock")
+        )
+        self.USE_SERVER = self._get_bool_env("USE_SERVER", True)
+
+        # Models load on first use; interactive modes start loading them in
+        # a background thread right away
+        self.WARM_UP = self._get_bool_env("WARM_UP", True)
+
+        # Model weights: float32, or int8 (dynamic quantization of the linear
+        # layers of the embedder and generator, for CPU inference)
+        self.MODEL_PRECISION = os.getenv("MODEL_PRECISION", "float32").lower()
+
+        # Agent loop: encode each prompt once and tool results as separate
+        # encoder segments instead of re-encoding the whole prompt per step
+        # (off until its effect on answer quality has been measured)
+        self.ENCODER_REUSE = self._get_bool_env("ENCODER_REUSE", False)
+
+        # Near-duplicate removal at ingest (estimated Jaccard similarity of
+        # word trigrams at or above the threshold counts as a duplicate).
+        # Off by default, since it drops documents from the knowledge base.
+        self.DEDUP = self._get_bool_env("DEDUP", False)
+        self.DEDUP_THRESHOLD = self._get_float_env("DEDUP_THRESHOLD", 0.8)
+
+        # Chunking: documents are split into overlapping windows of generator
+        # tokens at ingest (0 keeps documents whole); CHUNK_MERGE stitches
+        # retrieved chunks of the same document back together
+        self.CHUNK_TOKENS = self._get_int_env("CHUNK_TOKENS", 128)
+        self.CHUNK_OVERLAP = self._get_int_env("CHUNK_OVERLAP", 32)
+        self.CHUNK_MERGE = self._get_bool_env("CHUNK_MERGE", True)
+
+        # Retrieval: hybrid (BM25 + dense, fused by RRF), dense or lexical
+        self.RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+        self.HYBRID_CANDIDATES = self._get_int_env("HYBRID_CANDIDATES", 20)
+        self.RRF_K = self._get_int_env("RRF_K", 60)
+
+        # Metadata partitions: one sub-index per document category, and
+        # routing of queries that clearly name a category to its partition
+        self.PARTITION_INDEX = self._get_bool_env("PARTITION_INDEX", False)
+        self.PARTITION_ROUTER = self._get_bool_env("PARTITION_ROUTER", False)
+
         # System settings
         self.MAX_WORKERS = self._get_int_env("MAX_WORKERS", 5)
         self.TOP_K_RETRIEVAL = self._get_int_env("TOP_K_RETRIEVAL", 3)
         self.MAX_ITERATIONS = self._get_int_env("MAX_ITERATIONS", 3)
         self.MAX_LENGTH = self._get_int_env("MAX_LENGTH", 150)
+        self.MAX_INPUT_TOKENS = self._get_int_env("MAX_INPUT_TOKENS", 512)
+        self.GENERATION_BATCH_SIZE = self._get_int_env("GENERATION_BATCH_SIZE", 8)
 
         # Logging
         self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -52,6 +158,39 @@ class Config:
             logging.warning(f"Invalid integer for {var_name}, defaulting to {default}")
             return default
 
+    def _get_float_env(self, var_name: str, default: float) -> float:
+        """Helper to safely get a float environment variable."""
+        try:
+            return float(os.getenv(var_name, default))
+        except ValueError:
+            logging.warning(f"Invalid float for {var_name}, defaulting to {default}")
+            return default
+
+    def _get_bool_env(self, var_name: str, default: bool) -> bool:
+        """Helper to safely get a boolean environment variable."""
+        value = os.getenv(var_name)
+        if value is None:
+            return default
+        if value.strip().lower() in ("1", "true", "yes", "on"):
+            return True
+        if value.strip().lower() in ("0", "false", "no", "off"):
+            return False
+        logging.warning(f"Invalid boolean for {var_name}, defaulting to {default}")
+        return default
+
+    def _get_choice_env(
+        self, var_name: str, choices: Sequence[str], default: str
+    ) -> str:
+        """Helper to get a lowercase environment variable from a set of choices."""
+        value = os.getenv(var_name, default).strip().lower()
+        if value in choices:
+            return value
+        logging.warning(
+            f"Invalid value '{value}' for {var_name} (expected one of "
+            f"{', '.join(choices)}), defaulting to {default}"
+        )
+        return default
+
     def _setup_logging(self):
         """Set up basic logging configuration."""
         logging.basicConfig(
@@ -0,0 +1,56 @@
+"""
+Token-budget-aware packing of retrieved passages into a prompt context
+"""
+
+import re
+from typing import Callable, List, Sequence
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences at ., ! or ? followed by whitespace"""
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence]
+
+
+def pack_context(
+    passages: Sequence[str],
+    budget: int,
+    count_tokens: Callable[[str], int],
+) -> List[str]:
+    """Greedily select passages, best first, that fit in a token budget.
+
+    Passages that fit are taken whole. A passage that does not fit
+    contributes those of its sentences that still do, in their original
+    order, and packing continues with the next passage so that the budget is
+    filled as far as possible.
+
+    Args:
+        passages: Candidate passages, highest priority first
+        budget: Tokens available for the context
+        count_tokens: Number of tokens a piece of text costs
+
+    Returns:
+        Selected passages (or sentence excerpts) in priority order
+    """
+    selected: List[str] = []
+    remaining = budget
+    for passage in passages:
+        if remaining <= 0:
+            break
+
+        cost = count_tokens(passage)
+        if cost <= remaining:
+            selected.append(passage)
+            remaining -= cost
+            continue
+
+        sentences = []
+        for sentence in split_sentences(passage):
+            cost = count_tokens(sentence)
+            if cost <= remaining:
+                sentences.append(sentence)
+                remaining -= cost
+        if sentences:
+            selected.append(" ".join(sentences))
+    return selected
@@ -4,7 +4,6 @@ Data fetching module for collecting knowledge from various APIs
 
 import argparse
 import concurrent.futures
-import json
 import os
 import sys
 import time
@@ -14,6 +13,8 @@ from typing import List
 import requests
 
 from .config import Config
+from .dedup import deduplicate
+from .knowledge_base_file import load_documents, write_documents
 
 # Handle version import with fallback
 try:
@@ -176,12 +177,33 @@ class DataFetcher:
         print(f"Fetched {len(all_documents)} documents total")
         return all_documents
 
+    def load_existing_documents(self) -> List[str]:
+        """Load the documents currently in the knowledge base file, if any"""
+        try:
+            documents, _ = load_documents(self.config.KNOWLEDGE_BASE_FILE)
+            return list(documents)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def deduplicate_documents(
+        self, documents: List[str], verbose: bool = False
+    ) -> List[str]:
+        """Drop near-duplicate documents and report what was dropped"""
+        kept, dropped = deduplicate(documents, self.config.DEDUP_THRESHOLD)
+        print(f"Removed {len(dropped)} near-duplicate documents")
+        if verbose:
+            for position, original, similarity in dropped:
+                print(
+                    f"  • dropped #{position} ({similarity:.0%} similar to kept "
+                    f"#{original}): {documents[position][:60]}"
+                )
+        return kept
+
     def save_documents(self, documents: List[str]):
-        """Save documents to knowledge base file"""
+        """Save documents to knowledge base file (JSON Lines for .jsonl files)"""
         filepath = self.config.KNOWLEDGE_BASE_FILE
-        with open(filepath, "w") as f:
-            json.dump(documents, f, indent=2)
-        print(f"Saved {len(documents)} documents to {filepath}")
+        count = write_documents(filepath, documents)
+        print(f"Saved {count} documents to {filepath}")
 
 
 def create_collector_parser():
@@ -201,6 +223,7 @@ Data Sources:
 Examples:
   rag-collect                    Collect all available data
   rag-collect --verbose          Show detailed progress
+  rag-collect --merge            Add new documents to the existing knowledge base
   rag-collect --help             Show this help message
 
 API Keys:
@@ -220,6 +243,18 @@ API Keys:
         help="Enable verbose output showing collection progress",
     )
 
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="Merge collected documents into the existing knowledge base",
+    )
+
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Keep near-duplicate documents instead of removing them",
+    )
+
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -256,6 +291,14 @@ def main(args=None):
 
         if parsed_args.verbose:
             print(f"✅ Successfully collected {len(documents)} documents")
+
+        if parsed_args.merge:
+            documents = fetcher.load_existing_documents() + documents
+
+        if not parsed_args.no_dedup:
+            documents = fetcher.deduplicate_documents(documents, parsed_args.verbose)
+
+        if parsed_args.verbose:
             print("💾 Saving to knowledge base...")
 
         fetcher.save_documents(documents)
@@ -0,0 +1,173 @@
+"""
+Near-duplicate detection with MinHash signatures and LSH banding
+"""
+
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+")
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+# (position in the batch, id of the kept document it duplicates, similarity)
+Duplicate = Tuple[int, int, float]
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    """Overlapping word n-grams of a text (its words if it is shorter)"""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[i : i + size]) for i in range(len(words) - size + 1)]
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Split num_perm hashes into (bands, rows) for an LSH threshold.
+
+    A pair becomes an LSH candidate from a similarity of roughly
+    ``(1 / bands) ** (1 / rows)``. The highest such point that is still at or
+    below ``threshold`` is chosen, so pairs above the threshold are rarely
+    missed; false candidates are removed by comparing the full signatures.
+    """
+
+    def candidate_point(split: Tuple[int, int]) -> float:
+        bands, rows = split
+        return float((1.0 / bands) ** (1.0 / rows))
+
+    splits = [
+        (num_perm // rows, rows)
+        for rows in range(1, num_perm + 1)
+        if num_perm % rows == 0
+    ]
+    below = [split for split in splits if candidate_point(split) <= threshold]
+    return max(below or splits[:1], key=candidate_point)
+
+
+class NearDuplicateDetector:
+    """Incremental near-duplicate filter for documents.
+
+    Each document is reduced to a MinHash signature of its word trigrams.
+    Signatures are split into bands and hashed into LSH buckets, so a new
+    document is only compared with the documents it shares a bucket with
+    instead of with every document seen so far. A candidate counts as a
+    duplicate when the estimated Jaccard similarity of the two signatures is
+    at least ``threshold``.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, seed: int = 0):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text"""
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)),
+            dtype=np.uint64,
+        )
+        hashes %= MERSENNE_PRIME
+        permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME
+        signature: np.ndarray = permuted.min(axis=0).astype(np.uint32)
+        return signature
+
+    def find_duplicate(self, text: str) -> Optional[Tuple[int, float]]:
+        """Return (id, similarity) of a kept near-duplicate, or None"""
+        return self._match(self.signature(text))
+
+    def add(self, text: str) -> Optional[Tuple[int, float]]:
+        """Keep a document unless it duplicates one already kept.
+
+        Returns:
+            None if the document was kept (it gets the next id), otherwise the
+            (id, similarity) of the kept document it duplicates
+        """
+        signature = self.signature(text)
+        match = self._match(signature)
+        if match is not None:
+            return match
+
+        self._keep(signature)
+        return None
+
+    def signatures(self) -> np.ndarray:
+        """Signatures of the kept documents, one row per id"""
+        return np.array(self._signatures, dtype=np.uint32).reshape(-1, self.num_perm)
+
+    def add_signatures(self, signatures: np.ndarray) -> None:
+        """Keep documents by their signatures, as returned by signatures().
+
+        Lets a detector be restored for a knowledge base whose documents were
+        kept earlier, without hashing their text again.
+        """
+        if signatures.ndim != 2 or signatures.shape[1] != self.num_perm:
+            raise ValueError(
+                f"Expected signatures of {self.num_perm} hashes, "
+                f"got shape {signatures.shape}"
+            )
+        for signature in signatures.astype(np.uint32):
+            self._keep(signature)
+
+    def filter(self, documents: Sequence[str]) -> Tuple[List[str], List[Duplicate]]:
+        """Keep the documents that are not near-duplicates.
+
+        Returns:
+            The kept documents and a report with one (position in
+            ``documents``, id of the kept original, similarity) entry per
+            dropped document
+        """
+        kept: List[str] = []
+        dropped: List[Duplicate] = []
+        for position, document in enumerate(documents):
+            match = self.add(document)
+            if match is None:
+                kept.append(document)
+            else:
+                dropped.append((position, match[0], match[1]))
+        return kept, dropped
+
+    def _keep(self, signature: np.ndarray) -> None:
+        doc_id = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(doc_id)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _match(self, signature: np.ndarray) -> Optional[Tuple[int, float]]:
+        candidates: Set[int] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best: Optional[Tuple[int, float]] = None
+        for doc_id in sorted(candidates):
+            similarity = float(np.mean(self._signatures[doc_id] == signature))
+            if similarity < self.threshold:
+                continue
+            if best is None or similarity > best[1]:
+                best = (doc_id, similarity)
+        return best
+
+
+def deduplicate(
+    documents: Sequence[str], threshold: float = 0.8
+) -> Tuple[List[str], List[Duplicate]]:
+    """Drop near-duplicates from a batch of documents, see NearDuplicateDetector"""
+    return NearDuplicateDetector(threshold=threshold).filter(documents)
@@ -0,0 +1,123 @@
+"""
+Compact document storage: one UTF-8 blob plus an offsets array
+"""
+
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Iterable, Iterator, List, Union, overload
+
+import numpy as np
+
+
+class DocumentStore(Sequence):
+    """Read-mostly list of documents backed by a UTF-8 blob and offsets.
+
+    Document ``i`` is ``blob[offsets[i]:offsets[i + 1]]`` and is only decoded
+    when it is accessed, so each document costs 8 bytes on top of its text
+    instead of a Python string object. A store opened from disk memory-maps
+    both files: only the pages that are read are loaded, and processes that
+    open the same files share them. Documents appended to an opened store are
+    kept in memory after the mapped ones.
+    """
+
+    BLOB_FILE = "documents.bin"
+    OFFSETS_FILE = "offsets.npy"
+
+    def __init__(self, documents: Iterable[str] = ()):
+        self._mapped_blob: Union[bytes, np.ndarray] = b""
+        self._mapped_offsets = np.zeros(1, dtype=np.int64)
+        self._blob = bytearray()
+        self._offsets = array("q", [0])
+        self.extend(documents)
+
+    @classmethod
+    def open(cls, directory: Union[str, Path]) -> "DocumentStore":
+        """Memory-map a store written by :meth:`save`"""
+        directory = Path(directory)
+        offsets = np.load(directory / cls.OFFSETS_FILE, mmap_mode="r")
+        blob_path = directory / cls.BLOB_FILE
+        size = blob_path.stat().st_size
+        if offsets.ndim != 1 or len(offsets) == 0 or int(offsets[-1]) != size:
+            raise ValueError(f"Document offsets do not match {blob_path}")
+
+        store = cls()
+        store._mapped_offsets = offsets
+        # numpy cannot map an empty file
+        store._mapped_blob = (
+            np.memmap(blob_path, dtype=np.uint8, mode="r") if size else b""
+        )
+        return store
+
+    def save(self, directory: Union[str, Path]) -> None:
+        """Write the blob and offsets files into a directory"""
+        directory = Path(directory)
+        mapped_size = int(self._mapped_offsets[-1])
+        offsets = np.concatenate(
+            [
+                np.asarray(self._mapped_offsets, dtype=np.int64),
+                np.frombuffer(self._offsets, dtype=np.int64)[1:] + mapped_size,
+            ]
+        )
+        with open(directory / self.BLOB_FILE, "wb") as f:
+            f.write(memoryview(self._mapped_blob))  # type: ignore[arg-type]
+            f.write(self._blob)
+        np.save(directory / self.OFFSETS_FILE, offsets, allow_pickle=False)
+
+    def append(self, document: str) -> None:
+        """Add a document at the end of the store"""
+        self._blob += document.encode("utf-8")
+        self._offsets.append(len(self._blob))
+
+    def extend(self, documents: Iterable[str]) -> None:
+        """Add documents at the end of the store"""
+        for document in documents:
+            self.append(document)
+
+    def __len__(self) -> int:
+        return len(self._mapped_offsets) - 1 + len(self._offsets) - 1
+
+    # fmt: off
+    @overload
+    def __getitem__(self, position: int) -> str:
+        ...
+
+    @overload
+    def __getitem__(self, position: slice) -> List[str]:
+        ...
+    # fmt: on
+
+    def __getitem__(self, position: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+
+        length = len(self)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("document index out of range")
+
+        num_mapped = len(self._mapped_offsets) - 1
+        if position < num_mapped:
+            start = int(self._mapped_offsets[position])
+            end = int(self._mapped_offsets[position + 1])
+            return bytes(self._mapped_blob[start:end]).decode("utf-8")
+
+        position -= num_mapped
+        start, end = self._offsets[position], self._offsets[position + 1]
+        return self._blob[start:end].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def __eq__(self, other: object) -> bool:
+        """Compare documents with another store, list or tuple"""
+        if not isinstance(other, (DocumentStore, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"DocumentStore({len(self)} documents)"
@@ -0,0 +1,148 @@
+"""
+Batched, optionally multi-process encoding of documents for index builds
+"""
+
+import concurrent.futures
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+# Called with (documents encoded so far, total documents)
+ProgressCallback = Callable[[int, int], None]
+
+
+def iter_batches(
+    texts: Iterable[str], batch_size: int
+) -> Iterator[Tuple[int, List[str]]]:
+    """Consecutive (start offset, batch) lists of at most batch_size texts.
+
+    Works on any iterable, taking only one batch from it at a time.
+    """
+    iterator = iter(texts)
+    start = 0
+    while True:
+        batch = list(islice(iterator, max(1, batch_size)))
+        if not batch:
+            return
+        yield start, batch
+        start += len(batch)
+
+
+@contextmanager
+def encoding_pool(model: Any, workers: int) -> Iterator[Any]:
+    """Worker processes that several encode_batches calls can share.
+
+    Yields sentence-transformers' multi-process pool when the model has one,
+    otherwise a process pool (the model must then be picklable), and stops
+    it on exit. Yields None when ``workers`` is 0 or 1.
+    """
+    if workers <= 1:
+        yield None
+    elif hasattr(model, "start_multi_process_pool"):
+        pool = model.start_multi_process_pool(["cpu"] * workers)
+        try:
+            yield pool
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            yield executor
+
+
+def encode_batches(
+    model: Any,
+    texts: Sequence[str],
+    batch_size: int = 256,
+    workers: int = 0,
+    progress: Optional[ProgressCallback] = None,
+    pool: Any = None,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Encode texts batch by batch, yielding (start offset, float32 matrix).
+
+    Batches are yielded in order as soon as they are encoded, so callers can
+    add them to an index without holding the whole corpus in memory. With
+    more than one worker, batches are encoded in parallel by an
+    ``encoding_pool``, which is started and stopped by this call unless one
+    is passed in.
+
+    Args:
+        model: Embedding model with an ``encode(texts)`` method
+        texts: Texts to encode
+        batch_size: Texts per batch
+        workers: Processes to encode with, 0 or 1 to encode in this process
+        progress: Optional callback receiving (encoded, total) after each batch
+        pool: Running ``encoding_pool(model, workers)`` to encode with
+    """
+    if pool is None and workers > 1 and len(texts) > batch_size:
+        with encoding_pool(model, workers) as pool:
+            yield from encode_batches(model, texts, batch_size, workers, progress, pool)
+        return
+
+    batches = iter_batches(texts, batch_size)
+    if isinstance(pool, concurrent.futures.Executor):
+        encoded = _encode_with_process_pool(model, batches, pool, workers)
+    elif pool is not None:
+        encoded = _encode_with_model_pool(model, batches, pool, workers)
+    else:
+        encoded = ((start, model.encode(batch)) for start, batch in batches)
+
+    done = 0
+    for start, embeddings in encoded:
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        done += len(embeddings)
+        if progress is not None:
+            progress(done, len(texts))
+        yield start, embeddings
+
+
+def _encode_with_model_pool(
+    model: Any, batches: Iterator[Tuple[int, List[str]]], pool: Any, workers: int
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Encode batches with sentence-transformers' multi-process pool"""
+    for start, batch in batches:
+        chunk_size = max(1, -(-len(batch) // max(workers, 1)))
+        yield start, model.encode_multi_process(batch, pool, chunk_size=chunk_size)
+
+
+def _encode_with_process_pool(
+    model: Any,
+    batches: Iterator[Tuple[int, List[str]]],
+    executor: concurrent.futures.Executor,
+    workers: int,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Encode batches in a process pool, keeping a bounded number in flight"""
+    pending: Deque[Tuple[int, concurrent.futures.Future]] = deque()
+    for start, batch in batches:
+        pending.append((start, executor.submit(model.encode, batch)))
+        if len(pending) >= 2 * max(workers, 1):
+            first, future = pending.popleft()
+            yield first, future.result()
+    while pending:
+        first, future = pending.popleft()
+        yield first, future.result()
+
+
+def progress_printer(label: str, steps: int = 10) -> ProgressCallback:
+    """Progress callback that prints at most ``steps`` updates per run"""
+    reported = [0]
+
+    def report(done: int, total: int) -> None:
+        step = steps * done // max(total, 1)
+        if step > reported[0] or done == total:
+            reported[0] = step
+            print(f"{label}: {done}/{total} ({done / max(total, 1):.0%})")
+
+    return report
@@ -0,0 +1,88 @@
+"""
+Model-free embeddings from hashed word and character n-gram features
+"""
+
+import math
+import re
+import zlib
+from typing import Any, List, Sequence
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """Embed text by feature hashing, with no model download or weights.
+
+    Words and character trigrams of each word are hashed into a fixed number
+    of signed buckets, weighted by sublinear term frequency and L2-normalized,
+    so L2 distance between embeddings orders documents like cosine similarity
+    of their n-gram profiles. Hashing uses CRC32, which is stable across
+    processes, so embeddings can be cached on disk.
+
+    The ``encode`` method mirrors ``SentenceTransformer.encode`` so the
+    embedder plugs into the same FAISS path. Select it with
+    ``EMBEDDING_MODEL=hashing`` or ``EMBEDDING_MODEL=hashing-<dimension>``.
+    """
+
+    PREFIX = "hashing"
+    DEFAULT_DIMENSION = 384
+    NGRAM = 3
+
+    def __init__(self, dimension: int = DEFAULT_DIMENSION):
+        if dimension <= 0:
+            raise ValueError(f"Embedding dimension must be positive, got {dimension}")
+        self.dimension = dimension
+
+    @property
+    def name(self) -> str:
+        """Model name that selects this embedder, used to key caches"""
+        return f"{self.PREFIX}-{self.dimension}"
+
+    @classmethod
+    def handles(cls, model_name: str) -> bool:
+        """Check whether a model name selects the hashing embedder"""
+        return model_name == cls.PREFIX or model_name.startswith(f"{cls.PREFIX}-")
+
+    @classmethod
+    def from_name(cls, model_name: str) -> "HashingEmbedder":
+        """Create an embedder from a name like "hashing" or "hashing-512" """
+        if model_name == cls.PREFIX:
+            return cls()
+        try:
+            dimension = int(model_name[len(cls.PREFIX) + 1 :])
+        except ValueError:
+            raise ValueError(f"Invalid hashing embedder name '{model_name}'") from None
+        return cls(dimension)
+
+    def features(self, text: str) -> List[str]:
+        """Words plus the character trigrams of each padded word"""
+        features = []
+        for word in TOKEN_PATTERN.findall(text.lower()):
+            features.append(word)
+            padded = f"<{word}>"
+            features.extend(
+                "#" + padded[i : i + self.NGRAM]
+                for i in range(len(padded) - self.NGRAM + 1)
+            )
+        return features
+
+    def encode(self, texts: Sequence[str], **kwargs: Any) -> np.ndarray:
+        """Embed texts into a float32 matrix of shape (len(texts), dimension)"""
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: dict = {}
+            for feature in self.features(text):
+                counts[feature] = counts.get(feature, 0) + 1
+
+            for feature, count in counts.items():
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                embeddings[row, digest % self.dimension] += sign * (
+                    1.0 + math.log(count)
+                )
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
@@ -0,0 +1,260 @@
+"""
+FAISS index construction with size-based index type selection
+"""
+
+import math
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from .config import INDEX_TYPES, STORAGE_TYPES
+
+if TYPE_CHECKING:
+    import faiss
+
+# Vector storage of flat, HNSW and IVF indexes; IVF-PQ is always compressed
+# (faiss.ScalarQuantizer attribute names, so faiss loads only to build)
+SCALAR_QUANTIZERS = {
+    "float16": "QT_fp16",
+    "int8": "QT_8bit",
+}
+
+# Corpus sizes at which "auto" switches to the next, more approximate index
+HNSW_MIN_DOCUMENTS = 10_000
+IVF_MIN_DOCUMENTS = 200_000
+IVFPQ_MIN_DOCUMENTS = 1_000_000
+
+# Minimum training points per IVF list / per PQ centroid for stable k-means
+MIN_POINTS_PER_CENTROID = 39
+PQ_NBITS = 8
+
+
+def choose_index_type(num_documents: int) -> str:
+    """Pick an index type suitable for a corpus of the given size"""
+    if num_documents >= IVFPQ_MIN_DOCUMENTS:
+        return "ivfpq"
+    if num_documents >= IVF_MIN_DOCUMENTS:
+        return "ivf"
+    if num_documents >= HNSW_MIN_DOCUMENTS:
+        return "hnsw"
+    return "flat"
+
+
+def default_nlist(num_documents: int) -> int:
+    """Number of IVF lists for a corpus, roughly 4 * sqrt(N)"""
+    return max(1, int(4 * math.sqrt(num_documents)))
+
+
+def default_pq_m(dimension: int) -> int:
+    """Number of PQ sub-quantizers: the largest divisor of dimension <= d / 4"""
+    for m in range(max(1, dimension // 4), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def training_size(
+    num_documents: int,
+    index_type: str = "auto",
+    nlist: int = 0,
+    train_size: int = 100_000,
+    storage: str = "float32",
+) -> int:
+    """Embeddings build_index needs to train an index for N documents.
+
+    Returns 0 for index types that need no training. Callers that stream
+    embeddings can build the index once this many have been encoded.
+    """
+    index_type = index_type.lower()
+    if index_type == "auto":
+        index_type = choose_index_type(num_documents)
+    if index_type not in ("ivf", "ivfpq"):
+        # int8 scalar quantizers learn each dimension's range
+        return min(num_documents, train_size) if storage.lower() == "int8" else 0
+    min_training = _min_training(index_type, nlist or default_nlist(num_documents))
+    return min(num_documents, max(train_size, min_training))
+
+
+def _min_training(index_type: str, nlist: int) -> int:
+    """Fewest training points for stable k-means of an IVF / IVF-PQ index"""
+    min_training = nlist * MIN_POINTS_PER_CENTROID
+    if index_type == "ivfpq":
+        min_training = max(min_training, (1 << PQ_NBITS) * MIN_POINTS_PER_CENTROID)
+    return min_training
+
+
+def build_index(
+    embeddings: np.ndarray,
+    index_type: str = "auto",
+    nlist: int = 0,
+    hnsw_m: int = 32,
+    ef_construction: int = 40,
+    pq_m: int = 0,
+    train_size: int = 100_000,
+    seed: int = 0,
+    num_documents: int = 0,
+    storage: str = "float32",
+) -> "faiss.Index":
+    """Create an index for the embeddings, train it on a sample if needed.
+
+    The embeddings are not added; the caller adds them so that index ids keep
+    matching document positions. Approximate index types fall back to a flat
+    index when there are too few embeddings to train them.
+
+    Args:
+        embeddings: float32 matrix of shape (N, dimension)
+        index_type: One of INDEX_TYPES; "auto" chooses by N
+        nlist: Number of IVF lists, 0 to derive it from N
+        hnsw_m: Neighbours per node in the HNSW graph
+        ef_construction: HNSW construction-time search depth
+        pq_m: Number of PQ sub-quantizers, 0 to derive it from the dimension
+        train_size: Maximum number of embeddings sampled for training
+        seed: Seed for the training sample
+        num_documents: Size of the corpus the index is built for, when
+            ``embeddings`` is only its first part (0 means N)
+        storage: Precision of the stored vectors, one of STORAGE_TYPES.
+            float16 halves and int8 quarters the memory of float32 vectors
+            by scalar quantization; IVF-PQ indexes ignore it.
+    """
+    index_type = index_type.lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(
+            f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}"
+        )
+    storage = storage.lower()
+    if storage not in STORAGE_TYPES:
+        raise ValueError(
+            f"Unknown storage type '{storage}', expected one of {STORAGE_TYPES}"
+        )
+    import faiss
+
+    quantizer_type: Optional[int] = (
+        getattr(faiss.ScalarQuantizer, SCALAR_QUANTIZERS[storage])
+        if storage in SCALAR_QUANTIZERS
+        else None
+    )
+
+    num_embeddings, dimension = embeddings.shape
+    num_documents = num_documents or num_embeddings
+    if index_type == "auto":
+        index_type = choose_index_type(num_documents)
+
+    if index_type == "flat":
+        return _flat_index(embeddings, quantizer_type, train_size, seed)
+
+    if index_type == "hnsw":
+        graph: "faiss.IndexHNSW"
+        if quantizer_type is None:
+            graph = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        else:
+            # faiss's stubs mistype the quantizer type argument
+            graph = faiss.IndexHNSWSQ(
+                dimension, quantizer_type, hnsw_m  # type: ignore[arg-type]
+            )
+            graph.train(_training_sample(embeddings, train_size, seed))
+        graph.hnsw.efConstruction = ef_construction
+        return graph
+
+    nlist = nlist or default_nlist(num_documents)
+    min_training = _min_training(index_type, nlist)
+    if index_type == "ivfpq":
+        pq_m = pq_m or default_pq_m(dimension)
+        if dimension % pq_m != 0:
+            raise ValueError(f"PQ m={pq_m} must divide dimension {dimension}")
+
+    if num_embeddings < min_training:
+        print(
+            f"Warning: {num_embeddings} documents are too few to train a "
+            f"'{index_type}' index, using a flat index."
+        )
+        return _flat_index(embeddings, quantizer_type, train_size, seed)
+
+    quantizer = faiss.IndexFlatL2(dimension)
+    index: "faiss.IndexIVF"
+    if index_type == "ivf" and quantizer_type is not None:
+        index = faiss.IndexIVFScalarQuantizer(
+            quantizer, dimension, nlist, quantizer_type, faiss.METRIC_L2
+        )
+    elif index_type == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, PQ_NBITS)
+
+    index.train(_training_sample(embeddings, max(train_size, min_training), seed))
+    return index
+
+
+def _flat_index(
+    embeddings: np.ndarray, quantizer_type: Optional[int], train_size: int, seed: int
+) -> "faiss.Index":
+    """Exhaustive index storing full or scalar-quantized vectors"""
+    import faiss
+
+    dimension = embeddings.shape[1]
+    if quantizer_type is None:
+        return faiss.IndexFlatL2(dimension)
+    index = faiss.IndexScalarQuantizer(dimension, quantizer_type, faiss.METRIC_L2)
+    index.train(_training_sample(embeddings, train_size, seed))
+    return index
+
+
+def _training_sample(embeddings: np.ndarray, size: int, seed: int) -> np.ndarray:
+    """Draw a random subset of rows for index training"""
+    if len(embeddings) <= size:
+        return embeddings
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), size=size, replace=False))
+    return np.ascontiguousarray(embeddings[rows])
+
+
+def set_search_params(
+    index: "faiss.Index",
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> None:
+    """Apply query-time parameters to the index types that support them"""
+    if nprobe:
+        import faiss
+
+        try:
+            ivf = faiss.extract_index_ivf(index)
+        except RuntimeError:
+            ivf = None
+        if ivf is not None:
+            ivf.nprobe = min(nprobe, ivf.nlist)
+
+    if ef_search and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+
+def describe_index_params(
+    index_type: str,
+    nlist: int,
+    hnsw_m: int,
+    ef_construction: int,
+    pq_m: int,
+    storage: str = "float32",
+) -> str:
+    """Stable description of build parameters, used to key index snapshots"""
+    description = (
+        f"{index_type.lower()}:nlist={nlist}:m={hnsw_m}:"
+        f"efc={ef_construction}:pq={pq_m}"
+    )
+    if storage.lower() != "float32":
+        description += f":storage={storage.lower()}"
+    return description
+
+
+def recall_at_k(reference_ids: np.ndarray, candidate_ids: np.ndarray) -> float:
+    """Mean fraction of each query's reference neighbours that were found.
+
+    Args:
+        reference_ids: (queries, k) ids from an exact search
+        candidate_ids: (queries, k) ids from the index being evaluated
+    """
+    found = total = 0
+    for reference, candidates in zip(reference_ids, candidate_ids):
+        expected = {int(i) for i in reference if i >= 0}
+        found += len(expected & {int(i) for i in candidates})
+        total += len(expected)
+    return found / total if total else 1.0
@@ -0,0 +1,233 @@
+"""
+On-disk snapshots of the FAISS index and document table
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import faiss
+
+from .document_store import DocumentStore
+from .lexical_index import BM25Index
+from .partitions import PartitionedIndex
+
+AnyIndex = Union["faiss.Index", PartitionedIndex]
+
+
+class IndexSnapshot:
+    """FAISS index plus document table stored under the cache directory.
+
+    Snapshots are keyed by a hash of the raw knowledge base contents, the
+    embedding model name and the index build parameters, so a snapshot is only
+    reused when building the same knowledge base the same way would produce
+    the same index.
+    """
+
+    INDEX_FILE = "index.faiss"
+    DOCUMENTS_FILE = DocumentStore.BLOB_FILE
+    META_FILE = "meta.json"
+    SOURCES_FILE = "sources.npy"
+    METADATA_FILE = "metadata.json"
+    SIGNATURES_FILE = "signatures.npy"
+    LEXICAL_FILE = "bm25.npz"
+    PARTITIONS_DIR = "partitions"
+
+    def __init__(self, cache_dir: Path, key: str):
+        self.key = key
+        self.path = Path(cache_dir) / "index" / key
+
+    @staticmethod
+    def make_key(
+        kb_content: bytes, embedding_model: str, index_params: str = ""
+    ) -> str:
+        """Build a snapshot key from knowledge base bytes, model and index params"""
+        digest = hashlib.sha256()
+        digest.update(embedding_model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(index_params.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(kb_content)
+        return digest.hexdigest()
+
+    @classmethod
+    def for_knowledge_base(
+        cls,
+        cache_dir: Path,
+        kb_content: bytes,
+        embedding_model: str,
+        index_params: str = "",
+    ) -> "IndexSnapshot":
+        """Get the snapshot matching a knowledge base, model and index params"""
+        return cls(cache_dir, cls.make_key(kb_content, embedding_model, index_params))
+
+    def exists(self) -> bool:
+        """Check whether a complete snapshot is stored on disk"""
+        has_index = (self.path / self.INDEX_FILE).is_file() or (
+            self.path / self.PARTITIONS_DIR
+        ).is_dir()
+        return has_index and all(
+            (self.path / name).is_file()
+            for name in (self.DOCUMENTS_FILE, self.META_FILE)
+        )
+
+    def load(self, mmap: bool = False) -> Optional[Tuple[AnyIndex, DocumentStore]]:
+        """Load the index and documents, or None if the snapshot is unusable.
+
+        The documents are always memory-mapped, see DocumentStore.
+
+        Args:
+            mmap: Memory-map the index file instead of reading it into memory
+        """
+        if not self.exists():
+            return None
+
+        import faiss
+
+        try:
+            with open(self.path / self.META_FILE, "r") as f:
+                meta = json.load(f)
+            documents = DocumentStore.open(self.path)
+
+            flags = faiss.IO_FLAG_MMAP if mmap else 0
+            index: AnyIndex
+            if "partitions" in meta:
+                index = PartitionedIndex()
+                for name in meta["partitions"]:
+                    index.partitions[name] = faiss.read_index(
+                        str(self.path / self.PARTITIONS_DIR / f"{name}.faiss"), flags
+                    )
+            else:
+                index = faiss.read_index(str(self.path / self.INDEX_FILE), flags)
+        except Exception as e:
+            print(f"Warning: Failed to read index snapshot: {e}")
+            return None
+
+        if meta.get("key") != self.key or index.ntotal != len(documents):
+            print("Warning: Index snapshot is inconsistent, rebuilding.")
+            return None
+
+        return index, documents
+
+    def load_sources(self) -> Optional[List[Tuple[int, int, int]]]:
+        """Load the chunk sources saved with the snapshot, if any"""
+        try:
+            sources = np.load(self.path / self.SOURCES_FILE, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Failed to read chunk sources: {e}")
+            return None
+        return [tuple(row) for row in sources.tolist()]
+
+    def load_metadata(self) -> Optional[List[Dict[str, str]]]:
+        """Load the document metadata saved with the snapshot, if any"""
+        try:
+            with open(self.path / self.METADATA_FILE, "r", encoding="utf-8") as f:
+                metadata: List[Dict[str, str]] = json.load(f)
+            return metadata
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Failed to read document metadata: {e}")
+            return None
+
+    def load_signatures(self) -> Optional[np.ndarray]:
+        """Load the near-duplicate signatures saved with the snapshot, if any"""
+        try:
+            signatures: np.ndarray = np.load(
+                self.path / self.SIGNATURES_FILE, allow_pickle=False
+            )
+            return signatures
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Failed to read near-duplicate signatures: {e}")
+            return None
+
+    def load_lexical_index(self) -> Optional[BM25Index]:
+        """Load the BM25 index saved with the snapshot, if any"""
+        try:
+            return BM25Index.load(self.path / self.LEXICAL_FILE)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Failed to read BM25 index: {e}")
+            return None
+
+    def save(
+        self,
+        index: AnyIndex,
+        documents: Sequence[str],
+        sources: Optional[List[Tuple[int, int, int]]] = None,
+        metadata: Optional[List[Dict[str, str]]] = None,
+        signatures: Optional[np.ndarray] = None,
+        lexical_index: Optional[BM25Index] = None,
+    ) -> bool:
+        """Write the snapshot atomically, returning True on success.
+
+        Args:
+            index: FAISS index (or partitioned index) whose id ``i`` embeds
+                ``documents[i]``
+            documents: Indexed documents (or chunks)
+            sources: Optional (document id, start, end) of each chunk
+            metadata: Optional metadata of each chunk
+            signatures: Optional MinHash signatures of the kept documents,
+                see NearDuplicateDetector.signatures
+            lexical_index: Optional BM25 index over ``documents``
+        """
+        if index.ntotal != len(documents):
+            return False
+        for extra in (sources, metadata, lexical_index):
+            if extra is not None and len(extra) != len(documents):
+                return False
+
+        import faiss
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.path.parent, prefix=".tmp-"))
+        try:
+            meta = {"key": self.key, "ntotal": index.ntotal}
+            if isinstance(index, PartitionedIndex):
+                (tmp_dir / self.PARTITIONS_DIR).mkdir()
+                for name, partition in index.partitions.items():
+                    faiss.write_index(
+                        partition, str(tmp_dir / self.PARTITIONS_DIR / f"{name}.faiss")
+                    )
+                meta["partitions"] = list(index.partitions)
+            else:
+                faiss.write_index(index, str(tmp_dir / self.INDEX_FILE))
+            if not isinstance(documents, DocumentStore):
+                documents = DocumentStore(documents)
+            documents.save(tmp_dir)
+            with open(tmp_dir / self.META_FILE, "w") as f:
+                json.dump(meta, f)
+            if metadata is not None:
+                with open(tmp_dir / self.METADATA_FILE, "w", encoding="utf-8") as f:
+                    json.dump(metadata, f)
+            if sources is not None:
+                np.save(
+                    tmp_dir / self.SOURCES_FILE,
+                    np.asarray(sources, dtype=np.int64).reshape(-1, 3),
+                    allow_pickle=False,
+                )
+            if signatures is not None:
+                np.save(tmp_dir / self.SIGNATURES_FILE, signatures, allow_pickle=False)
+            if lexical_index is not None:
+                lexical_index.save(tmp_dir / self.LEXICAL_FILE)
+
+            if self.path.exists():
+                shutil.rmtree(self.path)
+            os.replace(tmp_dir, self.path)
+            return True
+        except Exception as e:
+            print(f"Warning: Failed to write index snapshot: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
@@ -0,0 +1,95 @@
+"""
+Reading and writing knowledge base files (JSON arrays or JSON Lines)
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple, Union
+
+PathLike = Union[str, Path]
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+DIGEST_BLOCK_SIZE = 1 << 20
+
+
+def is_jsonl(path: PathLike) -> bool:
+    """Check whether a knowledge base file is line-delimited.
+
+    ``.jsonl`` / ``.ndjson`` files always are; any other file is a JSON array
+    when its first non-blank character is ``[`` and JSON Lines otherwise.
+    """
+    if Path(path).suffix.lower() in JSONL_SUFFIXES:
+        return True
+    with open(path, "rb") as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped:
+                return not stripped.startswith(b"[")
+    return False
+
+
+def iter_jsonl(path: PathLike) -> Iterator[str]:
+    """Stream documents from a JSON Lines file, one line at a time.
+
+    Each non-blank line is a JSON string or an object with a ``text`` field.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON: {e}") from e
+            if isinstance(value, dict):
+                value = value.get("text", "")
+            yield str(value)
+
+
+def count_jsonl(path: PathLike) -> int:
+    """Number of documents in a JSON Lines file, without parsing them"""
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def load_documents(path: PathLike) -> Tuple[Iterable[str], int]:
+    """Open a knowledge base file for reading.
+
+    Returns:
+        (documents, count): a lazy stream for JSON Lines files, which are
+        never held in memory as a whole, or the parsed list for JSON arrays
+    """
+    if is_jsonl(path):
+        return iter_jsonl(path), count_jsonl(path)
+    with open(path, "r", encoding="utf-8") as f:
+        documents = json.load(f)
+    return documents, len(documents)
+
+
+def write_documents(path: PathLike, documents: Iterable[str]) -> int:
+    """Write documents as JSON Lines or a JSON array, chosen by file suffix.
+
+    Returns:
+        Number of documents written
+    """
+    if Path(path).suffix.lower() in JSONL_SUFFIXES:
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for document in documents:
+                f.write(json.dumps(document) + "\n")
+                count += 1
+        return count
+
+    documents_list: List[str] = list(documents)
+    with open(path, "w") as f:
+        json.dump(documents_list, f, indent=2)
+    return len(documents_list)
+
+
+def file_digest(path: PathLike) -> bytes:
+    """SHA256 of a file's contents, read in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DIGEST_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.digest()
@@ -0,0 +1,189 @@
+"""
+In-memory BM25 inverted index and rank fusion for hybrid retrieval
+"""
+
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower-cased word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index with array postings.
+
+    Each term maps to a pair of arrays: the ids of the documents containing it
+    and the term frequency in each. Document ids are positions in insertion
+    order, so they line up with the knowledge base and the FAISS index.
+
+    Each :meth:`add` appends its postings as a new part per term; a term's
+    parts are concatenated once, the first time a query needs it, so
+    indexing in batches stays linear in the number of documents.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        self._length_parts: List[np.ndarray] = []
+        self._num_docs = 0
+
+    def __len__(self) -> int:
+        return self._num_docs
+
+    @property
+    def doc_lengths(self) -> np.ndarray:
+        """Token count of every document"""
+        if not self._length_parts:
+            return np.zeros(0, dtype=np.float32)
+        if len(self._length_parts) > 1:
+            self._length_parts = [np.concatenate(self._length_parts)]
+        return self._length_parts[0]
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Document ids containing a term and its frequency in each"""
+        if term not in self._postings:
+            return None
+        return self._merged_postings(term)
+
+    def _merged_postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenate a term's posting parts into one pair of arrays"""
+        parts = self._postings[term]
+        if len(parts) > 1:
+            ids = np.concatenate([part[0] for part in parts])
+            tfs = np.concatenate([part[1] for part in parts])
+            parts[:] = [(ids, tfs)]
+        return parts[0]
+
+    def add(self, documents: Sequence[str]) -> None:
+        """Index documents, assigning them the next document ids"""
+        if not documents:
+            return
+
+        start = self._num_docs
+        new_postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = []
+        for offset, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                ids, tfs = new_postings.setdefault(term, ([], []))
+                ids.append(start + offset)
+                tfs.append(count)
+
+        for term, (ids, tfs) in new_postings.items():
+            self._postings.setdefault(term, []).append(
+                (np.asarray(ids, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            )
+        self._length_parts.append(np.asarray(lengths, dtype=np.float32))
+        self._num_docs += len(documents)
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the postings and document lengths to an ``.npz`` file"""
+        terms = list(self._postings)
+        postings = [self._merged_postings(term) for term in terms]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids, _ in postings], out=offsets[1:])
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                terms=np.asarray(terms, dtype=str),
+                offsets=offsets,
+                ids=np.concatenate([np.zeros(0, np.int64), *(p[0] for p in postings)]),
+                tfs=np.concatenate(
+                    [np.zeros(0, np.float32), *(p[1] for p in postings)]
+                ),
+                doc_lengths=self.doc_lengths,
+            )
+
+    @classmethod
+    def load(
+        cls, path: Union[str, Path], k1: float = 1.5, b: float = 0.75
+    ) -> "BM25Index":
+        """Read an index written by :meth:`save`"""
+        with np.load(path, allow_pickle=False) as data:
+            terms = data["terms"].tolist()
+            offsets = data["offsets"]
+            ids, tfs = data["ids"], data["tfs"]
+            doc_lengths = data["doc_lengths"]
+        if len(offsets) != len(terms) + 1 or int(offsets[-1]) != len(ids):
+            raise ValueError(f"BM25 postings do not match their offsets in {path}")
+
+        index = cls(k1, b)
+        for term, start, end in zip(terms, offsets[:-1], offsets[1:]):
+            index._postings[term] = [(ids[start:end], tfs[start:end])]
+        index._length_parts = [doc_lengths.astype(np.float32, copy=False)]
+        index._num_docs = len(doc_lengths)
+        return index
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query"""
+        num_docs = self._num_docs
+        scores = np.zeros(num_docs, dtype=np.float32)
+        if num_docs == 0:
+            return scores
+
+        doc_lengths = self.doc_lengths
+        avg_length = max(float(doc_lengths.mean()), 1e-9)
+        for term in set(tokenize(query)):
+            postings = self.postings(term)
+            if postings is None:
+                continue
+            ids, tfs = postings
+            df = len(ids)
+            idf = math.log(1.0 + (num_docs - df + 0.5) / (df + 0.5))
+            lengths = doc_lengths[ids] / avg_length
+            norm = self.k1 * (1.0 - self.b + self.b * lengths)
+            scores[ids] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+        return scores
+
+    def search(
+        self, query: str, k: int, allowed: Optional[np.ndarray] = None
+    ) -> Tuple[List[int], List[float]]:
+        """Top ``k`` matching document ids and their scores, best first.
+
+        ``allowed`` is an optional boolean mask over document ids; documents
+        it excludes never match.
+        """
+        if k <= 0:
+            return [], []
+        scores = self.scores(query)
+        positive = scores > 0
+        if allowed is not None:
+            positive &= allowed
+        matches = np.flatnonzero(positive)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        # Sort by score, breaking ties by document id for stable results
+        order = np.lexsort((matches, -scores[matches]))
+        ids = matches[order]
+        return ids.tolist(), scores[ids].tolist()
+
+    def search_batch(
+        self, queries: Sequence[str], k: int, allowed: Optional[np.ndarray] = None
+    ) -> List[Tuple[List[int], List[float]]]:
+        """Run :meth:`search` for each query"""
+        return [self.search(query, k, allowed) for query in queries]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], k: int = 60
+) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists, scoring each id by sum(1 / (k + rank)).
+
+    Returns ``(id, score)`` pairs, highest score first.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))
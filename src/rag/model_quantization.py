@@ -0,0 +1,47 @@
+"""
+Dynamic int8 quantization of model weights for CPU inference
+"""
+
+from typing import Any
+
+MODEL_PRECISIONS = ("float32", "int8")
+
+
+def quantize_dynamic(model: Any) -> Any:
+    """Quantize a PyTorch model's linear layers to int8, in place.
+
+    Weights are stored as int8 and activations are quantized on the fly, so
+    the layers that dominate transformer inference use about a quarter of
+    the memory and run on integer CPU kernels. Models that are not PyTorch
+    modules (such as the hashing embedder) are returned unchanged.
+    """
+    import torch
+
+    if not isinstance(model, torch.nn.Module):
+        return model
+    return torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def apply_precision(model: Any, precision: str) -> Any:
+    """Return the model converted to a precision from MODEL_PRECISIONS"""
+    if precision not in MODEL_PRECISIONS:
+        raise ValueError(
+            f"Unknown model precision '{precision}', expected one of "
+            f"{MODEL_PRECISIONS}"
+        )
+    if precision == "int8":
+        return quantize_dynamic(model)
+    return model
+
+
+def model_size(model: Any) -> int:
+    """Size in bytes of a PyTorch model's serialized state dict"""
+    import io
+
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
@@ -0,0 +1,188 @@
+"""
+Document metadata, query routing and category-partitioned FAISS indexes
+"""
+
+import re
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import faiss
+
+# (category, document prefix, source) of the documents rag-collect produces
+CATEGORY_PREFIXES = (
+    ("ml", "Machine Learning - ", "wikipedia"),
+    ("scifi", "Sci-Fi Movie:", "tmdb"),
+    ("cosmos", "Cosmos:", "nasa"),
+)
+DEFAULT_CATEGORY = "other"
+DEFAULT_SOURCE = "unknown"
+
+DATE_PATTERN = re.compile(r"\b(?:Release Date|Date): (\d{4}-\d{2}-\d{2})")
+WORD_PATTERN = re.compile(r"\w+")
+
+# Words that point a query at one category, used by route_query
+ROUTING_KEYWORDS = {
+    "ml": {
+        "learning",
+        "neural",
+        "network",
+        "networks",
+        "supervised",
+        "unsupervised",
+        "reinforcement",
+        "overfitting",
+        "feature",
+        "features",
+        "training",
+        "classification",
+        "regression",
+        "ml",
+        "ai",
+    },
+    "scifi": {
+        "movie",
+        "movies",
+        "film",
+        "films",
+        "scifi",
+        "sci",
+        "fiction",
+        "director",
+        "actor",
+        "cinema",
+    },
+    "cosmos": {
+        "cosmos",
+        "galaxy",
+        "galaxies",
+        "planet",
+        "planets",
+        "star",
+        "stars",
+        "nebula",
+        "nasa",
+        "apod",
+        "universe",
+        "telescope",
+        "comet",
+        "asteroid",
+        "moon",
+        "solar",
+    },
+}
+
+
+def document_metadata(text: str) -> Dict[str, str]:
+    """Category, source and date of a document, derived from its text"""
+    category, source = DEFAULT_CATEGORY, DEFAULT_SOURCE
+    for prefix_category, prefix, prefix_source in CATEGORY_PREFIXES:
+        if text.startswith(prefix):
+            category, source = prefix_category, prefix_source
+            break
+
+    match = DATE_PATTERN.search(text)
+    return {
+        "category": category,
+        "source": source,
+        "date": match.group(1) if match else "",
+    }
+
+
+def matches_filters(metadata: Mapping[str, str], filters: Mapping[str, str]) -> bool:
+    """Check whether metadata has every key/value pair of the filters"""
+    return all(metadata.get(key) == value for key, value in filters.items())
+
+
+def route_query(query: str) -> Optional[str]:
+    """Guess the single category a query is about, or None if unclear"""
+    words = set(WORD_PATTERN.findall(query.lower()))
+    hits = [
+        category for category, keywords in ROUTING_KEYWORDS.items() if words & keywords
+    ]
+    return hits[0] if len(hits) == 1 else None
+
+
+class PartitionedIndex:
+    """One FAISS sub-index per partition, searched together or selectively.
+
+    Sub-indexes are wrapped in ``IndexIDMap2`` so that they return global ids
+    (knowledge base positions). A partition's index is created by ``build``
+    from its first batch of embeddings, so each partition gets an index type
+    (and training sample) suited to its own size.
+    """
+
+    def __init__(self, build: Optional[Callable[[np.ndarray], "faiss.Index"]] = None):
+        self.build = build
+        self.partitions: Dict[str, "faiss.Index"] = {}
+
+    @property
+    def ntotal(self) -> int:
+        return sum(index.ntotal for index in self.partitions.values())
+
+    def sub_indexes(self) -> List["faiss.Index"]:
+        """The indexes wrapped by each partition's id map"""
+        import faiss
+
+        return [
+            faiss.downcast_index(index.index)  # type: ignore[attr-defined]
+            for index in self.partitions.values()
+        ]
+
+    def add(
+        self, embeddings: np.ndarray, partitions: Sequence[str], ids: np.ndarray
+    ) -> None:
+        """Add embeddings with their global ids to their partitions"""
+        import faiss
+
+        names = np.asarray(partitions)
+        for name in dict.fromkeys(partitions):
+            rows = np.flatnonzero(names == name)
+            vectors = np.ascontiguousarray(embeddings[rows])
+            if name not in self.partitions:
+                if self.build is None:
+                    raise ValueError(f"No index builder for new partition '{name}'")
+                self.partitions[name] = faiss.IndexIDMap2(self.build(vectors))
+            self.partitions[name].add_with_ids(
+                vectors, np.ascontiguousarray(ids[rows], dtype=np.int64)
+            )
+
+    def search(
+        self, queries: np.ndarray, k: int, partitions: Optional[Sequence[str]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the given partitions (all by default) and merge by distance.
+
+        Returns:
+            (distances, ids) of shape (len(queries), k), padded with inf / -1
+            like a FAISS search
+        """
+        names = self.partitions.keys() if partitions is None else partitions
+        searched = [self.partitions[name] for name in names if name in self.partitions]
+
+        num_queries = len(queries)
+        if not searched:
+            return (
+                np.full((num_queries, k), np.inf, dtype=np.float32),
+                np.full((num_queries, k), -1, dtype=np.int64),
+            )
+
+        results = [index.search(queries, k) for index in searched]
+        distances = np.hstack([d for d, _ in results])
+        ids = np.hstack([i for _, i in results])
+        distances = np.where(ids < 0, np.inf, distances)
+
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return (
+            np.take_along_axis(distances, order, axis=1),
+            np.take_along_axis(ids, order, axis=1),
+        )
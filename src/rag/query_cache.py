@@ -0,0 +1,207 @@
+"""
+Bounded LRU cache for query embeddings with an optional on-disk tier
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """LRU cache mapping normalized query text to its embedding.
+
+    Keys are lower-cased with whitespace collapsed, so "What is  ML?" and
+    "what is ml?" share an entry. Entries older than ``ttl`` seconds are
+    treated as missing. When ``cache_dir`` is given, embeddings are also
+    written to disk and looked up there on a memory miss, so hot queries
+    survive restarts. Disk entries are keyed by ``namespace`` (the embedding
+    model name) as well as the query. Expired disk entries are deleted when
+    read, and once the directory holds more than ``disk_max_size`` files the
+    oldest are deleted down to ``DISK_PRUNE_RATIO`` of it.
+    """
+
+    DIR_NAME = "query_embeddings"
+    DISK_PRUNE_RATIO = 0.9
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 0,
+        cache_dir: Optional[Path] = None,
+        namespace: str = "",
+        disk_max_size: int = 10000,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.namespace = namespace
+        self.path = Path(cache_dir) / self.DIR_NAME if cache_dir else None
+        self.disk_max_size = disk_max_size
+        # Files in the disk tier, counted on the first write
+        self._disk_count: Optional[int] = None
+
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query for use as a cache key"""
+        return " ".join(query.lower().split())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, query: str) -> bool:
+        return self.normalize(query) in self._entries
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for a query, or None on a miss"""
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, embedding = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+        stored = self._read_disk(key)
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(key, stored)
+        return stored
+
+    def put(self, query: str, embedding: np.ndarray) -> None:
+        """Cache the embedding for a query"""
+        if self.max_size <= 0:
+            return
+        key = self.normalize(query)
+        with self._lock:
+            self._store(key, embedding)
+        self._write_disk(key, embedding)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (disk entries are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and eviction counters plus the current size"""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_hits": self.disk_hits,
+        }
+
+    def _store(self, key: str, embedding: np.ndarray) -> None:
+        """Insert an entry and evict least recently used ones (lock held)"""
+        self._entries[key] = (time.monotonic(), embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl > 0 and time.monotonic() - stored_at > self.ttl
+
+    def _disk_file(self, key: str) -> Path:
+        assert self.path is not None
+        digest = hashlib.sha256()
+        digest.update(self.namespace.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(key.encode("utf-8"))
+        return self.path / f"{digest.hexdigest()}.npy"
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        """Load an embedding from the disk tier, if present and fresh"""
+        if self.path is None:
+            return None
+        file = self._disk_file(key)
+        try:
+            if self.ttl > 0 and time.time() - file.stat().st_mtime > self.ttl:
+                file.unlink()
+                return None
+            embedding: np.ndarray = np.load(file, allow_pickle=False)
+            return embedding
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Failed to read cached query embedding: {e}")
+            return None
+
+    def _write_disk(self, key: str, embedding: np.ndarray) -> None:
+        """Write an embedding to the disk tier atomically"""
+        if self.path is None:
+            return
+        file = self._disk_file(key)
+        tmp_name = None
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(embedding), allow_pickle=False)
+            existed = file.exists()
+            os.replace(tmp_name, file)
+        except Exception as e:
+            print(f"Warning: Failed to write cached query embedding: {e}")
+            if tmp_name is not None and os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            return
+
+        with self._lock:
+            if self._disk_count is None:
+                self._disk_count = len(self._disk_files())
+            elif not existed:
+                self._disk_count += 1
+            if self._disk_count <= self.disk_max_size:
+                return
+            self._disk_count = self._prune_disk()
+
+    def _disk_files(self) -> List[Path]:
+        assert self.path is not None
+        return [
+            Path(entry.path)
+            for entry in os.scandir(self.path)
+            if entry.name.endswith(".npy") and not entry.name.startswith(".")
+        ]
+
+    def _prune_disk(self) -> int:
+        """Delete the oldest disk entries, returning how many are left"""
+        files = []
+        for file in self._disk_files():
+            try:
+                files.append((file.stat().st_mtime, file))
+            except FileNotFoundError:
+                continue
+        files.sort()
+        keep = int(self.disk_max_size * self.DISK_PRUNE_RATIO)
+        removed = 0
+        for _, file in files[: max(len(files) - keep, 0)]:
+            try:
+                file.unlink()
+                removed += 1
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"Warning: Failed to remove cached query embedding: {e}")
+        return len(files) - removed
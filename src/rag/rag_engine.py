@@ -2,29 +2,83 @@
 RAG Engine for retrieval-augmented generation
 """
 
-import json
 import os
 import re
 import sys
-from typing import List
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sized,
+    Tuple,
+    Union,
+)
 
-import faiss
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+import numpy as np
 
+from .backends import get_backends
+from .chunking import ChunkSource, chunk_spans, merge_chunks, word_offsets
 from .config import Config
+from .context_packing import pack_context
+from .dedup import NearDuplicateDetector
+from .document_store import DocumentStore
+from .embedding_pipeline import (
+    encode_batches,
+    encoding_pool,
+    iter_batches,
+    progress_printer,
+)
+from .hashing_embedder import HashingEmbedder
+from .index_factory import (
+    build_index,
+    describe_index_params,
+    set_search_params,
+    training_size,
+)
+from .index_store import IndexSnapshot
+from .knowledge_base_file import file_digest, load_documents
+from .lexical_index import BM25Index, reciprocal_rank_fusion
+from .model_quantization import MODEL_PRECISIONS, apply_precision
+from .partitions import (
+    PartitionedIndex,
+    document_metadata,
+    matches_filters,
+    route_query,
+)
+from .query_cache import QueryEmbeddingCache
+from .response_cache import ExactResponseCache, SemanticResponseCache
 from .tools import ToolExecutor
 
-# Optional: use fallback embeddings if SentenceTransformer not available
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError:
-    SentenceTransformer = None  # type: ignore
-    print("Warning: sentence_transformers not installed. Using fallback embeddings.")
+if TYPE_CHECKING:
+    import faiss
+
+# Retrieved passages, semantic cache embedding and exact cache key of a query
+# that is still to be answered by generation
+PendingQuery = Tuple[List[str], Optional[np.ndarray], Optional[str]]
 
 
 class RAGEngine:
     """Retrieval-Augmented Generation engine"""
 
+    # Filtered dense searches fetch this many times k candidates per round
+    FILTER_OVERFETCH = 4
+
+    TOOL_PREFIXES = ("CALC:", "WIKI:", "TIME:")
+    CONTEXT_LABEL = "Context information:"
+    FALLBACK_RESPONSE = (
+        "I couldn't generate a detailed response. "
+        "Please rephrase your query about machine learning, "
+        "sci-fi movies, or cosmos."
+    )
+    TOOLS_UNFINISHED_RESPONSE = (
+        "I used tools but couldn't finalize a response. Try a different query."
+    )
+
     def __init__(self):
         self.config = Config()
         self.tool_executor = ToolExecutor()
@@ -33,40 +87,199 @@ class RAGEngine:
         if not sys.stdin.isatty():
             self.config.MAX_ITERATIONS = 1
 
-        # Initialize models safely
-        self.embedding_model = None
-        if SentenceTransformer is not None:
+        # Inference backend the models are loaded with
+        self.inference_backend = self.config.INFERENCE_BACKEND
+        try:
+            self._embedding_backend, self._generator_backend = get_backends(
+                self.inference_backend, self.config.CACHE_DIR
+            )
+        except ValueError as e:
+            print(f"Warning: {e}. Using torch.")
+            self.inference_backend = "torch"
+            self._embedding_backend, self._generator_backend = get_backends(
+                self.inference_backend, self.config.CACHE_DIR
+            )
+
+        # Precision the models run at; with the backend, part of every cache
+        # key that depends on model outputs
+        self.model_precision = "float32"
+        precision = self.config.MODEL_PRECISION
+        if precision != "float32" and self.inference_backend != "torch":
+            print("Warning: MODEL_PRECISION only applies to the torch backend.")
+        elif precision not in MODEL_PRECISIONS:
+            print(f"Warning: Unknown MODEL_PRECISION '{precision}'. Using float32.")
+        else:
+            self.model_precision = precision
+
+        # Models and the knowledge base load on first use (see warm_up), so
+        # greetings and tool commands are answered without loading anything
+        self._load_lock = threading.RLock()
+        self._embedding_model: Any = None
+        self._tokenizer: Any = None
+        self._generator: Any = None
+        self._embedder_loaded = False
+        self._generator_loaded = False
+        self._knowledge_base_loaded = False
+
+        # Knowledge base: chunks of the ingested documents, one per index row
+        self.knowledge_base = DocumentStore()
+        self.chunk_sources: List[ChunkSource] = []
+        self.chunk_metadata: List[Dict[str, str]] = []
+        self._filter_masks: Dict[Tuple[Tuple[str, str], ...], np.ndarray] = {}
+        self.num_documents = 0
+        self.index = None
+        self.lexical_index = BM25Index()
+        self.deduplicator = (
+            NearDuplicateDetector(threshold=self.config.DEDUP_THRESHOLD)
+            if self.config.DEDUP
+            else None
+        )
+        # Name of the embedder in use, which differs from EMBEDDING_MODEL if
+        # that failed to load; caches and snapshots are keyed by it
+        self.embedding_model_name = self.config.EMBEDDING_MODEL
+        self.query_cache = QueryEmbeddingCache(
+            max_size=self.config.QUERY_CACHE_SIZE,
+            ttl=self.config.QUERY_CACHE_TTL,
+            cache_dir=self.config.CACHE_DIR if self.config.QUERY_CACHE_DISK else None,
+            namespace=self._model_key(self.embedding_model_name),
+            disk_max_size=self.config.QUERY_CACHE_DISK_MAX,
+        )
+        self.response_cache = SemanticResponseCache(
+            max_size=self.config.RESPONSE_CACHE_SIZE,
+            threshold=self.config.RESPONSE_CACHE_THRESHOLD,
+        )
+        self.exact_cache = ExactResponseCache(
+            max_size=self.config.EXACT_CACHE_SIZE,
+            cache_file=(
+                self.config.CACHE_DIR / "responses.jsonl"
+                if self.config.EXACT_CACHE_DISK
+                else None
+            ),
+        )
+
+    @property
+    def embedding_model(self) -> Any:
+        """Embedding model, loaded on first use"""
+        if not self._embedder_loaded:
+            self._load_embedder()
+        return self._embedding_model
+
+    @embedding_model.setter
+    def embedding_model(self, model: Any) -> None:
+        self._embedding_model = model
+        self._embedder_loaded = True
+
+    @property
+    def tokenizer(self) -> Any:
+        """Generator tokenizer, loaded with the generator on first use"""
+        if not self._generator_loaded:
+            self._load_generator()
+        return self._tokenizer
+
+    @tokenizer.setter
+    def tokenizer(self, tokenizer: Any) -> None:
+        self._tokenizer = tokenizer
+        self._generator_loaded = True
+
+    @property
+    def generator(self) -> Any:
+        """Seq2seq generator, loaded on first use (None if it failed to load)"""
+        if not self._generator_loaded:
+            self._load_generator()
+        return self._generator
+
+    @generator.setter
+    def generator(self, generator: Any) -> None:
+        self._generator = generator
+        self._generator_loaded = True
+
+    def _load_embedder(self) -> None:
+        """Load the embedding model, falling back to hashing embeddings"""
+        with self._load_lock:
+            if self._embedder_loaded:
+                return
+            model = None
+            name = self.config.EMBEDDING_MODEL
             try:
-                self.embedding_model = SentenceTransformer(self.config.EMBEDDING_MODEL)
+                if HashingEmbedder.handles(name):
+                    model = HashingEmbedder.from_name(name)
+                else:
+                    model = self._embedding_backend.load(name)
+            except Exception as e:
+                print(f"Warning: Failed to load embedding model ({e}). Using fallback.")
+
+            if model is None:
+                # Keep vector search working without a model download; caches
+                # are keyed by model name, so record the embedder in use
+                model = HashingEmbedder()
+                self.embedding_model_name = model.name
+                self.query_cache.namespace = self._model_key(model.name)
+            self.embedding_model = self._apply_precision(model)
+
+    def _load_generator(self) -> None:
+        """Load the generator and its tokenizer, or neither if loading fails"""
+        with self._load_lock:
+            if self._generator_loaded:
+                return
+            try:
+                tokenizer, generator = self._generator_backend.load(
+                    self.config.GENERATOR_MODEL
+                )
+                generator = self._apply_precision(generator)
             except Exception:
-                print("Warning: Failed to load embedding model. Using fallback.")
+                print(
+                    "Warning: Failed to load generator model. "
+                    "Responses may be limited."
+                )
+                tokenizer, generator = None, None
+            self._tokenizer = tokenizer
+            self.generator = generator
 
+    def _apply_precision(self, model: Any) -> Any:
+        """Convert a freshly loaded model to MODEL_PRECISION"""
+        if self.model_precision == "float32":
+            return model
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.config.GENERATOR_MODEL)
-            self.generator = AutoModelForSeq2SeqLM.from_pretrained(
-                self.config.GENERATOR_MODEL
-            )
-        except Exception:
-            print("Warning: Failed to load generator model. Responses may be limited.")
-            self.tokenizer = None
-            self.generator = None
+            return apply_precision(model, self.model_precision)
+        except Exception as e:
+            print(f"Warning: Failed to quantize model. Using float32: {e}")
+            return model
 
-        # Knowledge base
-        self.knowledge_base = []
-        self.index = None
-        self.query_cache = {}
+    def _ensure_knowledge_base(self) -> None:
+        """Load the knowledge base file the first time it is needed"""
+        with self._load_lock:
+            if not self._knowledge_base_loaded:
+                self.load_knowledge_base()
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """Load the models and the knowledge base ahead of the first query.
 
-        # Load knowledge base
-        self.load_knowledge_base()
+        With ``background`` the loading runs in a daemon thread, which is
+        returned, so an interactive session can take input right away;
+        queries asked meanwhile wait only for what they need.
+        """
+        if not background:
+            self._warm_up()
+            return None
+        thread = threading.Thread(target=self._warm_up, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self) -> None:
+        """Load everything that is loaded lazily"""
+        try:
+            self._ensure_knowledge_base()
+            self._load_embedder()
+            self._load_generator()
+        except Exception as e:
+            print(f"Warning: Warm-up failed: {e}")
 
     def load_knowledge_base(self):
         """Load documents from knowledge base file"""
+        self._knowledge_base_loaded = True
         kb_path = os.path.join(self.config.DATASET_DIR, self.config.KNOWLEDGE_BASE_FILE)
         try:
-            with open(kb_path, "r") as f:
-                documents = json.load(f)
-                self.add_documents(documents)
-                print(f"Loaded {len(documents)} documents from knowledge base")
+            kb_digest = file_digest(kb_path)
         except FileNotFoundError:
             print(f"Knowledge base not found at {kb_path}. Using fallback docs.")
             fallback_docs = [
@@ -75,57 +288,893 @@ class RAGEngine:
                 "Science fiction explores futuristic concepts and advanced technology.",
             ]
             self.add_documents(fallback_docs)
-
-    def add_documents(self, documents: List[str]):
-        """Add documents to knowledge base and create FAISS index if embeddings exist"""
-        if not documents:
             return
 
-        self.knowledge_base.extend(documents)
+        snapshot = self._get_snapshot(kb_digest)
+        if snapshot is not None:
+            loaded = snapshot.load(mmap=self.config.INDEX_MMAP)
+            signatures = (
+                snapshot.load_signatures() if self.deduplicator is not None else None
+            )
+            if loaded is not None and (
+                self.deduplicator is None or signatures is not None
+            ):
+                self.index, self.knowledge_base = loaded
+                if isinstance(self.index, PartitionedIndex):
+                    self.index.build = self._build_index
+                self._apply_search_params(self.index)
+                lexical_index = snapshot.load_lexical_index()
+                if lexical_index is None or len(lexical_index) != len(
+                    self.knowledge_base
+                ):
+                    # Snapshots from before BM25 was saved with them
+                    lexical_index = BM25Index()
+                    lexical_index.add(self.knowledge_base)
+                self.lexical_index = lexical_index
+                self.response_cache.clear()
+                sources = snapshot.load_sources()
+                if sources is None or len(sources) != len(self.knowledge_base):
+                    # Treat every stored row as a whole document
+                    sources = [
+                        (i, 0, len(doc)) for i, doc in enumerate(self.knowledge_base)
+                    ]
+                self.chunk_sources = sources
+                self.num_documents = max((s[0] for s in sources), default=-1) + 1
+                metadata = snapshot.load_metadata()
+                if metadata is None or len(metadata) != len(self.knowledge_base):
+                    metadata = [document_metadata(doc) for doc in self.knowledge_base]
+                self.chunk_metadata = metadata
+                if self.deduplicator is not None and signatures is not None:
+                    # Later documents are checked against the loaded ones too
+                    self.deduplicator.add_signatures(signatures)
+                print(
+                    f"Loaded {len(self.knowledge_base)} documents from index snapshot"
+                )
+                return
+
+        documents, count = load_documents(kb_path)
+        self.add_documents(documents, count)
+        print(f"Loaded {count} documents from knowledge base")
+
+        if snapshot is not None and self.index is not None:
+            signatures = (
+                self.deduplicator.signatures()
+                if self.deduplicator is not None
+                else None
+            )
+            snapshot.save(
+                self.index,
+                self.knowledge_base,
+                self.chunk_sources,
+                self.chunk_metadata,
+                signatures,
+                self.lexical_index,
+            )
 
+    def _model_key(self, model_name: str) -> str:
+        """Model name qualified by the backend and precision models run with"""
+        if self.inference_backend != "torch":
+            model_name = f"{model_name}:{self.inference_backend}"
+        if self.model_precision != "float32":
+            model_name = f"{model_name}:{self.model_precision}"
+        return model_name
+
+    def _get_snapshot(self, kb_digest: bytes) -> Optional[IndexSnapshot]:
+        """Get the index snapshot for the knowledge base, if snapshots apply"""
+        if not self.config.INDEX_SNAPSHOT or not self.embedding_model:
+            return None
+        # Snapshots describe a whole index, not one appended to existing docs
+        if self.knowledge_base or self.index is not None:
+            return None
+        index_params = describe_index_params(
+            self.config.INDEX_TYPE,
+            self.config.INDEX_NLIST,
+            self.config.INDEX_HNSW_M,
+            self.config.INDEX_EF_CONSTRUCTION,
+            self.config.INDEX_PQ_M,
+            self.config.INDEX_STORAGE,
+        )
+        chunk_tokenizer = (
+            self.config.GENERATOR_MODEL if self._has_offset_tokenizer() else "words"
+        )
+        chunk_params = (
+            f"chunks={self.config.CHUNK_TOKENS},{self.config.CHUNK_OVERLAP},"
+            f"{chunk_tokenizer}"
+        )
+        if self.config.PARTITION_INDEX:
+            index_params += ":partitioned"
+        # Deduplication decides which documents the snapshot holds
+        dedup_params = (
+            f"dedup={self.config.DEDUP_THRESHOLD}" if self.config.DEDUP else "dedup=off"
+        )
+        return IndexSnapshot.for_knowledge_base(
+            self.config.CACHE_DIR,
+            kb_digest,
+            self._model_key(self.embedding_model_name),
+            f"{index_params}:{chunk_params}:{dedup_params}",
+        )
+
+    def add_documents(self, documents: Iterable[str], expected_count: int = 0) -> None:
+        """Add documents to the knowledge base and append them to the FAISS index.
+
+        With ``DEDUP`` enabled, documents that are near-duplicates of one
+        already added (or of an earlier one in the batch) are skipped.
+        Documents are split into overlapping windows of ``CHUNK_TOKENS``
+        generator tokens; each chunk becomes one knowledge base entry and
+        ``self.chunk_sources`` records its parent document id and character
+        span, and ``self.chunk_metadata`` the category, source and date of
+        the parent document. Only the new chunks are encoded; id ``i`` of the
+        index always refers to ``self.knowledge_base[i]``. With
+        ``PARTITION_INDEX`` the index keeps one sub-index per category. The
+        index type is chosen when the index (or partition) is first built, so
+        later batches are appended to the same (already trained) index.
+
+        ``documents`` may be a list or a stream, such as the one
+        ``load_documents`` returns for JSON Lines files. It is consumed
+        ``KB_BATCH_SIZE`` documents at a time, so a stream is never held in
+        memory as a whole.
+
+        Args:
+            documents: Documents to add
+            expected_count: Number of documents in a stream, used to choose
+                the type of a new index before the stream ends (defaults to
+                the length of a list)
+        """
+        self._ensure_knowledge_base()
+        if not expected_count and isinstance(documents, Sized):
+            expected_count = len(documents)
+
+        batches = self._ingest_batches(documents, expected_count)
         if self.embedding_model:
-            embeddings = self.embedding_model.encode(documents)
-            dimension = int(embeddings.shape[1])  # type: ignore
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(embeddings)  # type: ignore
+            self._index_batches(batches, expected_count)
         else:
-            self.index = None  # fallback: no index
+            for _ in batches:
+                pass
+
+    def _ingest_batches(
+        self, documents: Iterable[str], expected_count: int
+    ) -> Iterator[Tuple[int, List[str], List[Dict[str, str]]]]:
+        """Deduplicate and chunk documents one batch at a time.
+
+        Yields the (first knowledge base id, chunks, metadata) to embed for
+        each batch, then adds the batch to the knowledge base and the lexical
+        index once the consumer asks for the next one.
+        """
+        progress = (
+            progress_printer("Indexing documents")
+            if expected_count > self.config.KB_BATCH_SIZE
+            else None
+        )
+        skipped = 0
+        read = 0
+        first_batch = True
+        for _, batch in iter_batches(documents, self.config.KB_BATCH_SIZE):
+            read += len(batch)
+            if self.deduplicator is not None:
+                batch, dropped = self.deduplicator.filter(batch)
+                skipped += len(dropped)
+
+            if batch:
+                chunks, sources, metadata = self._chunk_documents(batch)
+                if first_batch and self.index is None and self.knowledge_base:
+                    # Index was never built for earlier documents, cover them
+                    # too so that index ids stay aligned with knowledge base
+                    # positions.
+                    yield (
+                        0,
+                        list(self.knowledge_base) + chunks,
+                        self.chunk_metadata + metadata,
+                    )
+                else:
+                    yield len(self.knowledge_base), chunks, metadata
+                first_batch = False
+
+                self.lexical_index.add(chunks)
+                self.knowledge_base.extend(chunks)
+                self.chunk_sources.extend(sources)
+                self.chunk_metadata.extend(metadata)
+                self._filter_masks.clear()
+                self.response_cache.clear()
 
-    def retrieve_context(self, query: str) -> List[str]:
+            if progress is not None:
+                progress(read, max(read, expected_count))
+
+        if skipped:
+            print(
+                f"Skipped {skipped} of {read} documents as near-duplicates "
+                f"(DEDUP_THRESHOLD={self.config.DEDUP_THRESHOLD})"
+            )
+
+    def _chunk_documents(
+        self, documents: List[str]
+    ) -> Tuple[List[str], List[ChunkSource], List[Dict[str, str]]]:
+        """Split documents into token-window chunks with sources and metadata"""
+        chunks: List[str] = []
+        sources: List[ChunkSource] = []
+        metadata: List[Dict[str, str]] = []
+        for doc_id, document in enumerate(documents, start=self.num_documents):
+            document_meta = document_metadata(document)
+            spans = chunk_spans(
+                self._token_offsets(document),
+                len(document),
+                self.config.CHUNK_TOKENS,
+                self.config.CHUNK_OVERLAP,
+            )
+            for start, end in spans:
+                chunks.append(document[start:end])
+                sources.append((doc_id, start, end))
+                metadata.append(document_meta)
+        self.num_documents += len(documents)
+        return chunks, sources, metadata
+
+    def _has_offset_tokenizer(self) -> bool:
+        """Check whether the generator tokenizer can report character offsets"""
+        return getattr(self.tokenizer, "is_fast", False) is True
+
+    def _token_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Character offsets of the generator tokens in text (or of words)"""
+        if not self._has_offset_tokenizer():
+            return word_offsets(text)
+        encoding = self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False,
+        )
+        return [tuple(span) for span in encoding["offset_mapping"]]
+
+    def _build_index(
+        self, embeddings: np.ndarray, num_documents: int = 0
+    ) -> "faiss.Index":
+        """Create and train an empty index configured for the embeddings"""
+        index = build_index(
+            embeddings,
+            num_documents=num_documents,
+            index_type=self.config.INDEX_TYPE,
+            nlist=self.config.INDEX_NLIST,
+            hnsw_m=self.config.INDEX_HNSW_M,
+            ef_construction=self.config.INDEX_EF_CONSTRUCTION,
+            pq_m=self.config.INDEX_PQ_M,
+            train_size=self.config.INDEX_TRAIN_SIZE,
+            storage=self.config.INDEX_STORAGE,
+        )
+        self._apply_search_params(index)
+        return index
+
+    def _apply_search_params(
+        self, index: Union["faiss.Index", PartitionedIndex]
+    ) -> None:
+        """Apply the configured nprobe / efSearch to an index (or partitions)"""
+        indexes = (
+            index.sub_indexes() if isinstance(index, PartitionedIndex) else [index]
+        )
+        for sub_index in indexes:
+            set_search_params(
+                sub_index,
+                nprobe=self.config.INDEX_NPROBE,
+                ef_search=self.config.INDEX_EF_SEARCH,
+            )
+
+    def _index_batches(
+        self,
+        batches: Iterator[Tuple[int, List[str], List[Dict[str, str]]]],
+        expected_count: int,
+    ) -> None:
+        """Encode batches of chunks and stream them into the index.
+
+        Chunks are encoded ``EMBED_BATCH_SIZE`` at a time (by
+        ``EMBED_WORKERS`` processes when set, started once for all batches)
+        and each batch is added as soon as it is ready. Only when the index does not exist yet are the first
+        embeddings held back, until there are enough to choose and train it,
+        so peak memory is bounded by the training sample rather than the
+        corpus.
+        """
+        assert self.embedding_model is not None
+
+        # Embeddings to collect before the index can be created and trained
+        needed = 1
+        if self.index is None and (self.config.PARTITION_INDEX or not expected_count):
+            needed = self.config.INDEX_TRAIN_SIZE
+        elif self.index is None:
+            needed = training_size(
+                expected_count,
+                self.config.INDEX_TYPE,
+                self.config.INDEX_NLIST,
+                self.config.INDEX_TRAIN_SIZE,
+                self.config.INDEX_STORAGE,
+            )
+        needed = max(needed, 1)
+
+        # Worker processes are only worth starting for more than one batch
+        workers = self.config.EMBED_WORKERS
+        if expected_count and expected_count <= self.config.EMBED_BATCH_SIZE:
+            workers = 0
+
+        pending: List[Tuple[int, np.ndarray, List[Dict[str, str]]]] = []
+        with encoding_pool(self.embedding_model, workers) as pool:
+            for start, chunks, metadata in batches:
+                encoded = encode_batches(
+                    self.embedding_model,
+                    chunks,
+                    batch_size=self.config.EMBED_BATCH_SIZE,
+                    workers=workers,
+                    pool=pool,
+                )
+                for offset, embeddings in encoded:
+                    batch_metadata = metadata[offset : offset + len(embeddings)]
+                    if self.index is not None:
+                        self._add_embeddings(embeddings, start + offset, batch_metadata)
+                        continue
+                    pending.append((start + offset, embeddings, batch_metadata))
+                    if sum(len(batch) for _, batch, _ in pending) >= needed:
+                        self._build_from_pending(pending, expected_count)
+                        pending = []
+
+        if pending:
+            self._build_from_pending(pending, expected_count)
+
+    def _build_from_pending(
+        self,
+        pending: List[Tuple[int, np.ndarray, List[Dict[str, str]]]],
+        expected_count: int,
+    ) -> None:
+        """Create the index from the buffered embeddings and add them to it"""
+        sample = np.concatenate([embeddings for _, embeddings, _ in pending])
+        if self.config.PARTITION_INDEX:
+            # Added in one call so that each partition's index is created and
+            # trained from its whole share of the sample, not the first batch
+            self.index = PartitionedIndex(self._build_index)
+            ids = np.concatenate(
+                [
+                    np.arange(start, start + len(embeddings), dtype=np.int64)
+                    for start, embeddings, _ in pending
+                ]
+            )
+            categories = [
+                meta["category"]
+                for _, embeddings, metadata in pending
+                for meta in metadata[: len(embeddings)]
+            ]
+            self.index.add(sample, categories, ids)
+            return
+
+        self.index = self._build_index(sample, max(expected_count, len(sample)))
+        for start, embeddings, metadata in pending:
+            self._add_embeddings(embeddings, start, metadata)
+
+    def _add_embeddings(
+        self, embeddings: np.ndarray, start: int, metadata: List[Dict[str, str]]
+    ) -> None:
+        """Add embeddings for knowledge base ids start, start + 1, ..."""
+        if isinstance(self.index, PartitionedIndex):
+            ids = np.arange(start, start + len(embeddings), dtype=np.int64)
+            categories = [meta["category"] for meta in metadata[: len(embeddings)]]
+            self.index.add(embeddings, categories, ids)
+        else:
+            self.index.add(embeddings)  # type: ignore
+
+    def retrieve_context(
+        self, query: str, filters: Optional[Dict[str, str]] = None
+    ) -> List[str]:
         """Retrieve most relevant documents for a query"""
-        if not self.index or len(self.knowledge_base) == 0:
-            return self.knowledge_base[: self.config.TOP_K_RETRIEVAL]
+        return self.retrieve_context_batch([query], filters)[0][0]
+
+    def retrieve_context_batch(
+        self, queries: List[str], filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[List[str], List[float]]]:
+        """Retrieve the most relevant documents for several queries at once.
+
+        Depending on ``RETRIEVAL_MODE`` queries are matched against the FAISS
+        index ("dense"), the BM25 index ("lexical") or both, fused with
+        reciprocal rank fusion ("hybrid"). Lexical search is used on its own
+        whenever there is no embedding model or index. For dense search,
+        uncached queries are encoded in a single embedding call and all
+        queries are searched with one FAISS call over the stacked matrix.
+
+        Args:
+            queries: Queries to retrieve documents for
+            filters: Metadata (``category``, ``source``, ``date``) that every
+                result must match, e.g. ``{"category": "cosmos"}``. With a
+                partitioned index, a category filter only searches that
+                partition. Without filters, ``PARTITION_ROUTER`` restricts
+                queries that clearly name one category to it.
+
+        Returns:
+            One ``(documents, scores)`` pair per query. Scores are FAISS
+            distances (lower is closer) for dense retrieval, BM25 scores for
+            lexical retrieval and fused scores for hybrid retrieval (higher is
+            closer for both). Queries without any match get the first
+            (matching) documents of the knowledge base and no scores.
+        """
+        self._ensure_knowledge_base()
+        top_k = self.config.TOP_K_RETRIEVAL
+        results: List[Tuple[List[str], List[float]]] = [
+            (self.knowledge_base[:top_k], []) for _ in queries
+        ]
+        if not queries or len(self.knowledge_base) == 0:
+            return results
+
+        groups: Dict[Tuple[Tuple[str, str], ...], List[int]] = {}
+        for i, query in enumerate(queries):
+            query_filters = filters or self._route(query) or {}
+            groups.setdefault(tuple(sorted(query_filters.items())), []).append(i)
+
+        for key, positions in groups.items():
+            group_results = self._retrieve_group(
+                [queries[i] for i in positions], dict(key)
+            )
+            for i, result in zip(positions, group_results):
+                results[i] = result
+        return results
+
+    def _route(self, query: str) -> Optional[Dict[str, str]]:
+        """Category filter for a query when query routing is enabled"""
+        if not self.config.PARTITION_ROUTER:
+            return None
+        category = route_query(query)
+        if category is None:
+            return None
+        route = {"category": category}
+        return route if self._filter_mask(route).any() else None
 
-        if len(query.split()) < 2:
-            return self.knowledge_base[: self.config.TOP_K_RETRIEVAL]
+    def _retrieve_group(
+        self, queries: List[str], filters: Dict[str, str]
+    ) -> List[Tuple[List[str], List[float]]]:
+        """Retrieve documents for queries that share the same filters"""
+        top_k = self.config.TOP_K_RETRIEVAL
+        mask = self._filter_mask(filters) if filters else None
 
-        if query in self.query_cache:
-            query_embedding = self.query_cache[query]
+        mode = self.config.RETRIEVAL_MODE
+        use_dense = (
+            mode != "lexical"
+            and self.index is not None
+            and self.embedding_model is not None
+        )
+        use_lexical = mode != "dense" or not use_dense
+
+        depth = top_k
+        if use_dense and use_lexical:
+            depth = max(top_k, self.config.HYBRID_CANDIDATES)
+
+        dense: Optional[List[Tuple[List[int], List[float]]]] = None
+        lexical: Optional[List[Tuple[List[int], List[float]]]] = None
+        if use_dense:
+            dense = self._dense_search(queries, depth, filters, mask)
+        if use_lexical:
+            lexical = self.lexical_index.search_batch(queries, depth, allowed=mask)
+
+        if mask is None:
+            fallback_ids = list(range(min(top_k, len(self.knowledge_base))))
         else:
-            assert self.embedding_model is not None
-            query_embedding = self.embedding_model.encode([query])
-            self.query_cache[query] = query_embedding
+            fallback_ids = np.flatnonzero(mask)[:top_k].tolist()
+
+        results = []
+        for i in range(len(queries)):
+            if dense is not None and lexical is not None:
+                fused = reciprocal_rank_fusion(
+                    [dense[i][0], lexical[i][0]], k=self.config.RRF_K
+                )[:top_k]
+                ids = [doc_id for doc_id, _ in fused]
+                scores = [score for _, score in fused]
+            elif dense is not None:
+                ids, scores = dense[i]
+            else:
+                assert lexical is not None
+                ids, scores = lexical[i]
+
+            if ids:
+                results.append(self._passages(ids, scores))
+            else:
+                results.append(([self.knowledge_base[idx] for idx in fallback_ids], []))
+        return results
+
+    def _filter_mask(self, filters: Dict[str, str]) -> np.ndarray:
+        """Boolean mask of the knowledge base entries matching the filters"""
+        key = tuple(sorted(filters.items()))
+        if key not in self._filter_masks:
+            self._filter_masks[key] = np.fromiter(
+                (matches_filters(meta, filters) for meta in self.chunk_metadata),
+                dtype=bool,
+                count=len(self.chunk_metadata),
+            )
+        return self._filter_masks[key]
+
+    def _passages(
+        self, ids: List[int], scores: List[float]
+    ) -> Tuple[List[str], List[float]]:
+        """Turn ranked chunk ids into passages, merging chunks if configured"""
+        if not self.config.CHUNK_MERGE:
+            return [self.knowledge_base[idx] for idx in ids], scores
+
+        merged = merge_chunks(
+            [(self.chunk_sources[idx], self.knowledge_base[idx]) for idx in ids]
+        )
+        # A merged passage takes the score of its best ranked chunk
+        return [passage for _, passage in merged], [
+            scores[positions[0]] for positions, _ in merged
+        ]
+
+    def _dense_search(
+        self,
+        queries: List[str],
+        k: int,
+        filters: Optional[Dict[str, str]] = None,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[List[int], List[float]]]:
+        """Search the FAISS index, returning document ids and distances.
 
-        distances, indices = self.index.search(
-            query_embedding, self.config.TOP_K_RETRIEVAL
-        )  # type: ignore
+        A category filter on a partitioned index selects the partition to
+        search; any other filter is applied to the hits, fetching more
+        candidates until every query has ``k`` matches or the index is
+        exhausted.
+        """
+        assert self.index is not None
+        query_embeddings = self._embed_queries(queries)
 
-        retrieved_docs = [self.knowledge_base[idx] for idx in indices[0]]
-        return retrieved_docs
+        partitions = None
+        post_filter = mask is not None
+        if isinstance(self.index, PartitionedIndex) and filters:
+            if "category" in filters:
+                partitions = [filters["category"]]
+                post_filter = any(key != "category" for key in filters)
+
+        fetch = k * self.FILTER_OVERFETCH if post_filter else k
+        while True:
+            if isinstance(self.index, PartitionedIndex):
+                distances, indices = self.index.search(
+                    query_embeddings, fetch, partitions
+                )
+            else:
+                distances, indices = self.index.search(query_embeddings, fetch)
+
+            results = []
+            for row in range(len(queries)):
+                # FAISS pads with -1 when fewer than k documents are indexed
+                hits = [
+                    (int(idx), float(distance))
+                    for idx, distance in zip(indices[row], distances[row])
+                    if 0 <= idx < len(self.knowledge_base)
+                    and (not post_filter or mask[idx])  # type: ignore
+                ][:k]
+                results.append(([idx for idx, _ in hits], [d for _, d in hits]))
+
+            if not post_filter or fetch >= self.index.ntotal:
+                return results
+            if all(len(ids) >= k for ids, _ in results):
+                return results
+            fetch *= 2
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries through the cache, encoding all misses in one call"""
+        cached = [self.query_cache.get(query) for query in queries]
+
+        missing: Dict[str, str] = {}
+        for query, embedding in zip(queries, cached):
+            if embedding is None:
+                missing.setdefault(QueryEmbeddingCache.normalize(query), query)
+
+        encoded: Dict[str, np.ndarray] = {}
+        if missing:
+            assert self.embedding_model is not None
+            embeddings = self.embedding_model.encode(list(missing.values()))
+            for key, query, embedding in zip(
+                missing.keys(), missing.values(), embeddings
+            ):
+                encoded[key] = np.asarray(embedding).reshape(1, -1)
+                self.query_cache.put(query, encoded[key])
+
+        rows = [
+            (
+                embedding
+                if embedding is not None
+                else encoded[QueryEmbeddingCache.normalize(query)]
+            )
+            for query, embedding in zip(queries, cached)
+        ]
+        return np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
 
     def generate_response(self, query: str) -> str:
         """Generate response using RAG with tool support"""
+        return self.generate_response_batch([query])[0]
+
+    def generate_response_stream(self, query: str) -> Iterator[str]:
+        """Generate the response to a query, yielding text as it is decoded.
+
+        Follows the same agent loop and caches as :meth:`generate_response`,
+        whose answer is the concatenation of the yielded pieces. Cached and
+        shortcut answers are yielded whole. Generated text is held back only
+        until it is at least three words long and cannot be a tool command;
+        from then on each decoded piece is yielded as soon as the generator
+        produces it.
+        """
         query = query.strip().strip('"').strip("'")
+        (answer,), pending = self._prepare_responses([query])
+        if answer is not None:
+            yield answer
+            return
+
+        passages, query_embedding, exact_key = pending[0]
+        tool_results: List[str] = []
+        encoded: Dict[str, Any] = {}
+        for _ in range(self.config.MAX_ITERATIONS):
+            if self.config.ENCODER_REUSE:
+                segments = self._prompt_segments(passages, tool_results, query)
+                self._encode_segments(
+                    [segment for segment in segments if segment not in encoded],
+                    encoded,
+                )
+                inputs = self._segment_inputs([segments], encoded)
+            else:
+                inputs = self.tokenizer(
+                    self._pack_prompt(passages, tool_results, query),
+                    return_tensors="pt",
+                    max_length=self.config.MAX_INPUT_TOKENS,
+                    truncation=True,
+                )
+
+            response = ""
+            streaming = False
+            for piece in self._stream_generate(inputs):
+                response += piece
+                if streaming:
+                    yield piece
+                elif len(response.split()) >= 3 and not self._may_be_tool(response):
+                    streaming = True
+                    yield response
+
+            if not streaming and self._run_tool(response, tool_results):
+                continue
+
+            response = self._finish_response(
+                response, tool_results, query_embedding, exact_key
+            )
+            if not streaming:
+                yield response
+            return
+
+        yield self.TOOLS_UNFINISHED_RESPONSE
+
+    def _may_be_tool(self, text: str) -> bool:
+        """Whether generated text is or may still become a tool command"""
+        head = text.upper()
+        return any(
+            head.startswith(prefix) or prefix.startswith(head)
+            for prefix in self.TOOL_PREFIXES
+        )
+
+    def _stream_generate(self, inputs: Dict[str, Any]) -> Iterator[str]:
+        """Run one generation, yielding decoded text as tokens are produced.
+
+        Generation runs in a background thread feeding a transformers
+        ``TextIteratorStreamer``. Beam search cannot stream, so with
+        ``DECODING=beam`` the finished answer is yielded in one piece.
+        """
+        from transformers import TextIteratorStreamer
+
+        assert self.tokenizer is not None and self.generator is not None
+        params = self._decode_params()
+        if params.get("num_beams", 1) > 1:
+            outputs = self.generator.generate(**inputs, **params)
+            yield self.tokenizer.batch_decode(outputs, skip_special_tokens=True)[0]
+            return
+
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True
+        )
+        generator = self.generator
+        errors: List[BaseException] = []
+
+        def generate() -> None:
+            try:
+                generator.generate(**inputs, **params, streamer=streamer)
+            except BaseException as e:
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=generate, daemon=True)
+        thread.start()
+        try:
+            for piece in streamer:
+                if piece:
+                    yield piece
+        finally:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def generate_response_batch(self, queries: List[str]) -> List[str]:
+        """Generate responses for several queries with batched generation.
+
+        Greetings and tool commands are answered per query. The remaining
+        queries are retrieved as one batch and run through the generator in
+        padded batches of ``GENERATION_BATCH_SIZE``; each query keeps its own
+        passages and tool results across agent-loop iterations, so a query
+        that asked for a tool is regenerated with the tool result while
+        finished ones drop out.
+
+        Queries similar enough to one answered before are served from the
+        semantic response cache without retrieval or generation. With
+        deterministic ``DECODING``, a query asked again with the same
+        retrieved context is answered from the exact response cache without
+        generation. Answers that needed a tool are not cached, since tool
+        results can change.
+        """
+        queries = [query.strip().strip('"').strip("'") for query in queries]
+        responses, pending_queries = self._prepare_responses(queries)
+        pending = list(pending_queries)
+        tool_results: Dict[int, List[str]] = {i: [] for i in pending}
+
+        # Encoder states of prompt segments, kept across iterations
+        encoded: Dict[str, Any] = {}
+        for _ in range(self.config.MAX_ITERATIONS if pending else 0):
+            outputs = self._generate_step(
+                [(pending_queries[i][0], tool_results[i], queries[i]) for i in pending],
+                encoded,
+            )
+
+            still_pending = []
+            for i, response in zip(pending, outputs):
+                if self._run_tool(response, tool_results[i]):
+                    still_pending.append(i)
+                    continue
+                _, query_embedding, exact_key = pending_queries[i]
+                responses[i] = self._finish_response(
+                    response, tool_results[i], query_embedding, exact_key
+                )
+            pending = still_pending
+            if not pending:
+                break
+
+        for i in pending:
+            responses[i] = self.TOOLS_UNFINISHED_RESPONSE
+        return [response or "" for response in responses]
+
+    def _prepare_responses(
+        self, queries: List[str]
+    ) -> Tuple[List[Optional[str]], Dict[int, PendingQuery]]:
+        """Answer what can be answered without generation, prepare the rest.
+
+        Greetings and tool commands are answered directly, then queries are
+        looked up in the semantic response cache, their context retrieved
+        and looked up in the exact response cache. Without a generator the
+        remaining queries are answered with their best passage.
+
+        Returns:
+            The answer of each query (None where generation is needed) and,
+            by query position, the retrieved passages, semantic cache
+            embedding and exact cache key of each query still to generate
+        """
+        responses: List[Optional[str]] = [
+            self._shortcut_response(query) for query in queries
+        ]
+        pending = [i for i, response in enumerate(responses) if response is None]
+        if not pending:
+            return responses, {}
+
+        query_embeddings: Dict[int, np.ndarray] = {}
+        if self._uses_response_cache():
+            embeddings = self._embed_queries([queries[i] for i in pending])
+            cached = self.response_cache.get_batch(embeddings)
+            for i, embedding, response in zip(pending, embeddings, cached):
+                query_embeddings[i] = embedding
+                responses[i] = response
+            pending = [i for i in pending if responses[i] is None]
+        if not pending:
+            return responses, {}
 
+        retrieved = self.retrieve_context_batch([queries[i] for i in pending])
+        passages = {i: docs for i, (docs, _) in zip(pending, retrieved)}
+
+        exact_keys: Dict[int, str] = {}
+        if self._uses_exact_cache():
+            decode_params = self._decode_params()
+            for i in pending:
+                exact_keys[i] = ExactResponseCache.make_key(
+                    queries[i],
+                    passages[i],
+                    self._model_key(self.config.GENERATOR_MODEL),
+                    {**decode_params, "max_input": self.config.MAX_INPUT_TOKENS},
+                )
+                responses[i] = self.exact_cache.get(exact_keys[i])
+            pending = [i for i in pending if responses[i] is None]
+
+        # If generator model not loaded, return context as fallback
+        if not self.tokenizer or not self.generator:
+            for i in pending:
+                responses[i] = (
+                    passages[i][0]
+                    if passages[i]
+                    else "No response available in CI environment."
+                )
+            return responses, {}
+
+        return responses, {
+            i: (passages[i], query_embeddings.get(i), exact_keys.get(i))
+            for i in pending
+        }
+
+    def _run_tool(self, response: str, tool_results: List[str]) -> bool:
+        """Run a generated tool command, adding its result to tool_results.
+
+        Returns:
+            Whether the response was a tool command
+        """
+        if not response.upper().startswith(self.TOOL_PREFIXES):
+            return False
+        tool_results.append(self.tool_executor.execute_tool(response))
+        return True
+
+    def _finish_response(
+        self,
+        response: str,
+        tool_results: List[str],
+        query_embedding: Optional[np.ndarray],
+        exact_key: Optional[str],
+    ) -> str:
+        """Final answer for a generated response, stored in the caches.
+
+        Answers shorter than three words are replaced by the fallback
+        response. Answers that needed a tool are not cached, since tool
+        results can change.
+        """
+        if len(response.split()) < 3:
+            return self.FALLBACK_RESPONSE
+        if not tool_results:
+            if query_embedding is not None:
+                self.response_cache.put(query_embedding, response)
+            if exact_key is not None:
+                self.exact_cache.put(exact_key, response)
+        return response
+
+    def _uses_response_cache(self) -> bool:
+        """Whether answers can be looked up in the semantic response cache"""
+        return (
+            self.response_cache.max_size > 0
+            and self.embedding_model is not None
+            and bool(self.tokenizer)
+            and bool(self.generator)
+        )
+
+    def _uses_exact_cache(self) -> bool:
+        """Whether answers can be looked up in the exact response cache"""
+        return (
+            self.config.DECODING != "sample"
+            and self.exact_cache.max_size > 0
+            and bool(self.tokenizer)
+            and bool(self.generator)
+        )
+
+    def _decode_params(self) -> Dict[str, Any]:
+        """Generation settings for the configured DECODING mode.
+
+        "sample" (the default) samples with temperature 0.7; "greedy" and
+        "beam" (``NUM_BEAMS`` beams) are deterministic, so the same prompt
+        always gives the same answer.
+        """
+        params: Dict[str, Any] = {
+            "max_length": self.config.MAX_LENGTH,
+            "num_return_sequences": 1,
+        }
+        if self.config.DECODING == "greedy":
+            params.update(do_sample=False, num_beams=1)
+        elif self.config.DECODING == "beam":
+            params.update(do_sample=False, num_beams=max(1, self.config.NUM_BEAMS))
+        else:
+            params.update(do_sample=True, temperature=0.7)
+        return params
+
+    def _shortcut_response(self, query: str) -> Optional[str]:
+        """Answer greetings and tool commands directly, or None to use RAG"""
         greetings = ["hi", "hello", "hey", "greetings"]
-        if query.lower().split()[0] in greetings:
+        words = query.lower().split()
+        if words and words[0] in greetings:
             return (
                 "Hello! I'm an agentic AI assistant with knowledge about "
                 "machine learning, sci-fi movies, and cosmos. I can use tools "
                 "like calculations. How can I help you today?"
             )
 
-        if query.upper().startswith(("CALC:", "WIKI:", "TIME:")):
+        if query.upper().startswith(self.TOOL_PREFIXES):
             return self.tool_executor.execute_tool(query)
 
         if "calculate" in query.lower() or re.search(r"\d+\s*[\+\-\*/]\s*\d+", query):
@@ -138,51 +1187,196 @@ class RAGEngine:
             if expr:
                 return self.tool_executor.execute_tool(f"CALC: {expr}")
 
-        context_docs = self.retrieve_context(query)
-        context = " ".join(context_docs)
+        return None
 
-        # If generator model not loaded, return context as fallback
-        if not self.tokenizer or not self.generator:
-            return (
-                context_docs[0]
-                if context_docs
-                else "No response available in CI environment."
-            )
+    def _build_prompt(self, context: str, query: str) -> str:
+        """Build the generator prompt for a query and its context"""
+        return (
+            f"{self.CONTEXT_LABEL} {context}\n\n"
+            f"{self.tool_executor.get_available_tools()}\n\n"
+            f"Question: {query}\n\n"
+            f"Answer the question using the context. If you need external\n"
+            f"information, use a tool by responding with the tool\n"
+            f"command. Otherwise, provide a direct answer."
+        )
 
-        for _ in range(self.config.MAX_ITERATIONS):
-            input_text = (
-                f"Context information: {context}\n\n"
-                f"{self.tool_executor.get_available_tools()}\n\n"
-                f"Question: {query}\n\n"
-                f"Answer the question using the context. If you need external\n"
-                f"information, use a tool by responding with the tool\n"
-                f"command. Otherwise, provide a direct answer."
-            )
+    def _pack_prompt(
+        self, passages: List[str], tool_results: List[str], query: str
+    ) -> str:
+        """Build a prompt whose context fits in ``MAX_INPUT_TOKENS``"""
+        tools, context = self._select_context(passages, tool_results, query)
+        return self._build_prompt("\n".join(tools + context), query)
 
+    def _prompt_segments(
+        self, passages: List[str], tool_results: List[str], query: str
+    ) -> List[str]:
+        """Split a prompt that fits in ``MAX_INPUT_TOKENS`` into segments.
+
+        The segments hold the context of ``_pack_prompt``: the context label,
+        each tool result on its own, then the passages with the instructions
+        and question. With encoder reuse a new tool result thus costs an
+        encoder pass over that result only, unless it pushed passages out of
+        the budget and the last segment changed.
+        """
+        # Each extra segment is encoded with its own special tokens
+        label_tokens = self._count_tokens(self.CONTEXT_LABEL, True)
+        reserved = label_tokens - self._count_tokens(self.CONTEXT_LABEL)
+        tools, context = self._select_context(passages, tool_results, query, reserved)
+        prompt = self._build_prompt("\n".join(context), query)
+        return [self.CONTEXT_LABEL, *tools, prompt[len(self.CONTEXT_LABEL) + 1 :]]
+
+    def _select_context(
+        self,
+        passages: List[str],
+        tool_results: List[str],
+        query: str,
+        reserved: int = 0,
+    ) -> Tuple[List[str], List[str]]:
+        """Choose the tool results and passages that fit in the prompt.
+
+        The instructions and the question are always kept; the tokens left
+        over (less ``reserved``) are filled with tool results (most recent
+        first) and then the retrieved passages in rank order, so nothing is
+        cut off by the tokenizer's truncation.
+
+        Returns:
+            The selected ``Tool result: ...`` lines and passages
+        """
+        fixed_cost = self._count_tokens(self._build_prompt("", query), True)
+        budget = self.config.MAX_INPUT_TOKENS - fixed_cost - reserved
+
+        # One extra token per piece covers the separator between pieces
+        def cost(text: str) -> int:
+            return self._count_tokens(text) + 1
+
+        tools = pack_context(
+            [f"Tool result: {result}" for result in reversed(tool_results)],
+            budget,
+            cost,
+        )
+        budget -= sum(cost(tool) for tool in tools)
+        return tools, pack_context(passages, budget, cost)
+
+    def _count_tokens(self, text: str, special_tokens: bool = False) -> int:
+        """Number of generator tokens in text (words without a tokenizer)"""
+        if self.tokenizer is None:
+            return len(text.split())
+        return len(self.tokenizer.encode(text, add_special_tokens=special_tokens))
+
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        """Run prompts through the generator in padded batches"""
+        assert self.tokenizer is not None and self.generator is not None
+        batch_size = max(1, self.config.GENERATION_BATCH_SIZE)
+
+        responses: List[str] = []
+        for start in range(0, len(prompts), batch_size):
             inputs = self.tokenizer(
-                input_text, return_tensors="pt", max_length=512, truncation=True
+                prompts[start : start + batch_size],
+                return_tensors="pt",
+                max_length=self.config.MAX_INPUT_TOKENS,
+                truncation=True,
+                padding=True,
+            )
+            outputs = self.generator.generate(**inputs, **self._decode_params())
+            responses.extend(
+                self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+            )
+        return responses
+
+    def _generate_step(
+        self,
+        prompts: List[Tuple[List[str], List[str], str]],
+        encoded: Dict[str, Any],
+    ) -> List[str]:
+        """Run one agent-loop step for (passages, tool results, query) prompts.
+
+        With ``ENCODER_REUSE`` each prompt is generated from its segments,
+        reusing the states in ``encoded`` of segments encoded in earlier
+        steps; otherwise the packed prompts are generated in padded batches.
+        """
+        if self.config.ENCODER_REUSE:
+            return self._generate_segments(
+                [self._prompt_segments(*prompt) for prompt in prompts], encoded
             )
+        return self._generate_batch([self._pack_prompt(*prompt) for prompt in prompts])
+
+    def _generate_segments(
+        self, segment_lists: List[List[str]], encoded: Dict[str, Any]
+    ) -> List[str]:
+        """Generate from prompts made of separately encoded segments.
+
+        Each prompt is a list of text segments. Segments are run through the
+        encoder only the first time they are seen (``encoded`` maps segment
+        text to its encoder states and is kept across agent-loop iterations),
+        and a prompt's states are the concatenation of its segments' states.
+        A tool result added to a prompt thus costs one encoder pass over the
+        tool result instead of another pass over the whole prompt.
+        """
+        assert self.tokenizer is not None and self.generator is not None
+        batch_size = max(1, self.config.GENERATION_BATCH_SIZE)
+
+        responses: List[str] = []
+        for start in range(0, len(segment_lists), batch_size):
+            batch = segment_lists[start : start + batch_size]
+            new_segments = [
+                segment
+                for segment in dict.fromkeys(s for segments in batch for s in segments)
+                if segment not in encoded
+            ]
+            if new_segments:
+                self._encode_segments(new_segments, encoded)
+
             outputs = self.generator.generate(
-                **inputs,
-                max_length=self.config.MAX_LENGTH,
-                num_return_sequences=1,
-                do_sample=True,
-                temperature=0.7,
+                **self._segment_inputs(batch, encoded), **self._decode_params()
+            )
+            responses.extend(
+                self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
             )
+        return responses
 
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+    def _segment_inputs(
+        self, segment_lists: List[List[str]], encoded: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Generator inputs built from the cached states of encoded segments"""
+        import torch
+        from transformers.modeling_outputs import BaseModelOutput
 
-            if response.upper().startswith(("CALC:", "WIKI:", "TIME:")):
-                tool_result = self.tool_executor.execute_tool(response)
-                context += f"\nTool result: {tool_result}"
-                continue
+        states = [
+            torch.cat([encoded[segment] for segment in segments], dim=0)
+            for segments in segment_lists
+        ]
+        length = max(len(state) for state in states)
+        hidden = states[0].new_zeros((len(states), length, states[0].shape[-1]))
+        attention_mask = torch.zeros((len(states), length), dtype=torch.long)
+        for row, state in enumerate(states):
+            hidden[row, : len(state)] = state
+            attention_mask[row, : len(state)] = 1
+        return {
+            "encoder_outputs": BaseModelOutput(
+                last_hidden_state=hidden  # type: ignore[arg-type]
+            ),
+            "attention_mask": attention_mask,
+        }
 
-            if not response or len(response.split()) < 3:
-                response = (
-                    "I couldn't generate a detailed response. "
-                    "Please rephrase your query about machine learning, "
-                    "sci-fi movies, or cosmos."
-                )
-            return response
+    def _encode_segments(self, segments: List[str], encoded: Dict[str, Any]) -> None:
+        """Run segments through the generator's encoder in one padded batch"""
+        import torch
 
-        return "I used tools but couldn't finalize a response. Try a different query."
+        assert self.tokenizer is not None and self.generator is not None
+        if not segments:
+            return
+        inputs = self.tokenizer(
+            segments,
+            return_tensors="pt",
+            max_length=self.config.MAX_INPUT_TOKENS,
+            truncation=True,
+            padding=True,
+        )
+        with torch.no_grad():
+            hidden = self.generator.get_encoder()(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+            ).last_hidden_state
+        lengths = inputs["attention_mask"].sum(dim=1).tolist()
+        for row, (segment, length) in enumerate(zip(segments, lengths)):
+            encoded[segment] = hidden[row, : int(length)]
@@ -0,0 +1,270 @@
+"""
+Caches of generated responses: by query-embedding similarity, or exact
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import faiss
+
+
+class SemanticResponseCache:
+    """Previous answers keyed by the embeddings of the queries they answered.
+
+    Query embeddings are L2-normalized and kept in a small inner-product FAISS
+    index, so a lookup is one nearest-neighbour search. The answer of the
+    closest past query is returned when their cosine similarity is at least
+    ``threshold``. Beyond ``max_size`` entries the least recently used one is
+    evicted; a ``max_size`` of 0 disables the cache.
+    """
+
+    def __init__(self, max_size: int = 256, threshold: float = 0.95):
+        self.max_size = max_size
+        self.threshold = threshold
+        self._index: Optional["faiss.IndexIDMap2"] = None
+        self._responses: "OrderedDict[int, str]" = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        """Contiguous float32 rows scaled to unit length"""
+        import faiss
+
+        vectors = np.array(embeddings, dtype=np.float32, copy=True)
+        vectors = np.ascontiguousarray(vectors.reshape(len(vectors), -1))
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def get_batch(self, embeddings: np.ndarray) -> List[Optional[str]]:
+        """Cached response for each query embedding, or None on a miss"""
+        if self.max_size <= 0 or self._index is None or not self._responses:
+            self.misses += len(embeddings)
+            return [None] * len(embeddings)
+
+        vectors = self._normalize(embeddings)
+        if vectors.shape[1] != self._index.d:
+            self.misses += len(vectors)
+            return [None] * len(vectors)
+
+        similarities, ids = self._index.search(vectors, 1)
+        responses: List[Optional[str]] = []
+        for similarity, entry_id in zip(similarities[:, 0], ids[:, 0]):
+            if entry_id < 0 or similarity < self.threshold:
+                self.misses += 1
+                responses.append(None)
+                continue
+            self.hits += 1
+            self._responses.move_to_end(int(entry_id))
+            responses.append(self._responses[int(entry_id)])
+        return responses
+
+    def get(self, embedding: np.ndarray) -> Optional[str]:
+        """Cached response for one query embedding, or None on a miss"""
+        return self.get_batch(np.asarray(embedding).reshape(1, -1))[0]
+
+    def put(self, embedding: np.ndarray, response: str) -> None:
+        """Cache the response to the query with this embedding"""
+        if self.max_size <= 0:
+            return
+        vector = self._normalize(np.asarray(embedding).reshape(1, -1))
+        if self._index is None or self._index.d != vector.shape[1]:
+            import faiss
+
+            self.clear()
+            self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+        self._responses[entry_id] = response
+
+        while len(self._responses) > self.max_size:
+            evicted, _ = self._responses.popitem(last=False)
+            self._index.remove_ids(np.array([evicted], dtype=np.int64))  # type: ignore
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached response, e.g. after the knowledge base changed"""
+        self._responses.clear()
+        if self._index is not None:
+            self._index.reset()
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters, mainly for debugging and tests"""
+        return {
+            "size": len(self._responses),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ExactResponseCache:
+    """LRU cache of responses keyed by everything that determines them.
+
+    Only meaningful with deterministic decoding: the key hashes the
+    normalized query, the retrieved context, the generator model and the
+    decoding parameters, so a hit is the answer generation would produce
+    again. When ``cache_file`` is given every insert and eviction is appended
+    to it as a JSON line and the log is replayed on start-up, so answers
+    survive restarts. Once the log holds ``COMPACT_FACTOR`` times more
+    records than the cache, it is rewritten with only the live entries.
+    """
+
+    COMPACT_FACTOR = 4
+
+    def __init__(self, max_size: int = 1024, cache_file: Optional[Path] = None):
+        self.max_size = max_size
+        self.cache_file = Path(cache_file) if cache_file else None
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._log_records = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    @staticmethod
+    def make_key(
+        query: str,
+        context: Sequence[str],
+        model: str,
+        decode_params: Mapping[str, Any],
+    ) -> str:
+        """Cache key for a query answered from a context with given settings"""
+        digest = hashlib.sha256()
+        for part in (
+            " ".join(query.lower().split()),
+            "\0".join(context),
+            model,
+            json.dumps(dict(decode_params), sort_keys=True),
+        ):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\1")
+        return digest.hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss"""
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def put(self, key: str, response: str) -> None:
+        """Cache a response and log it to the cache file if there is one"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            records: List[Tuple[str, Optional[str]]] = [(key, response)]
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                records.append((evicted, None))
+                self.evictions += 1
+            self._append(records)
+
+    def clear(self) -> None:
+        """Drop all entries, in memory and on disk"""
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and eviction counters plus the current size"""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _load(self) -> None:
+        """Replay the cache file's log, keeping the most recent max_size"""
+        if self.cache_file is None or self.max_size <= 0:
+            return
+        skipped = 0
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        key, response = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash mid-append
+                        skipped += 1
+                        continue
+                    self._log_records += 1
+                    if response is None:
+                        self._entries.pop(key, None)
+                    else:
+                        self._entries[key] = response
+                        self._entries.move_to_end(key)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Warning: Failed to read response cache: {e}")
+            return
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        if skipped:
+            print(f"Warning: Skipped {skipped} unreadable response cache records")
+            # Later appends must not continue a broken line
+            self._save()
+
+    def _append(self, records: List[Tuple[str, Optional[str]]]) -> None:
+        """Append records to the cache file, compacting it when it grows large"""
+        if self.cache_file is None:
+            return
+        if self._log_records + len(records) > self.COMPACT_FACTOR * self.max_size:
+            self._save()
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_file, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+            self._log_records += len(records)
+        except Exception as e:
+            print(f"Warning: Failed to write response cache: {e}")
+
+    def _save(self) -> None:
+        """Rewrite the cache file atomically with only the current entries"""
+        if self.cache_file is None:
+            return
+        tmp_name = None
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.cache_file.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.writelines(
+                    json.dumps(entry) + "\n" for entry in self._entries.items()
+                )
+            os.replace(tmp_name, self.cache_file)
+            self._log_records = len(self._entries)
+        except Exception as e:
+            print(f"Warning: Failed to write response cache: {e}")
+            if tmp_name is not None and os.path.exists(tmp_name):
+                os.remove(tmp_name)
@@ -0,0 +1,218 @@
+"""
+Long-lived query server (`rag serve`) and the client `rag --query` uses
+"""
+
+import ipaddress
+import json
+import os
+import re
+import socket
+import socketserver
+import stat
+import threading
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple, Union
+
+Address = Union[str, Tuple[str, int]]
+
+# host:port (or [host]:port for IPv6) selects localhost TCP; anything else is
+# a Unix socket path
+TCP_ADDRESS = re.compile(
+    r"^(?:\[(?P<ipv6>[0-9A-Fa-f:.]+)\]|(?P<host>[\w.\-]+)):(?P<port>\d+)$"
+)
+CONNECT_TIMEOUT = 1.0
+
+
+def is_loopback(host: str) -> bool:
+    """Whether a host is localhost or a loopback IP address"""
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def parse_address(address: str) -> Address:
+    """Unix socket path, or (host, port) for a ``host:port`` address.
+
+    Raises:
+        ValueError: if a TCP host is not loopback. The server is
+            unauthenticated and runs tools, so it must not be reachable from
+            other machines.
+    """
+    match = TCP_ADDRESS.match(address)
+    if not match:
+        return address
+    host = match.group("ipv6") or match.group("host")
+    if not is_loopback(host):
+        raise ValueError(
+            f"Server address {address!r} is not on localhost; use a Unix socket "
+            "path, localhost:<port>, 127.0.0.1:<port> or [::1]:<port>"
+        )
+    return host, int(match.group("port"))
+
+
+def _is_socket(path: str) -> bool:
+    """Whether a path exists and is a Unix socket"""
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+class _QueryHandler(socketserver.StreamRequestHandler):
+    """Answers JSON Lines requests on one connection.
+
+    Each request is ``{"query": "..."}``. The answer is streamed back as
+    ``{"text": "..."}`` lines followed by ``{"done": true}``, or an
+    ``{"error": "..."}`` line if the query failed.
+    """
+
+    server: "_EngineServer"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                query = json.loads(line)["query"]
+                with self.server.engine_lock:
+                    for piece in self.server.engine.generate_response_stream(query):
+                        self._send({"text": piece})
+                self._send({"done": True})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as e:
+                self._send({"error": str(e)})
+
+    def _send(self, message: dict) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class _EngineServer(socketserver.ThreadingMixIn, socketserver.BaseServer):
+    """Socket server holding the engine its handlers answer from"""
+
+    daemon_threads = True
+    engine: Any
+    engine_lock: threading.Lock
+
+
+class _TCPServer(_EngineServer, socketserver.TCPServer):
+    allow_reuse_address = True
+
+
+class _TCP6Server(_TCPServer):
+    address_family = socket.AF_INET6
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+
+    class _UnixServer(_EngineServer, socketserver.UnixStreamServer):
+        pass
+
+
+class QueryServer:
+    """Serves queries from one warm RAG engine over a local socket.
+
+    Queries from concurrent connections are answered one at a time, since
+    the engine's caches and models are shared.
+    """
+
+    def __init__(self, engine: Any, address: str):
+        self.engine = engine
+        self.engine_lock = threading.Lock()
+        self.address = parse_address(address)
+
+        server_class: Any
+        if isinstance(self.address, tuple):
+            server_class = _TCP6Server if ":" in self.address[0] else _TCPServer
+        elif hasattr(socketserver, "UnixStreamServer"):
+            server_class = _UnixServer
+            Path(self.address).parent.mkdir(parents=True, exist_ok=True)
+            self._remove_stale_socket(self.address)
+        else:
+            raise OSError("Unix sockets are not supported here, use host:port")
+
+        self._server: _EngineServer = server_class(self.address, _QueryHandler)
+        self._server.engine = engine
+        self._server.engine_lock = self.engine_lock
+
+    @staticmethod
+    def _remove_stale_socket(path: str) -> None:
+        """Remove a socket file left by a server that is no longer running"""
+        if not os.path.lexists(path):
+            return
+        if not _is_socket(path):
+            raise OSError(f"{path} exists and is not a socket, not replacing it")
+        if connect(path) is not None:
+            raise OSError(f"A server is already running at {path}")
+        os.remove(path)
+
+    @property
+    def server_address(self) -> Address:
+        """Address the server listens on (with the actual port for port 0)"""
+        address = self._server.server_address
+        if isinstance(address, tuple):
+            # IPv6 addresses also carry flow info and scope id
+            return str(address[0]), int(address[1])
+        return str(address)
+
+    def serve_forever(self) -> None:
+        """Handle requests until shutdown() is called"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if isinstance(self.address, str) and _is_socket(self.address):
+                os.remove(self.address)
+
+    def shutdown(self) -> None:
+        """Stop serve_forever() from another thread"""
+        self._server.shutdown()
+
+
+def connect(
+    address: Address, timeout: float = CONNECT_TIMEOUT
+) -> Optional[socket.socket]:
+    """Open a connection to a running server, or None if none is listening"""
+    if isinstance(address, str):
+        address = parse_address(address)
+    try:
+        if isinstance(address, tuple):
+            return socket.create_connection(address, timeout=timeout)
+        if not Path(address).exists() or not hasattr(socket, "AF_UNIX"):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    except OSError:
+        return None
+
+
+def stream_response(sock: socket.socket, query: str) -> Iterator[str]:
+    """Send a query over a server connection and yield the answer's pieces.
+
+    Raises:
+        RuntimeError: if the server failed to answer the query
+        ConnectionError: if the connection closed before the answer ended
+    """
+    # Generation can take much longer than connecting
+    sock.settimeout(None)
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps({"query": query}).encode("utf-8") + b"\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "error" in message:
+                raise RuntimeError(message["error"])
+            if message.get("done"):
+                return
+            yield message["text"]
+    raise ConnectionError("Server closed the connection before answering")
@@ -5,14 +5,17 @@ Text User Interface for RAG Transformer
 import argparse
 import os
 import sys
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from rich.console import Console
+from rich.live import Live
 from rich.panel import Panel
 from rich.prompt import Prompt
 
 from ..__version__ import __version__
-from ..rag_engine import RAGEngine
+
+if TYPE_CHECKING:
+    from ..rag_engine import RAGEngine
 
 
 def create_tui_parser() -> argparse.ArgumentParser:
@@ -100,22 +103,35 @@ def _display_help(console: Console, no_color: bool) -> None:
         console.print(Panel(help_text, title="[blue]Help[/]", border_style="blue"))
 
 
+def _response_panel(response: str, no_color: bool) -> Panel:
+    """Panel showing a (possibly partial) response."""
+    if no_color:
+        return Panel(response, title="Response")
+    # Clean the response to ensure no unclosed tags
+    clean_response = response.replace("[/", "").replace("[", "[")
+    return Panel(clean_response, title="[bold]💡 Response[/]", border_style="green")
+
+
 def _process_query(
-    rag_engine: RAGEngine, query: str, console: Console, no_color: bool
+    rag_engine: "RAGEngine", query: str, console: Console, no_color: bool
 ) -> None:
-    """Process a single query and display the response."""
-    if no_color:
-        with console.status("Processing your query..."):
-            response = rag_engine.generate_response(query)
-        console.print(Panel(response, title="Response"))
-    else:
-        with console.status("[bold green]Processing your query...[/]"):
-            response = rag_engine.generate_response(query)
-        # Clean the response to ensure no unclosed tags
-        clean_response = response.replace("[/", "").replace("[", "[")
-        console.print(
-            Panel(clean_response, title="[bold]💡 Response[/]", border_style="green")
-        )
+    """Process a single query and display the response as it is generated."""
+    pieces = iter(rag_engine.generate_response_stream(query))
+    status = (
+        "Processing your query..."
+        if no_color
+        else "[bold green]Processing your query...[/]"
+    )
+    # The spinner runs until the first piece of the answer arrives
+    with console.status(status):
+        response = next(pieces, "")
+
+    with Live(
+        _response_panel(response, no_color), console=console, refresh_per_second=10
+    ) as live:
+        for piece in pieces:
+            response += piece
+            live.update(_response_panel(response, no_color))
 
 
 def _handle_exit(console: Console, no_color: bool) -> None:
@@ -143,10 +159,15 @@ def run_tui(no_color: bool = False, force: bool = False) -> None:
     console = Console(force_terminal=force, no_color=no_color)
 
     try:
+        # Imported here so that --help and --version never load the engine
+        from ..rag_engine import RAGEngine
+
         rag_engine = RAGEngine()
     except Exception as e:
         console.print(f"[red]Failed to initialize RAG engine: {e}[/red]")
         sys.exit(1)
+    if rag_engine.config.WARM_UP:
+        rag_engine.warm_up()
 
     _display_welcome(console, no_color)
 
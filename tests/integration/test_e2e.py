@@ -20,13 +20,13 @@ class TestCLIE2E:
     @patch("sys.stdin.isatty", return_value=True)
     @patch("builtins.input", side_effect=["hello", "exit"])
     @patch("builtins.print")
-    @patch("src.rag.__main__.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_main_interactive_greeting_flow(
         self, mock_rag, mock_print, mock_input, mock_isatty
     ):
         """Test main function interactive mode with greeting and exit"""
         mock_engine = Mock()
-        mock_engine.generate_response.return_value = "Hello response"
+        mock_engine.generate_response_stream.return_value = iter(["Hello response"])
         mock_rag.return_value = mock_engine
 
         main([])  # Pass empty args to avoid pytest interference
@@ -48,12 +48,14 @@ class TestCLIE2E:
     @patch("sys.stdin.isatty", return_value=True)
     @patch("builtins.input", side_effect=["help", "exit"])
     @patch("builtins.print")
-    @patch("src.rag.__main__.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_main_interactive_help_flow(
         self, mock_rag, mock_print, mock_input, mock_isatty
     ):
         """Test main function interactive mode with help command"""
-        mock_rag.return_value.generate_response.return_value = "Help response"
+        mock_rag.return_value.generate_response_stream.return_value = iter(
+            ["Help response"]
+        )
 
         main([])  # Pass empty args to avoid pytest interference
 
@@ -65,11 +67,11 @@ class TestCLIE2E:
         ]
         assert len(help_calls) > 0
 
-    @patch("src.rag.__main__.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_main_single_query_mode(self, mock_rag):
         """Test main function single query mode"""
         mock_engine = Mock()
-        mock_engine.generate_response.return_value = "Test response"
+        mock_engine.generate_response_stream.return_value = iter(["Test response"])
         mock_rag.return_value = mock_engine
 
         with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
@@ -77,11 +79,11 @@ class TestCLIE2E:
             output = mock_stdout.getvalue()
             assert "Test response" in output
 
-    @patch("src.rag.__main__.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_main_verbose_mode(self, mock_rag):
         """Test main function with verbose flag"""
         mock_engine = Mock()
-        mock_engine.generate_response.return_value = "Test response"
+        mock_engine.generate_response_stream.return_value = iter(["Test response"])
         mock_rag.return_value = mock_engine
 
         with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
@@ -108,21 +110,21 @@ class TestTUIE2E:
     @patch("sys.stdin.isatty", return_value=True)
     @patch("rich.prompt.Prompt.ask", side_effect=["hello", "exit"])
     @patch("rich.console.Console.print")
-    @patch("src.rag.ui.tui.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_tui_greeting_flow(self, mock_rag, mock_print, mock_ask, mock_isatty):
         """Test TUI function with greeting and exit"""
         mock_engine = Mock()
-        mock_engine.generate_response.return_value = "Hello response"
+        mock_engine.generate_response_stream.return_value = iter(["Hello response"])
         mock_rag.return_value = mock_engine
 
         run_tui()
         assert mock_print.called
-        mock_engine.generate_response.assert_called_with("hello")
+        mock_engine.generate_response_stream.assert_called_with("hello")
 
     @patch("sys.stdin.isatty", return_value=True)
     @patch("rich.prompt.Prompt.ask", side_effect=["help", "exit"])
     @patch("rich.console.Console.print")
-    @patch("src.rag.ui.tui.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_tui_help_flow(self, mock_rag, mock_print, mock_ask, mock_isatty):
         """Test TUI function with help command"""
         mock_engine = Mock()
@@ -150,7 +152,7 @@ class TestTUIE2E:
     @patch("rich.prompt.Prompt.ask", side_effect=["clear", "exit"])
     @patch("rich.console.Console.print")
     @patch("rich.console.Console.clear")
-    @patch("src.rag.ui.tui.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_tui_clear_command(
         self, mock_rag, mock_clear, mock_print, mock_ask, mock_isatty
     ):
@@ -194,6 +196,29 @@ class TestDataCollectorE2E:
             assert "Starting data collection" in output
             assert result == 0
 
+    @patch("src.rag.data_fetcher.DataFetcher")
+    def test_collector_merge_and_dedup(self, mock_fetcher_class):
+        """Test merging into the existing knowledge base with dedup"""
+        mock_fetcher = Mock()
+        mock_fetcher.fetch_all_data.return_value = ["doc2", "doc3"]
+        mock_fetcher.load_existing_documents.return_value = ["doc1", "doc2"]
+        mock_fetcher.deduplicate_documents.return_value = ["doc1", "doc2", "doc3"]
+        mock_fetcher_class.return_value = mock_fetcher
+
+        with patch("sys.stdout", new_callable=StringIO):
+            assert collector_main(["--merge"]) == 0
+            mock_fetcher.deduplicate_documents.assert_called_once_with(
+                ["doc1", "doc2", "doc2", "doc3"], False
+            )
+            mock_fetcher.save_documents.assert_called_once_with(
+                ["doc1", "doc2", "doc3"]
+            )
+
+            mock_fetcher.reset_mock()
+            assert collector_main(["--no-dedup"]) == 0
+            mock_fetcher.deduplicate_documents.assert_not_called()
+            mock_fetcher.save_documents.assert_called_once_with(["doc2", "doc3"])
+
     @patch("src.rag.data_fetcher.DataFetcher")
     def test_collector_error_handling(self, mock_fetcher_class):
         """Test data collector error handling"""
@@ -240,7 +265,7 @@ class TestCLIPolicyCompliance:
                 command_func(args)
                 mock_exit.assert_called_with(0)
 
-    @patch("src.rag.__main__.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_error_exit_codes(self, mock_rag):
         """Test that errors produce proper exit codes"""
         mock_rag.side_effect = Exception("Test error")
@@ -253,7 +278,7 @@ class TestCLIPolicyCompliance:
     @patch("sys.stdin.isatty", return_value=True)
     @patch("builtins.input", side_effect=KeyboardInterrupt())
     @patch("builtins.print")
-    @patch("src.rag.__main__.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_keyboard_interrupt_handling(
         self, mock_rag, mock_print, mock_input, mock_isatty
     ):
@@ -276,23 +301,23 @@ class TestFullApplicationFlow:
     @patch("sys.stdin.isatty", return_value=True)
     @patch("builtins.input", side_effect=["CALC: 2+2", "WIKI: Python", "TIME:", "exit"])
     @patch("builtins.print")
-    @patch("src.rag.__main__.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     def test_complete_interactive_session(
         self, mock_rag, mock_print, mock_input, mock_isatty
     ):
         """Test a complete interactive session with various commands"""
         mock_engine = Mock()
-        mock_engine.generate_response.side_effect = [
-            "4",
-            "Python is a programming language...",
-            "Current time is 12:00 PM",
+        mock_engine.generate_response_stream.side_effect = [
+            iter(["4"]),
+            iter(["Python is a programming language..."]),
+            iter(["Current time is 12:00 PM"]),
         ]
         mock_rag.return_value = mock_engine
 
         main([])  # Pass empty args to avoid pytest interference
 
         # Verify all queries were processed
-        assert mock_engine.generate_response.call_count == 3
+        assert mock_engine.generate_response_stream.call_count == 3
 
         # Check responses were printed (could be with or without emoji depending on color settings)
         calc_calls = [call for call in mock_print.call_args_list if "4" in str(call)]
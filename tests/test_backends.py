@@ -0,0 +1,80 @@
+"""
+Unit tests for backends.py
+"""
+
+import sys
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+from src.rag.backends import (  # noqa: E402
+    OnnxEmbeddingBackend,
+    OnnxGeneratorBackend,
+    TorchEmbeddingBackend,
+    TorchGeneratorBackend,
+    get_backends,
+)
+
+
+def test_get_backends(tmp_path):
+    embedding, generator = get_backends("torch", tmp_path)
+    assert isinstance(embedding, TorchEmbeddingBackend)
+    assert isinstance(generator, TorchGeneratorBackend)
+
+    embedding, generator = get_backends("onnx", tmp_path)
+    assert isinstance(embedding, OnnxEmbeddingBackend)
+    assert isinstance(generator, OnnxGeneratorBackend)
+    assert generator.cache_dir == tmp_path
+
+    with pytest.raises(ValueError, match="Unknown inference backend"):
+        get_backends("tensorrt", tmp_path)
+
+
+@patch("transformers.AutoModelForSeq2SeqLM")
+@patch("transformers.AutoTokenizer")
+def test_torch_generator_backend(mock_tokenizer, mock_model):
+    tokenizer, generator = TorchGeneratorBackend().load("test-gen")
+    assert tokenizer is mock_tokenizer.from_pretrained.return_value
+    assert generator is mock_model.from_pretrained.return_value
+    mock_model.from_pretrained.assert_called_once_with("test-gen")
+
+
+@patch("sentence_transformers.SentenceTransformer", None)
+def test_torch_embedding_backend_requires_sentence_transformers():
+    with pytest.raises(ImportError):
+        TorchEmbeddingBackend().load("test-model")
+
+
+@patch("transformers.AutoTokenizer")
+def test_onnx_generator_exports_once(mock_tokenizer, tmp_path):
+    ort_model = Mock()
+    ort_model.from_pretrained.return_value.save_pretrained.side_effect = lambda path: (
+        path.mkdir(parents=True),
+        (path / "config.json").touch(),
+    )
+    onnxruntime = SimpleNamespace(
+        SessionOptions=lambda: SimpleNamespace(),
+        GraphOptimizationLevel=SimpleNamespace(ORT_ENABLE_ALL="all"),
+    )
+    modules = {
+        "onnxruntime": onnxruntime,
+        "optimum": SimpleNamespace(),
+        "optimum.onnxruntime": SimpleNamespace(ORTModelForSeq2SeqLM=ort_model),
+    }
+    backend = OnnxGeneratorBackend(tmp_path)
+    export_dir = tmp_path / "onnx" / "google--flan-t5-small"
+
+    with patch.dict(sys.modules, modules):
+        backend.load("google/flan-t5-small")
+        backend.load("google/flan-t5-small")
+
+    first, second = ort_model.from_pretrained.call_args_list
+    assert first.args == ("google/flan-t5-small",)
+    assert first.kwargs["export"] is True
+    assert first.kwargs["provider"] == "CPUExecutionProvider"
+    assert first.kwargs["session_options"].graph_optimization_level == "all"
+    assert second.args == (export_dir,)
+    assert "export" not in second.kwargs
@@ -0,0 +1,40 @@
+"""
+Unit tests for chunking.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+from src.rag.chunking import chunk_spans, merge_chunks, word_offsets  # noqa: E402
+
+
+def test_word_offsets():
+    assert word_offsets(" ab  cd\n") == [(1, 3), (5, 7)]
+    assert word_offsets("ab cd") == [(0, 2), (3, 5)]
+
+
+def test_chunk_spans_keeps_short_documents_whole():
+    assert chunk_spans(word_offsets("a b c"), 5, window=4) == [(0, 5)]
+    assert chunk_spans([], 0, window=4) == [(0, 0)]
+    assert chunk_spans(word_offsets("a b c d e"), 9, window=0) == [(0, 9)]
+
+
+def test_chunk_spans_overlapping_windows():
+    text = "a b c d e f g"
+    spans = chunk_spans(word_offsets(text), len(text), window=3, overlap=1)
+    assert [text[start:end] for start, end in spans] == ["a b c", "c d e", "e f g"]
+
+
+def test_merge_chunks_stitches_overlaps_and_marks_gaps():
+    text = "a b c d e f g h"
+    ranked = [
+        ((0, 4, 9), text[4:9]),  # "c d e"
+        ((1, 0, 5), "other"),
+        ((0, 0, 5), text[0:5]),  # "a b c"
+        ((0, 12, 15), text[12:15]),  # "g h"
+    ]
+
+    merged = merge_chunks(ranked)
+
+    assert merged == [([0, 2, 3], "a b c d e ... g h"), ([1], "other")]
@@ -67,11 +67,12 @@ class TestCLIParser:
 class TestCLIFunctionality:
     """Test CLI functionality and user interactions"""
 
-    @patch("src.rag.__main__.RAGEngine")
-    def test_single_query_mode(self, mock_rag_engine):
+    @patch("src.rag.__main__.connect", return_value=None)
+    @patch("src.rag.rag_engine.RAGEngine")
+    def test_single_query_mode(self, mock_rag_engine, mock_connect):
         """Test single query mode functionality"""
         mock_engine = MagicMock()
-        mock_engine.generate_response.return_value = "Test response"
+        mock_engine.generate_response_stream.return_value = iter(["Test response"])
         mock_rag_engine.return_value = mock_engine
 
         with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
@@ -79,8 +80,38 @@ class TestCLIFunctionality:
             output = mock_stdout.getvalue()
             assert "Test response" in output
 
-    @patch("src.rag.__main__.RAGEngine")
-    def test_single_query_error_handling(self, mock_rag_engine):
+    @patch("src.rag.__main__.connect", return_value=None)
+    @patch("src.rag.rag_engine.RAGEngine")
+    def test_single_query_streams_response(self, mock_rag_engine, mock_connect):
+        """Test pieces of a streamed response are printed as they arrive"""
+        mock_engine = MagicMock()
+        mock_engine.generate_response_stream.return_value = iter(
+            ["Streamed ", "test ", "response"]
+        )
+        mock_rag_engine.return_value = mock_engine
+
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            handle_single_query("test question")
+            assert mock_stdout.getvalue() == "Streamed test response\n"
+
+    @patch("src.rag.__main__.stream_response")
+    @patch("src.rag.__main__.connect")
+    @patch("src.rag.rag_engine.RAGEngine")
+    def test_single_query_uses_running_server(
+        self, mock_rag_engine, mock_connect, mock_stream
+    ):
+        """Test a running server answers instead of a new engine"""
+        mock_stream.return_value = iter(["Served ", "response"])
+
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            handle_single_query("test question")
+            assert mock_stdout.getvalue() == "Served response\n"
+        mock_stream.assert_called_once_with(mock_connect.return_value, "test question")
+        mock_rag_engine.assert_not_called()
+
+    @patch("src.rag.__main__.connect", return_value=None)
+    @patch("src.rag.rag_engine.RAGEngine")
+    def test_single_query_error_handling(self, mock_rag_engine, mock_connect):
         """Test error handling in single query mode"""
         mock_rag_engine.side_effect = Exception("Test error")
 
@@ -102,6 +133,12 @@ class TestCLIFunctionality:
         main(["--query", "test"])
         mock_single_query.assert_called_once_with("test", False, False, False)
 
+    @patch("src.rag.__main__.run_server")
+    def test_main_serve_command(self, mock_run_server):
+        """Test 'rag serve' starts the query server"""
+        main(["serve", "--quiet"])
+        mock_run_server.assert_called_once_with(False, True)
+
 
 class TestCLIPolicy:
     """Test CLI policy compliance"""
@@ -120,7 +157,7 @@ class TestCLIPolicy:
 
     def test_error_output_to_stderr(self):
         """Test that errors are written to stderr"""
-        with patch("src.rag.__main__.RAGEngine") as mock_rag_engine:
+        with patch("src.rag.rag_engine.RAGEngine") as mock_rag_engine:
             mock_rag_engine.side_effect = Exception("Test error")
 
             with patch("sys.stderr", new_callable=StringIO) as mock_stderr:
@@ -157,7 +194,7 @@ class TestInteractiveMode:
     """Test interactive mode functionality"""
 
     @patch("sys.stdin.isatty")
-    @patch("src.rag.__main__.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     @patch("builtins.input")
     def test_interactive_exit_commands(self, mock_input, mock_rag_engine, mock_isatty):
         """Test that exit commands work in interactive mode"""
@@ -176,7 +213,7 @@ class TestInteractiveMode:
             assert "Goodbye!" in output
 
     @patch("sys.stdin.isatty")
-    @patch("src.rag.__main__.RAGEngine")
+    @patch("src.rag.rag_engine.RAGEngine")
     @patch("builtins.input")
     def test_interactive_help_command(self, mock_input, mock_rag_engine, mock_isatty):
         """Test help command in interactive mode"""
@@ -210,11 +247,12 @@ class TestInteractiveMode:
 class TestCLIIntegration:
     """Integration tests for CLI functionality"""
 
-    @patch("src.rag.__main__.RAGEngine")
-    def test_verbose_mode_integration(self, mock_rag_engine):
+    @patch("src.rag.__main__.connect", return_value=None)
+    @patch("src.rag.rag_engine.RAGEngine")
+    def test_verbose_mode_integration(self, mock_rag_engine, mock_connect):
         """Test verbose mode provides additional output"""
         mock_engine = MagicMock()
-        mock_engine.generate_response.return_value = "Test response"
+        mock_engine.generate_response_stream.return_value = iter(["Test response"])
         mock_rag_engine.return_value = mock_engine
 
         with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
@@ -222,11 +260,12 @@ class TestCLIIntegration:
             output = mock_stdout.getvalue()
             assert "Processing query:" in output
 
-    @patch("src.rag.__main__.RAGEngine")
-    def test_quiet_mode_integration(self, mock_rag_engine):
+    @patch("src.rag.__main__.connect", return_value=None)
+    @patch("src.rag.rag_engine.RAGEngine")
+    def test_quiet_mode_integration(self, mock_rag_engine, mock_connect):
         """Test quiet mode suppresses non-essential output"""
         mock_engine = MagicMock()
-        mock_engine.generate_response.return_value = "Test response"
+        mock_engine.generate_response_stream.return_value = iter(["Test response"])
         mock_rag_engine.return_value = mock_engine
 
         with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
@@ -21,6 +21,23 @@ def test_config_defaults():
     assert config.TOP_K_RETRIEVAL == 3
     assert config.MAX_ITERATIONS == 3
     assert config.MAX_LENGTH == 150
+    assert config.INDEX_TYPE == "auto"
+    assert config.INDEX_STORAGE == "float32"
+    assert config.EMBED_BATCH_SIZE == 256
+    assert config.QUERY_CACHE_SIZE == 1024
+    assert config.QUERY_CACHE_DISK_MAX == 10000
+    assert config.RESPONSE_CACHE_SIZE == 0
+    assert config.GENERATION_BATCH_SIZE == 8
+    assert config.RETRIEVAL_MODE == "hybrid"
+    assert config.CHUNK_TOKENS == 128
+    assert config.MAX_INPUT_TOKENS == 512
+    assert config.DEDUP is False
+    assert config.DEDUP_THRESHOLD == 0.8
+    assert config.PARTITION_INDEX is False
+    assert config.DECODING == "sample"
+    assert config.ENCODER_REUSE is False
+    assert config.INFERENCE_BACKEND == "torch"
+    assert config.MODEL_PRECISION == "float32"
 
 
 def test_config_env_vars(monkeypatch):
@@ -30,3 +47,25 @@ def test_config_env_vars(monkeypatch):
     config = Config()
     assert config.TMDB_API_KEY == "dummy_tmdb"
     assert config.NASA_API_KEY == "dummy_nasa"
+
+
+def test_config_bool_env(monkeypatch):
+    """Test boolean environment variables, including invalid values"""
+    monkeypatch.setenv("INDEX_SNAPSHOT", "false")
+    monkeypatch.setenv("INDEX_MMAP", "not-a-bool")
+    config = Config()
+    assert config.INDEX_SNAPSHOT is False
+    assert config.INDEX_MMAP is False
+
+
+def test_config_choice_env(monkeypatch, caplog):
+    """Test index settings, which fall back to their default if unknown"""
+    monkeypatch.setenv("INDEX_TYPE", "HNSW")
+    monkeypatch.setenv("INDEX_STORAGE", "int4")
+    config = Config()
+    assert config.INDEX_TYPE == "hnsw"
+    assert config.INDEX_STORAGE == "float32"
+    assert "Invalid value 'int4' for INDEX_STORAGE" in caplog.text
+
+    monkeypatch.setenv("INDEX_TYPE", "ivf_pq")
+    assert Config().INDEX_TYPE == "auto"
@@ -0,0 +1,35 @@
+"""
+Unit tests for context_packing.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+from src.rag.context_packing import pack_context, split_sentences  # noqa: E402
+
+
+def _words(text):
+    return len(text.split())
+
+
+def test_split_sentences():
+    assert split_sentences("One. Two!  Three?") == ["One.", "Two!", "Three?"]
+    assert split_sentences("v1.2 is out") == ["v1.2 is out"]
+    assert split_sentences("") == []
+
+
+def test_pack_context_takes_whole_passages_in_priority_order():
+    passages = ["a b c", "d e", "f g h i"]
+    assert pack_context(passages, 5, _words) == ["a b c", "d e"]
+    assert pack_context(passages, 100, _words) == passages
+
+
+def test_pack_context_fills_budget_with_sentences():
+    passages = ["one two three four. Five six.", "seven"]
+    assert pack_context(passages, 3, _words) == ["Five six.", "seven"]
+
+
+def test_pack_context_with_no_budget():
+    assert pack_context(["a"], 0, _words) == []
+    assert pack_context(["a"], -5, _words) == []
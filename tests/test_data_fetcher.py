@@ -42,3 +42,20 @@ def test_fetch_all_data(mock_executor, mock_get, data_fetcher):
     assert isinstance(result, list)
     # Should have movies and cosmos data
     assert len(result) > 0
+
+
+def test_deduplicate_documents(data_fetcher, capsys):
+    data_fetcher.config = Mock()
+    data_fetcher.config.DEDUP_THRESHOLD = 0.8
+    documents = [
+        "Cosmos: A galaxy is a system of stars, gas and dust bound by gravity.",
+        "Sci-Fi Movie: Interstellar follows astronauts through a wormhole.",
+        "Cosmos: A galaxy is a system of stars, gas and dust bound by gravity.",
+    ]
+
+    kept = data_fetcher.deduplicate_documents(documents, verbose=True)
+
+    assert kept == documents[:2]
+    output = capsys.readouterr().out
+    assert "Removed 1 near-duplicate documents" in output
+    assert "dropped #2" in output
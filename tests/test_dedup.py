@@ -0,0 +1,74 @@
+"""
+Unit tests for dedup.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+from src.rag.dedup import (  # noqa: E402
+    NearDuplicateDetector,
+    choose_bands,
+    deduplicate,
+    shingles,
+)
+
+BASE = (
+    "Interstellar is a 2014 science fiction film in which a team of astronauts "
+    "travels through a wormhole near Saturn in search of a new home for humanity "
+    "while the crops on Earth are failing"
+)
+
+
+def test_shingles():
+    assert shingles("A b c d") == ["a b c", "b c d"]
+    assert shingles("Short text") == ["short text"]
+
+
+def test_choose_bands():
+    assert choose_bands(128, 0.8) == (16, 8)
+    assert choose_bands(128, 0.9) == (8, 16)
+    assert choose_bands(128, 0.001) == (128, 1)
+
+
+def test_deduplicate_drops_near_duplicates():
+    near_copy = BASE + " today"
+    unrelated = "Deep learning uses neural networks with many layers of neurons"
+
+    kept, dropped = deduplicate([BASE, unrelated, BASE, near_copy])
+
+    assert kept == [BASE, unrelated]
+    assert [(position, original) for position, original, _ in dropped] == [
+        (2, 0),
+        (3, 0),
+    ]
+    assert dropped[0][2] == 1.0
+    assert 0.8 <= dropped[1][2] <= 1.0
+
+
+def test_detector_is_incremental():
+    detector = NearDuplicateDetector(threshold=0.9)
+    assert detector.add(BASE) is None
+    assert detector.add("Something else entirely about black holes") is None
+    assert detector.add(BASE) == (0, 1.0)
+    assert len(detector) == 2
+    assert detector.find_duplicate("black holes") is None
+
+
+def test_detector_restores_from_signatures():
+    detector = NearDuplicateDetector()
+    detector.add(BASE)
+    detector.add("Something else entirely about black holes")
+
+    restored = NearDuplicateDetector()
+    restored.add_signatures(detector.signatures())
+
+    assert len(restored) == 2
+    assert restored.add(BASE + " today")[0] == 0
+    with pytest.raises(ValueError):
+        restored.add_signatures(detector.signatures()[:, :64])
+
+
+def test_threshold_is_validated():
+    with pytest.raises(ValueError):
+        NearDuplicateDetector(threshold=0)
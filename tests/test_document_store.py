@@ -0,0 +1,56 @@
+"""
+Unit tests for document_store.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+import numpy as np  # noqa: E402
+
+from src.rag.document_store import DocumentStore  # noqa: E402
+
+DOCUMENTS = ["first", "", "Ünïcode ✓ text", "last"]
+
+
+def test_random_access_and_slicing():
+    store = DocumentStore(DOCUMENTS)
+    assert len(store) == 4
+    assert store[2] == "Ünïcode ✓ text"
+    assert store[-1] == "last"
+    assert store[1:3] == ["", "Ünïcode ✓ text"]
+    assert list(store) == DOCUMENTS
+    assert store == DOCUMENTS
+    assert "last" in store
+    with pytest.raises(IndexError):
+        store[4]
+
+
+def test_save_and_open_memory_maps(tmp_path):
+    DocumentStore(DOCUMENTS).save(tmp_path)
+
+    store = DocumentStore.open(tmp_path)
+    assert isinstance(store._mapped_blob, np.memmap)
+    assert store == DOCUMENTS
+
+    # Appended documents follow the mapped ones and survive another save
+    store.extend(["appended"])
+    assert store[4] == "appended"
+    other = tmp_path / "other"
+    other.mkdir()
+    store.save(other)
+    assert DocumentStore.open(other) == DOCUMENTS + ["appended"]
+
+
+def test_open_empty_store(tmp_path):
+    DocumentStore().save(tmp_path)
+    store = DocumentStore.open(tmp_path)
+    assert len(store) == 0
+    assert store == []
+
+
+def test_open_rejects_truncated_blob(tmp_path):
+    DocumentStore(DOCUMENTS).save(tmp_path)
+    (tmp_path / DocumentStore.BLOB_FILE).write_bytes(b"first")
+    with pytest.raises(ValueError):
+        DocumentStore.open(tmp_path)
@@ -0,0 +1,95 @@
+"""
+Unit tests for embedding_pipeline.py
+"""
+
+from unittest.mock import Mock
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+import numpy as np  # noqa: E402
+
+from src.rag.embedding_pipeline import (  # noqa: E402
+    encode_batches,
+    encoding_pool,
+    iter_batches,
+    progress_printer,
+)
+from src.rag.hashing_embedder import HashingEmbedder  # noqa: E402
+
+TEXTS = [f"document number {i}" for i in range(10)]
+
+
+def test_iter_batches():
+    assert list(iter_batches(["a", "b", "c"], 2)) == [(0, ["a", "b"]), (2, ["c"])]
+    assert list(iter_batches([], 2)) == []
+
+
+def test_encode_batches_streams_in_order():
+    model = HashingEmbedder(dimension=16)
+    progress = Mock()
+
+    batches = list(encode_batches(model, TEXTS, batch_size=4, progress=progress))
+
+    assert [start for start, _ in batches] == [0, 4, 8]
+    embeddings = np.concatenate([batch for _, batch in batches])
+    assert embeddings.dtype == np.float32
+    assert np.allclose(embeddings, model.encode(TEXTS))
+    assert [call.args for call in progress.call_args_list] == [
+        (4, 10),
+        (8, 10),
+        (10, 10),
+    ]
+
+
+def test_encode_batches_with_process_pool():
+    model = HashingEmbedder(dimension=16)
+    batches = list(encode_batches(model, TEXTS, batch_size=3, workers=2))
+
+    assert [start for start, _ in batches] == [0, 3, 6, 9]
+    embeddings = np.concatenate([batch for _, batch in batches])
+    assert np.allclose(embeddings, model.encode(TEXTS))
+
+
+def test_encode_batches_uses_model_pool():
+    model = Mock()
+    model.encode_multi_process.side_effect = lambda batch, pool, chunk_size: (
+        np.ones((len(batch), 2))
+    )
+
+    batches = list(encode_batches(model, TEXTS, batch_size=5, workers=2))
+
+    assert len(batches) == 2
+    model.start_multi_process_pool.assert_called_once_with(["cpu", "cpu"])
+    model.stop_multi_process_pool.assert_called_once()
+    assert model.encode_multi_process.call_args.kwargs["chunk_size"] == 3
+    model.encode.assert_not_called()
+
+
+def test_encoding_pool_is_shared_across_calls():
+    model = Mock()
+    model.encode_multi_process.side_effect = lambda batch, pool, chunk_size: (
+        np.ones((len(batch), 2))
+    )
+
+    with encoding_pool(model, workers=2) as pool:
+        for texts in (TEXTS[:5], TEXTS[5:]):
+            batches = list(encode_batches(model, texts, 2, workers=2, pool=pool))
+            assert [start for start, _ in batches] == [0, 2, 4]
+
+    model.start_multi_process_pool.assert_called_once_with(["cpu", "cpu"])
+    model.stop_multi_process_pool.assert_called_once_with(pool)
+    assert model.encode_multi_process.call_count == 6
+    with encoding_pool(model, workers=1) as pool:
+        assert pool is None
+
+
+def test_progress_printer_limits_updates(capsys):
+    report = progress_printer("Embedding", steps=2)
+    for done in range(1, 11):
+        report(done, 10)
+    assert capsys.readouterr().out.splitlines() == [
+        "Embedding: 5/10 (50%)",
+        "Embedding: 10/10 (100%)",
+    ]
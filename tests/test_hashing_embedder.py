@@ -0,0 +1,45 @@
+"""
+Unit tests for hashing_embedder.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+import numpy as np  # noqa: E402
+
+from src.rag.hashing_embedder import HashingEmbedder  # noqa: E402
+
+
+def test_encode_shape_and_normalization():
+    embedder = HashingEmbedder(dimension=32)
+    embeddings = embedder.encode(["deep learning", "", "black holes"])
+
+    assert embeddings.shape == (3, 32)
+    assert embeddings.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(embeddings[[0, 2]], axis=1), 1.0)
+    assert not embeddings[1].any()
+
+
+def test_encode_is_deterministic():
+    first = HashingEmbedder().encode(["Neural networks"])
+    second = HashingEmbedder().encode(["neural   NETWORKS"])
+    np.testing.assert_array_equal(first, second)
+
+
+def test_similar_texts_are_closer():
+    embedder = HashingEmbedder()
+    query, related, unrelated = embedder.encode(
+        ["neural network", "neural networks learn", "the andromeda galaxy"]
+    )
+    assert np.linalg.norm(query - related) < np.linalg.norm(query - unrelated)
+
+
+def test_names():
+    assert HashingEmbedder.handles("hashing")
+    assert HashingEmbedder.handles("hashing-512")
+    assert not HashingEmbedder.handles("all-MiniLM-L6-v2")
+    assert HashingEmbedder.from_name("hashing").name == "hashing-384"
+    assert HashingEmbedder.from_name("hashing-512").dimension == 512
+    with pytest.raises(ValueError):
+        HashingEmbedder.from_name("hashing-large")
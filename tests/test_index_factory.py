@@ -0,0 +1,145 @@
+"""
+Unit tests for index_factory.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from src.rag.index_factory import (  # noqa: E402
+    build_index,
+    choose_index_type,
+    default_pq_m,
+    describe_index_params,
+    recall_at_k,
+    set_search_params,
+    training_size,
+)
+
+
+def _embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.random((n, dim), dtype="float32")
+
+
+def test_choose_index_type_by_size():
+    assert choose_index_type(100) == "flat"
+    assert choose_index_type(50_000) == "hnsw"
+    assert choose_index_type(500_000) == "ivf"
+    assert choose_index_type(5_000_000) == "ivfpq"
+
+
+def test_default_pq_m_divides_dimension():
+    assert default_pq_m(384) == 96
+    assert 384 % default_pq_m(384) == 0
+    assert default_pq_m(3) == 1
+
+
+def test_build_index_rejects_unknown_type():
+    with pytest.raises(ValueError):
+        build_index(_embeddings(10), index_type="tree")
+
+
+def test_build_flat_and_hnsw():
+    assert isinstance(build_index(_embeddings(10), "auto"), faiss.IndexFlatL2)
+    index = build_index(_embeddings(10), "hnsw", ef_construction=80)
+    assert isinstance(index, faiss.IndexHNSWFlat)
+    assert index.hnsw.efConstruction == 80
+
+
+def test_training_size():
+    assert training_size(5_000, storage="int8", train_size=1_000) == 1_000
+    assert training_size(5_000, storage="float16") == 0
+    assert training_size(5_000) == 0
+    assert training_size(50_000, "hnsw") == 0
+    assert training_size(500, "ivf", nlist=4, train_size=100) == 156
+    assert training_size(100, "ivf", nlist=4, train_size=1_000) == 100
+    assert training_size(2_000_000, train_size=100_000) == 5656 * 39
+
+
+def test_build_index_uses_corpus_size_for_auto():
+    index = build_index(_embeddings(10), num_documents=50_000)
+    assert isinstance(index, faiss.IndexHNSWFlat)
+
+
+def test_ivf_falls_back_to_flat_when_too_small():
+    index = build_index(_embeddings(50), "ivf", nlist=16)
+    assert isinstance(index, faiss.IndexFlatL2)
+
+
+def test_build_and_search_ivf():
+    embeddings = _embeddings(2000)
+    index = build_index(embeddings, "ivf", nlist=8, train_size=500)
+    assert isinstance(index, faiss.IndexIVFFlat)
+    assert index.is_trained
+    assert index.ntotal == 0
+
+    index.add(embeddings)
+    set_search_params(index, nprobe=100)
+    assert index.nprobe == 8  # capped at nlist
+
+    _, ids = index.search(embeddings[42:43], 1)
+    assert ids[0][0] == 42
+
+
+def test_build_ivfpq():
+    embeddings = _embeddings(10_000)
+    index = build_index(embeddings, "ivfpq", nlist=4, pq_m=4)
+    assert isinstance(index, faiss.IndexIVFPQ)
+    assert index.is_trained
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf"])
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_scalar_quantized_storage_keeps_recall(index_type, storage):
+    embeddings = _embeddings(2000, dim=32)
+    queries = embeddings[:100] + 0.01
+    reference = faiss.IndexFlatL2(32)
+    reference.add(embeddings)
+    _, expected = reference.search(queries, 10)
+
+    index = build_index(embeddings, index_type, nlist=8, storage=storage)
+    assert index.is_trained
+    index.add(embeddings)
+    set_search_params(index, nprobe=8, ef_search=64)
+    _, found = index.search(queries, 10)
+
+    assert recall_at_k(expected, found) >= 0.9
+
+    full = build_index(embeddings, index_type, nlist=8)
+    full.add(embeddings)
+    size = faiss.serialize_index(index).nbytes
+    assert size < faiss.serialize_index(full).nbytes
+
+
+def test_build_index_rejects_unknown_storage():
+    with pytest.raises(ValueError):
+        build_index(_embeddings(10), "flat", storage="float8")
+
+
+def test_recall_at_k():
+    assert recall_at_k(np.array([[1, 2], [3, 4]]), np.array([[2, 1], [3, 5]])) == 0.75
+    assert recall_at_k(np.array([[-1, -1]]), np.array([[-1, -1]])) == 1.0
+
+
+def test_set_search_params_ignores_flat_index():
+    index = faiss.IndexFlatL2(4)
+    set_search_params(index, nprobe=8, ef_search=32)
+
+
+def test_describe_index_params_is_stable():
+    assert describe_index_params("HNSW", 0, 32, 40, 0) == describe_index_params(
+        "hnsw", 0, 32, 40, 0
+    )
+    assert describe_index_params("ivf", 8, 32, 40, 0) != describe_index_params(
+        "ivf", 16, 32, 40, 0
+    )
+    assert describe_index_params("flat", 0, 32, 40, 0, "float32") == (
+        describe_index_params("flat", 0, 32, 40, 0)
+    )
+    assert describe_index_params("flat", 0, 32, 40, 0, "int8") != (
+        describe_index_params("flat", 0, 32, 40, 0)
+    )
@@ -0,0 +1,107 @@
+"""
+Unit tests for index_store.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from src.rag.document_store import DocumentStore  # noqa: E402
+from src.rag.index_store import IndexSnapshot  # noqa: E402
+from src.rag.lexical_index import BM25Index  # noqa: E402
+from src.rag.partitions import PartitionedIndex  # noqa: E402
+
+
+def _build_index(n=3, dim=4):
+    index = faiss.IndexFlatL2(dim)
+    index.add(np.arange(n * dim, dtype="float32").reshape(n, dim))
+    return index
+
+
+def test_make_key_depends_on_content_and_model():
+    key = IndexSnapshot.make_key(b"[]", "model-a")
+    assert key == IndexSnapshot.make_key(b"[]", "model-a")
+    assert key != IndexSnapshot.make_key(b'["doc"]', "model-a")
+    assert key != IndexSnapshot.make_key(b"[]", "model-b")
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_save_and_load_round_trip(tmp_path, mmap):
+    snapshot = IndexSnapshot.for_knowledge_base(tmp_path, b"kb", "model")
+    assert not snapshot.exists()
+    assert snapshot.load() is None
+
+    assert snapshot.save(_build_index(), ["a", "b", "c"])
+    assert snapshot.exists()
+
+    index, documents = snapshot.load(mmap=mmap)
+    assert isinstance(documents, DocumentStore)
+    assert documents == ["a", "b", "c"]
+    assert index.ntotal == 3
+    _, ids = index.search(np.zeros((1, 4), dtype="float32"), 1)
+    assert ids[0][0] == 0
+
+
+def test_save_rejects_misaligned_documents(tmp_path):
+    snapshot = IndexSnapshot(tmp_path, "key")
+    assert not snapshot.save(_build_index(n=2), ["only one"])
+    assert not snapshot.exists()
+
+
+def test_save_and_load_lexical_index(tmp_path):
+    snapshot = IndexSnapshot(tmp_path, "key")
+    snapshot.save(_build_index(), ["a", "b", "c"])
+    assert snapshot.load_lexical_index() is None
+
+    lexical_index = BM25Index()
+    lexical_index.add(["a", "b"])
+    assert not snapshot.save(
+        _build_index(), ["a", "b", "c"], lexical_index=lexical_index
+    )
+
+    lexical_index.add(["c"])
+    assert snapshot.save(_build_index(), ["a", "b", "c"], lexical_index=lexical_index)
+    loaded = snapshot.load_lexical_index()
+    assert len(loaded) == 3
+    assert loaded.search("b", 3) == lexical_index.search("b", 3)
+
+
+def test_load_rejects_inconsistent_snapshot(tmp_path):
+    snapshot = IndexSnapshot(tmp_path, "key")
+    snapshot.save(_build_index(), ["a", "b", "c"])
+    (snapshot.path / IndexSnapshot.DOCUMENTS_FILE).write_text('["a"]')
+    assert snapshot.load() is None
+
+
+def test_save_and_load_chunk_sources(tmp_path):
+    snapshot = IndexSnapshot(tmp_path, "key")
+    assert not snapshot.save(_build_index(), ["a", "b", "c"], [(0, 0, 1)])
+
+    sources = [(0, 0, 1), (0, 1, 2), (1, 0, 1)]
+    assert snapshot.save(_build_index(), ["a", "b", "c"], sources)
+    assert snapshot.load_sources() == sources
+
+    snapshot.save(_build_index(), ["a", "b", "c"])
+    assert snapshot.load_sources() is None
+
+
+def test_save_and_load_partitioned_index(tmp_path):
+    index = PartitionedIndex(lambda vectors: faiss.IndexFlatL2(vectors.shape[1]))
+    embeddings = np.arange(12, dtype="float32").reshape(3, 4)
+    index.add(embeddings, ["ml", "cosmos", "ml"], np.arange(3, dtype=np.int64))
+    metadata = [{"category": c} for c in ("ml", "cosmos", "ml")]
+
+    snapshot = IndexSnapshot(tmp_path, "key")
+    assert snapshot.save(index, ["a", "b", "c"], metadata=metadata)
+    assert snapshot.exists()
+
+    loaded, documents = snapshot.load()
+    assert isinstance(loaded, PartitionedIndex)
+    assert documents == ["a", "b", "c"]
+    assert sorted(loaded.partitions) == ["cosmos", "ml"]
+    _, ids = loaded.search(embeddings[2:], 1, ["ml"])
+    assert ids.tolist() == [[2]]
+    assert snapshot.load_metadata() == metadata
@@ -0,0 +1,64 @@
+"""
+Unit tests for knowledge_base_file.py
+"""
+
+import hashlib
+import json
+import types
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+from src.rag.knowledge_base_file import (  # noqa: E402
+    file_digest,
+    is_jsonl,
+    load_documents,
+    write_documents,
+)
+
+
+def test_write_and_load_jsonl(tmp_path):
+    path = tmp_path / "kb.jsonl"
+    assert write_documents(path, iter(["a", 'quote "b"', "line\nbreak"])) == 3
+    assert len(path.read_text().splitlines()) == 3
+
+    documents, count = load_documents(path)
+    assert isinstance(documents, types.GeneratorType)
+    assert count == 3
+    assert list(documents) == ["a", 'quote "b"', "line\nbreak"]
+
+
+def test_load_json_array_for_compatibility(tmp_path):
+    path = tmp_path / "kb.json"
+    assert write_documents(path, ["a", "b"]) == 2
+    assert json.loads(path.read_text()) == ["a", "b"]
+    assert not is_jsonl(path)
+
+    documents, count = load_documents(path)
+    assert documents == ["a", "b"]
+    assert count == 2
+
+
+def test_jsonl_objects_and_blank_lines(tmp_path):
+    path = tmp_path / "kb.json"
+    path.write_text('{"text": "first", "id": 1}\n\n"second"\n')
+    assert is_jsonl(path)
+
+    documents, count = load_documents(path)
+    assert count == 2
+    assert list(documents) == ["first", "second"]
+
+
+def test_invalid_jsonl_line_reports_line_number(tmp_path):
+    path = tmp_path / "kb.jsonl"
+    path.write_text('"ok"\nnot json\n')
+    documents, _ = load_documents(path)
+    with pytest.raises(ValueError, match=":2:"):
+        list(documents)
+
+
+def test_file_digest(tmp_path):
+    path = tmp_path / "kb.jsonl"
+    path.write_bytes(b'"a"\n')
+    assert file_digest(path) == hashlib.sha256(b'"a"\n').digest()
@@ -0,0 +1,64 @@
+"""
+Unit tests for lexical_index.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+from src.rag.lexical_index import (  # noqa: E402
+    BM25Index,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Deep-Learning, RL & ML!") == ["deep", "learning", "rl", "ml"]
+
+
+def test_search_ranks_by_bm25():
+    index = BM25Index()
+    index.add(["the cat sat", "the dog sat on the cat cat"])
+    index.add(["a dog barked"])
+
+    assert len(index) == 3
+    ids, scores = index.search("dog", 5)
+    assert sorted(ids) == [1, 2]
+    assert ids[0] == 2  # the shorter document scores higher
+    assert scores[0] >= scores[1] > 0
+
+    ids, _ = index.search("cat", 1)
+    assert ids == [1]
+
+
+def test_search_without_matches():
+    index = BM25Index()
+    assert index.search("anything", 3) == ([], [])
+    index.add(["some text"])
+    assert index.search("missing", 3) == ([], [])
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = BM25Index()
+    index.add(["the cat sat", "the dog sat on the cat cat"])
+    index.add(["a dog barked", ""])
+    path = tmp_path / "bm25.npz"
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 4
+    for query in ("dog", "cat sat", "missing"):
+        assert loaded.search(query, 5) == index.search(query, 5)
+
+    loaded.add(["dog dog"])
+    assert loaded.search("dog", 1)[0] == [4]
+
+    BM25Index().save(path)
+    assert len(BM25Index.load(path)) == 0
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert [doc_id for doc_id, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
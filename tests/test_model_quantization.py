@@ -0,0 +1,42 @@
+"""
+Unit tests for model_quantization.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+from src.rag.hashing_embedder import HashingEmbedder  # noqa: E402
+from src.rag.model_quantization import (  # noqa: E402
+    apply_precision,
+    model_size,
+    quantize_dynamic,
+)
+
+
+def test_int8_quantizes_linear_layers():
+    torch = pytest.importorskip("torch")
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(
+        torch.nn.Linear(64, 64), torch.nn.ReLU(), torch.nn.Linear(64, 8)
+    )
+    inputs = torch.randn(4, 64)
+    expected = model(inputs)
+    float32_size = model_size(model)
+
+    quantized = apply_precision(model, "int8")
+    assert not any(isinstance(m, torch.nn.Linear) for m in quantized.modules())
+    assert torch.allclose(quantized(inputs), expected, atol=0.05)
+    assert model_size(quantized) < float32_size / 2
+
+
+def test_float32_and_non_torch_models_are_unchanged():
+    pytest.importorskip("torch")
+    embedder = HashingEmbedder()
+    assert apply_precision(embedder, "float32") is embedder
+    assert quantize_dynamic(embedder) is embedder
+
+
+def test_unknown_precision():
+    with pytest.raises(ValueError, match="Unknown model precision"):
+        apply_precision(object(), "int4")
@@ -0,0 +1,76 @@
+"""
+Unit tests for partitions.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from src.rag.partitions import (  # noqa: E402
+    PartitionedIndex,
+    document_metadata,
+    matches_filters,
+    route_query,
+)
+
+
+def test_document_metadata():
+    assert document_metadata(
+        "Sci-Fi Movie: Dune. Release Date: 2021-09-15. Overview: Spice."
+    ) == {"category": "scifi", "source": "tmdb", "date": "2021-09-15"}
+    cosmos = document_metadata("Cosmos: M31. Date: 2024-01-02. Explanation: x")
+    assert cosmos == {"category": "cosmos", "source": "nasa", "date": "2024-01-02"}
+    ml = document_metadata("Machine Learning - Overfitting: fitting noise")
+    assert ml["source"] == "wikipedia"
+    assert document_metadata("Plain note") == {
+        "category": "other",
+        "source": "unknown",
+        "date": "",
+    }
+
+
+def test_matches_filters():
+    metadata = {"category": "cosmos", "source": "nasa", "date": "2024-01-02"}
+    assert matches_filters(metadata, {})
+    assert matches_filters(metadata, {"category": "cosmos", "source": "nasa"})
+    assert not matches_filters(metadata, {"category": "ml"})
+
+
+def test_route_query():
+    assert route_query("Which galaxy is closest to us?") == "cosmos"
+    assert route_query("Recommend a sci-fi movie") == "scifi"
+    assert route_query("What is supervised learning?") == "ml"
+    assert route_query("Tell me something") is None
+    # Ambiguous queries are not routed
+    assert route_query("a movie about a planet") is None
+
+
+def test_partitioned_index_searches_selected_partitions():
+    index = PartitionedIndex(lambda vectors: faiss.IndexFlatL2(vectors.shape[1]))
+    embeddings = np.array(
+        [[0.0, 0.0], [1.0, 0.0], [0.0, 1.0], [5.0, 5.0]], dtype="float32"
+    )
+    index.add(embeddings, ["a", "b", "a", "b"], np.arange(4, dtype=np.int64))
+    assert index.ntotal == 4
+    assert len(index.sub_indexes()) == 2
+
+    query = np.array([[0.9, 0.0]], dtype="float32")
+    _, ids = index.search(query, 2)
+    assert ids.tolist() == [[1, 0]]
+
+    distances, ids = index.search(query, 3, ["a"])
+    assert ids.tolist() == [[0, 2, -1]]
+    assert np.isinf(distances[0, 2])
+
+    _, ids = index.search(query, 1, ["missing"])
+    assert ids.tolist() == [[-1]]
+
+
+def test_partitioned_index_needs_builder_for_new_partitions():
+    with pytest.raises(ValueError):
+        PartitionedIndex().add(
+            np.zeros((1, 2), dtype="float32"), ["a"], np.zeros(1, dtype=np.int64)
+        )
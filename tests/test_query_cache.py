@@ -0,0 +1,102 @@
+"""
+Unit tests for query_cache.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+import os  # noqa: E402
+import time  # noqa: E402
+from unittest.mock import patch  # noqa: E402
+
+import numpy as np  # noqa: E402
+
+from src.rag.query_cache import QueryEmbeddingCache  # noqa: E402
+
+
+def _vector(value):
+    return np.full((1, 4), value, dtype="float32")
+
+
+def test_keys_are_normalized():
+    cache = QueryEmbeddingCache()
+    cache.put("What is  ML?", _vector(1))
+    assert "what is ml?" in cache
+    np.testing.assert_array_equal(cache.get("  WHAT is ML?\n"), _vector(1))
+
+
+def test_lru_eviction_and_counters():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("a", _vector(1))
+    cache.put("b", _vector(2))
+    assert cache.get("a") is not None  # "a" becomes most recently used
+    cache.put("c", _vector(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats() == {
+        "size": 2,
+        "max_size": 2,
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+        "disk_hits": 0,
+    }
+
+
+def test_ttl_expires_entries():
+    cache = QueryEmbeddingCache(ttl=10)
+    with patch("src.rag.query_cache.time.monotonic", return_value=100.0):
+        cache.put("query", _vector(1))
+    with patch("src.rag.query_cache.time.monotonic", return_value=105.0):
+        assert cache.get("query") is not None
+    with patch("src.rag.query_cache.time.monotonic", return_value=200.0):
+        assert cache.get("query") is None
+    assert len(cache) == 0
+
+
+def test_zero_size_disables_cache():
+    cache = QueryEmbeddingCache(max_size=0)
+    cache.put("query", _vector(1))
+    assert cache.get("query") is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    first = QueryEmbeddingCache(cache_dir=tmp_path, namespace="model-a")
+    first.put("query", _vector(7))
+
+    second = QueryEmbeddingCache(cache_dir=tmp_path, namespace="model-a")
+    np.testing.assert_array_equal(second.get("Query"), _vector(7))
+    assert second.stats()["disk_hits"] == 1
+    assert "query" in second
+
+    # Embeddings from another model are not reused
+    other = QueryEmbeddingCache(cache_dir=tmp_path, namespace="model-b")
+    assert other.get("query") is None
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = QueryEmbeddingCache(cache_dir=tmp_path, disk_max_size=10)
+    files = tmp_path / QueryEmbeddingCache.DIR_NAME
+    for i in range(11):
+        cache.put(f"query {i}", _vector(i))
+        os.utime(cache._disk_file(f"query {i}"), (i, i))
+    # The oldest files are deleted down to DISK_PRUNE_RATIO of the limit
+    assert len(list(files.glob("*.npy"))) == 9
+    cache.clear()
+    assert cache.get("query 0") is None
+    np.testing.assert_array_equal(cache.get("query 10"), _vector(10))
+
+
+def test_expired_disk_entries_are_deleted(tmp_path):
+    cache = QueryEmbeddingCache(ttl=60, cache_dir=tmp_path)
+    cache.put("query", _vector(3))
+    file = cache._disk_file("query")
+    old = time.time() - 120
+    os.utime(file, (old, old))
+    cache.clear()
+
+    assert cache.get("query") is None
+    assert not file.exists()
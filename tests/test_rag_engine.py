@@ -6,11 +6,24 @@ import pytest
 
 pytestmark = pytest.mark.unit
 
+import json  # noqa: E402
+import threading  # noqa: E402
 from unittest.mock import Mock, patch  # noqa: E402
 
+import faiss  # noqa: E402
 import numpy as np  # noqa: E402
 
+from src.rag.dedup import NearDuplicateDetector  # noqa: E402
+from src.rag.document_store import DocumentStore  # noqa: E402
+from src.rag.hashing_embedder import HashingEmbedder  # noqa: E402
+from src.rag.lexical_index import BM25Index  # noqa: E402
+from src.rag.partitions import PartitionedIndex  # noqa: E402
+from src.rag.query_cache import QueryEmbeddingCache  # noqa: E402
 from src.rag.rag_engine import RAGEngine  # noqa: E402
+from src.rag.response_cache import (  # noqa: E402
+    ExactResponseCache,
+    SemanticResponseCache,
+)
 
 
 @pytest.fixture
@@ -23,36 +36,83 @@ def mock_config():
     config.TOP_K_RETRIEVAL = 3
     config.MAX_ITERATIONS = 1
     config.MAX_LENGTH = 50
+    _set_index_config(config)
     return config
 
 
+def _set_index_config(config):
+    """Give a mock config the default index and retrieval settings"""
+    config.INDEX_TYPE = "auto"
+    config.INDEX_NLIST = 0
+    config.INDEX_HNSW_M = 32
+    config.INDEX_EF_CONSTRUCTION = 40
+    config.INDEX_PQ_M = 0
+    config.INDEX_TRAIN_SIZE = 100_000
+    config.INDEX_STORAGE = "float32"
+    config.INDEX_NPROBE = 16
+    config.INDEX_EF_SEARCH = 64
+    config.KB_BATCH_SIZE = 1000
+    config.EMBED_BATCH_SIZE = 256
+    config.EMBED_WORKERS = 0
+    config.RETRIEVAL_MODE = "hybrid"
+    config.HYBRID_CANDIDATES = 20
+    config.RRF_K = 60
+    config.QUERY_CACHE_SIZE = 1024
+    config.QUERY_CACHE_TTL = 0
+    config.QUERY_CACHE_DISK = False
+    config.QUERY_CACHE_DISK_MAX = 10000
+    config.RESPONSE_CACHE_SIZE = 256
+    config.RESPONSE_CACHE_THRESHOLD = 0.95
+    config.DECODING = "sample"
+    config.NUM_BEAMS = 4
+    config.EXACT_CACHE_SIZE = 1024
+    config.EXACT_CACHE_DISK = False
+    config.ENCODER_REUSE = False
+    config.INFERENCE_BACKEND = "torch"
+    config.MODEL_PRECISION = "float32"
+    config.CHUNK_TOKENS = 128
+    config.CHUNK_OVERLAP = 32
+    config.CHUNK_MERGE = True
+    config.DEDUP = True
+    config.DEDUP_THRESHOLD = 0.8
+    config.PARTITION_INDEX = False
+    config.PARTITION_ROUTER = False
+
+
 @patch("src.rag.rag_engine.Config")
 @patch("src.rag.rag_engine.ToolExecutor")
-@patch("src.rag.rag_engine.SentenceTransformer")
-@patch("src.rag.rag_engine.AutoTokenizer")
-@patch("src.rag.rag_engine.AutoModelForSeq2SeqLM")
-@patch("src.rag.rag_engine.faiss.IndexFlatL2")  # Patch faiss for CI
+@patch("src.rag.backends.TorchEmbeddingBackend.load")
+@patch("src.rag.backends.TorchGeneratorBackend.load")
+@patch("faiss.IndexFlatL2")  # Patch faiss for CI
 def test_rag_engine_init(
     mock_faiss,
-    mock_model,
-    mock_tokenizer,
-    mock_embed,
+    mock_load_generator,
+    mock_load_embedder,
     mock_tool,
     mock_config_class,
     mock_config,
 ):
+    # The patched IndexFlatL2 is not a real faiss index to set nprobe on
+    mock_config.INDEX_NPROBE = 0
     mock_config_class.return_value = mock_config
     mock_embedding_model = Mock()
     mock_embedding_model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
-    mock_embed.return_value = mock_embedding_model
-    mock_tokenizer.from_pretrained.return_value = Mock()
-    mock_model.from_pretrained.return_value = Mock()
+    mock_load_embedder.return_value = mock_embedding_model
+    mock_load_generator.return_value = (Mock(), Mock())
 
     engine = RAGEngine()
     assert engine.config == mock_config
-    mock_embed.assert_called_once_with("test-model")
-    mock_tokenizer.from_pretrained.assert_called_once_with("test-gen")
-    mock_model.from_pretrained.assert_called_once_with("test-gen")
+    # Nothing loads until it is needed
+    mock_load_embedder.assert_not_called()
+    mock_load_generator.assert_not_called()
+    result = engine.generate_response("CALC: 2+2")
+    assert result is mock_tool.return_value.execute_tool.return_value
+    mock_load_embedder.assert_not_called()
+
+    engine.warm_up(background=False)
+    mock_load_embedder.assert_called_once_with("test-model")
+    mock_load_generator.assert_called_once_with("test-gen")
+    assert engine.knowledge_base
 
 
 @patch("src.rag.rag_engine.Config")
@@ -88,31 +148,845 @@ def test_generate_response_calc(mock_tool, mock_config_class):
 
 @patch("src.rag.rag_engine.Config")
 @patch("src.rag.rag_engine.ToolExecutor")
-@patch("src.rag.rag_engine.SentenceTransformer")
-@patch("src.rag.rag_engine.AutoTokenizer")
-@patch("src.rag.rag_engine.AutoModelForSeq2SeqLM")
+@patch("src.rag.backends.TorchEmbeddingBackend.load")
+@patch("src.rag.backends.TorchGeneratorBackend.load")
 def test_retrieve_context(
-    mock_model, mock_tokenizer, mock_embed, mock_tool, mock_config_class
+    mock_load_generator, mock_load_embedder, mock_tool, mock_config_class
 ):
     mock_config = Mock()
     mock_config.TOP_K_RETRIEVAL = 2
+    mock_config.RETRIEVAL_MODE = "dense"
+    mock_config.CHUNK_MERGE = False
+    mock_config.PARTITION_ROUTER = False
     mock_config_class.return_value = mock_config
 
     mock_embedding_model = Mock()
     mock_embedding_model.encode.return_value = np.array(
         [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]]
     )
-    mock_embed.return_value = mock_embedding_model
+    mock_load_embedder.return_value = mock_embedding_model
 
     mock_index = Mock()
-    mock_index.search.return_value = ([0.1, 0.2], [[0, 1]])
-    with patch("src.rag.rag_engine.faiss.IndexFlatL2", return_value=mock_index):
+    mock_index.search.return_value = ([[0.1, 0.2]], [[0, 1]])
+    with patch("faiss.IndexFlatL2", return_value=mock_index):
         with patch.object(RAGEngine, "__init__", lambda self: None):
             engine = RAGEngine()
+            engine._load_lock = threading.RLock()
+            engine._knowledge_base_loaded = True
             engine.embedding_model = mock_embedding_model
             engine.knowledge_base = ["doc1", "doc2", "doc3"]
             engine.index = mock_index
-            engine.query_cache = {}
+            engine.query_cache = QueryEmbeddingCache()
             engine.config = mock_config
             result = engine.retrieve_context("test query")
             assert result == ["doc1", "doc2"]
+
+
+def _make_engine(documents_to_vectors):
+    """Build a bare engine whose embedder looks vectors up by document text"""
+    embedding_model = Mock()
+    embedding_model.encode.side_effect = lambda docs: np.array(
+        [documents_to_vectors[doc] for doc in docs], dtype="float32"
+    )
+
+    with patch.object(RAGEngine, "__init__", lambda self: None):
+        engine = RAGEngine()
+    engine._load_lock = threading.RLock()
+    engine._knowledge_base_loaded = True
+    engine.embedding_model = embedding_model
+    engine.embedding_model_name = "test-model"
+    engine.tokenizer = None
+    engine.generator = None
+    engine.knowledge_base = DocumentStore()
+    engine.chunk_sources = []
+    engine.chunk_metadata = []
+    engine._filter_masks = {}
+    engine.num_documents = 0
+    engine.index = None
+    engine.lexical_index = BM25Index()
+    engine.deduplicator = None
+    engine.query_cache = QueryEmbeddingCache()
+    engine.response_cache = SemanticResponseCache()
+    engine.exact_cache = ExactResponseCache()
+    engine.inference_backend = "torch"
+    engine.model_precision = "float32"
+    engine.config = Mock()
+    engine.config.TOP_K_RETRIEVAL = 1
+    _set_index_config(engine.config)
+    return engine
+
+
+def _tokenize(texts, **kwargs):
+    """Tokenizer call returning one input row per text, like return_tensors"""
+    rows = np.ones((len(texts), 1), dtype="int64")
+    return {"input_ids": rows, "attention_mask": rows}
+
+
+def test_add_documents_grows_index_incrementally():
+    vectors = {
+        "doc1": [1.0, 0.0],
+        "doc2": [0.0, 1.0],
+        "doc3": [-1.0, 0.0],
+        "first query": [0.9, 0.1],
+        "third query": [-0.9, 0.1],
+    }
+    engine = _make_engine(vectors)
+
+    engine.add_documents(["doc1", "doc2"])
+    engine.add_documents(["doc3"])
+
+    assert engine.index.ntotal == len(engine.knowledge_base) == 3
+    # Only the new batch is encoded on the second call
+    assert engine.embedding_model.encode.call_args_list[-1].args[0] == ["doc3"]
+    assert engine.retrieve_context("first query") == ["doc1"]
+    assert engine.retrieve_context("third query") == ["doc3"]
+
+
+def test_retrieve_context_skips_padding_ids():
+    engine = _make_engine({"doc1": [1.0, 0.0], "some query": [1.0, 0.0]})
+    engine.config.TOP_K_RETRIEVAL = 3
+
+    engine.add_documents(["doc1"])
+
+    assert engine.retrieve_context("some query") == ["doc1"]
+
+
+def test_load_knowledge_base_reuses_snapshot(tmp_path):
+    vectors = {"doc1": [1.0, 0.0], "doc2": [0.0, 1.0]}
+    kb_file = tmp_path / "kb.json"
+    kb_file.write_text('["doc1", "doc2"]')
+
+    def configure(engine):
+        engine.config.DEDUP = False
+        engine.config.DATASET_DIR = str(tmp_path)
+        engine.config.KNOWLEDGE_BASE_FILE = "kb.json"
+        engine.config.CACHE_DIR = tmp_path / "cache"
+        engine.config.EMBEDDING_MODEL = "test-model"
+        engine.config.INDEX_SNAPSHOT = True
+        engine.config.INDEX_MMAP = False
+
+    first = _make_engine(vectors)
+    configure(first)
+    first.load_knowledge_base()
+    assert first.embedding_model.encode.call_count == 1
+
+    second = _make_engine(vectors)
+    configure(second)
+    with patch.object(BM25Index, "add") as lexical_add:
+        second.load_knowledge_base()
+    second.embedding_model.encode.assert_not_called()
+    lexical_add.assert_not_called()  # BM25 postings are loaded, not rebuilt
+    assert second.knowledge_base == ["doc1", "doc2"]
+    assert second.index.ntotal == 2
+    assert second.lexical_index.search("doc2", 2)[0] == [1]
+
+    # Deduplication has its own snapshots, which restore the near-duplicate
+    # filter so that documents already loaded are not added again
+    for encode_calls in (1, 0):
+        with_dedup = _make_engine(vectors)
+        configure(with_dedup)
+        with_dedup.config.DEDUP = True
+        with_dedup.deduplicator = NearDuplicateDetector()
+        with_dedup.load_knowledge_base()
+        assert with_dedup.embedding_model.encode.call_count == encode_calls
+    with_dedup.add_documents(["doc2"])
+    assert with_dedup.knowledge_base == ["doc1", "doc2"]
+
+    # Changing the knowledge base invalidates the snapshot
+    kb_file.write_text('["doc1"]')
+    third = _make_engine(vectors)
+    configure(third)
+    third.load_knowledge_base()
+    assert third.embedding_model.encode.call_count == 1
+    assert third.knowledge_base == ["doc1"]
+
+
+def test_add_documents_uses_configured_index_type():
+    rng = np.random.default_rng(0)
+    documents = [f"doc{i}" for i in range(20)]
+    vectors = {doc: rng.random(8).tolist() for doc in documents}
+    vectors["nearest query"] = vectors["doc7"]
+    engine = _make_engine(vectors)
+    engine.config.INDEX_TYPE = "hnsw"
+    engine.config.INDEX_EF_SEARCH = 50
+
+    engine.add_documents(documents[:10])
+    engine.add_documents(documents[10:])
+
+    assert isinstance(engine.index, faiss.IndexHNSWFlat)
+    assert engine.index.hnsw.efSearch == 50
+    assert engine.index.ntotal == 20
+    assert engine.retrieve_context("nearest query") == ["doc7"]
+
+
+def test_retrieve_context_batch_encodes_and_searches_once():
+    vectors = {
+        "doc1": [1.0, 0.0],
+        "doc2": [0.0, 1.0],
+        "first query": [1.0, 0.0],
+        "second query": [0.0, 1.0],
+    }
+    engine = _make_engine(vectors)
+    engine.config.RETRIEVAL_MODE = "dense"
+    engine.add_documents(["doc1", "doc2"])
+    engine.embedding_model.encode.reset_mock()
+
+    results = engine.retrieve_context_batch(
+        ["first query", "second query", "First  Query"]
+    )
+
+    # Only distinct uncached queries are encoded, in a single call
+    engine.embedding_model.encode.assert_called_once_with(
+        ["first query", "second query"]
+    )
+    assert results[0] == (["doc1"], [0.0])
+    assert results[1] == (["doc2"], [0.0])
+    assert results[2] == (["doc1"], [0.0])
+
+    # A repeated batch is served from the query cache
+    engine.retrieve_context_batch(["first query", "second query"])
+    engine.embedding_model.encode.assert_called_once()
+
+
+def test_generate_response_batch_routes_and_batches():
+    engine = _make_engine(
+        {
+            "doc1": [1.0, 0.0],
+            "what is ml": [1.0, 0.0],
+            "what is two times two": [0.0, 1.0],
+        }
+    )
+    engine.add_documents(["doc1"])
+    engine.config.MAX_ITERATIONS = 2
+    engine.config.MAX_LENGTH = 50
+    engine.config.GENERATION_BATCH_SIZE = 2
+    engine.config.MAX_INPUT_TOKENS = 512
+    engine.tool_executor = Mock()
+    engine.tool_executor.get_available_tools.return_value = "tools"
+    engine.tool_executor.execute_tool.return_value = "Result: 4"
+    engine.tokenizer = Mock(side_effect=_tokenize)
+    engine.tokenizer.encode.side_effect = lambda text, **kwargs: text.split()
+    engine.generator = Mock()
+    engine.tokenizer.batch_decode.side_effect = [
+        ["Machine learning learns from data", "CALC: 2*2"],
+        ["The answer is four"],
+    ]
+
+    responses = engine.generate_response_batch(
+        ["hello there", "what is ml", "what is two times two"]
+    )
+
+    assert "Hello!" in responses[0]
+    assert responses[1] == "Machine learning learns from data"
+    assert responses[2] == "The answer is four"
+
+    # Both RAG queries share one padded batch; only the tool query is rerun
+    first_prompts = engine.tokenizer.call_args_list[0].args[0]
+    assert len(first_prompts) == 2
+    assert engine.tokenizer.call_args_list[0].kwargs["padding"] is True
+    second_prompts = engine.tokenizer.call_args_list[1].args[0]
+    assert len(second_prompts) == 1
+    assert "Tool result: Result: 4" in second_prompts[0]
+
+
+def test_generate_response_batch_without_generator_answers_from_context():
+    engine = _make_engine(
+        {
+            "Machine learning uses data": [1.0, 0.0],
+            "Galaxies hold billions of stars": [0.0, 1.0],
+            "tell me about ml": [1.0, 0.0],
+            "tell me about galaxies": [0.0, 1.0],
+        }
+    )
+    engine.add_documents(
+        ["Machine learning uses data", "Galaxies hold billions of stars"]
+    )
+
+    responses = engine.generate_response_batch(
+        ["tell me about galaxies", "hello", "tell me about ml"]
+    )
+
+    assert responses[0] == "Galaxies hold billions of stars"
+    assert "Hello!" in responses[1]
+    assert responses[2] == "Machine learning uses data"
+
+
+def test_hybrid_retrieval_finds_short_keyword_queries():
+    documents = [
+        "Machine learning uses data",
+        "Deep learning stacks layers",
+        "Interstellar is a science fiction film",
+    ]
+    vectors = {doc: [1.0, 0.0] for doc in documents}
+    vectors["interstellar"] = [1.0, 0.0]
+    engine = _make_engine(vectors)
+    engine.add_documents(documents)
+
+    # Dense scores are all tied, the lexical match decides the ranking
+    assert engine.retrieve_context("interstellar") == [documents[2]]
+
+
+def test_lexical_retrieval_without_embedder():
+    engine = _make_engine({})
+    engine.embedding_model = None
+    engine.config.TOP_K_RETRIEVAL = 2
+    engine.add_documents(["neural networks", "black holes", "transformers"])
+
+    assert engine.index is None
+    assert engine.retrieve_context("Transformers") == ["transformers"]
+    # No lexical match falls back to the first documents
+    assert engine.retrieve_context("galaxy") == ["neural networks", "black holes"]
+
+
+@patch("src.rag.rag_engine.Config")
+@patch("src.rag.rag_engine.ToolExecutor")
+@patch("src.rag.backends.TorchEmbeddingBackend.load")
+@patch("src.rag.backends.TorchGeneratorBackend.load")
+def test_rag_engine_hashing_embedder(
+    mock_load_generator,
+    mock_load_embedder,
+    mock_tool,
+    mock_config_class,
+    mock_config,
+):
+    mock_config.EMBEDDING_MODEL = "hashing-64"
+    mock_config.INDEX_SNAPSHOT = False
+    mock_config_class.return_value = mock_config
+    mock_load_generator.return_value = (Mock(), Mock())
+
+    engine = RAGEngine()
+    engine.warm_up(background=False)
+
+    mock_load_embedder.assert_not_called()
+    assert isinstance(engine.embedding_model, HashingEmbedder)
+    assert engine.embedding_model.dimension == 64
+    assert engine.index.ntotal == len(engine.knowledge_base)
+    assert "neural networks" in engine.retrieve_context("neural networks")[0]
+
+
+@patch("src.rag.rag_engine.Config")
+@patch("src.rag.rag_engine.ToolExecutor")
+def test_rag_engine_falls_back_on_invalid_hashing_name(
+    mock_tool, mock_config_class, mock_config
+):
+    mock_config.EMBEDDING_MODEL = "hashing-large"
+    mock_config.INDEX_SNAPSHOT = False
+    mock_config_class.return_value = mock_config
+
+    engine = RAGEngine()
+
+    assert engine.embedding_model.name == "hashing-384"
+    assert engine.embedding_model_name == "hashing-384"
+    assert engine.config.EMBEDDING_MODEL == "hashing-large"
+
+
+@patch("src.rag.rag_engine.Config")
+@patch("src.rag.rag_engine.ToolExecutor")
+@patch("sentence_transformers.SentenceTransformer", None)
+@patch("src.rag.backends.TorchGeneratorBackend.load")
+def test_rag_engine_falls_back_to_hashing_embedder(
+    mock_load_generator, mock_tool, mock_config_class, mock_config
+):
+    mock_config.INDEX_SNAPSHOT = False
+    mock_config_class.return_value = mock_config
+    mock_load_generator.return_value = (Mock(), Mock())
+
+    engine = RAGEngine()
+
+    assert isinstance(engine.embedding_model, HashingEmbedder)
+    assert engine.config.EMBEDDING_MODEL == "test-model"
+    assert engine.embedding_model_name == engine.embedding_model.name
+    assert engine.query_cache.namespace == engine.embedding_model.name
+    assert engine.index is None
+    engine.retrieve_context("neural networks")
+    assert engine.index is not None
+
+
+def test_add_documents_chunks_long_documents():
+    long_doc = " ".join(f"w{i}" for i in range(10))
+    engine = _make_engine({})
+    engine.embedding_model = HashingEmbedder(dimension=32)
+    engine.config.CHUNK_TOKENS = 4
+    engine.config.CHUNK_OVERLAP = 2
+    engine.config.TOP_K_RETRIEVAL = 10
+
+    engine.add_documents(["short doc", long_doc])
+
+    assert engine.knowledge_base == [
+        "short doc",
+        "w0 w1 w2 w3",
+        "w2 w3 w4 w5",
+        "w4 w5 w6 w7",
+        "w6 w7 w8 w9",
+    ]
+    assert engine.chunk_sources[0] == (0, 0, 9)
+    assert engine.chunk_sources[1] == (1, 0, 11)
+    assert engine.index.ntotal == 5
+    sources = engine.chunk_sources
+    assert [long_doc[start:end] for _, start, end in sources[1:]] == (
+        engine.knowledge_base[1:]
+    )
+
+    # Overlapping chunks of one document are merged back into one passage
+    docs, scores = engine.retrieve_context_batch(["w1 w5"])[0]
+    assert long_doc in docs
+    assert len(docs) == len(scores) == 2
+
+    engine.config.CHUNK_MERGE = False
+    docs, _ = engine.retrieve_context_batch(["w1 w5"])[0]
+    assert "w0 w1 w2 w3" in docs
+
+
+def test_pack_prompt_keeps_question_within_budget():
+    engine = _make_engine({})
+    engine.tool_executor = Mock()
+    engine.tool_executor.get_available_tools.return_value = "tools"
+    fixed_cost = len(engine._build_prompt("", "what is ml").split())
+    engine.config.MAX_INPUT_TOKENS = fixed_cost + 13
+
+    prompt = engine._pack_prompt(
+        ["best passage here", "a very long second passage. It has two sentences."],
+        ["4"],
+        "what is ml",
+    )
+
+    assert "Question: what is ml" in prompt
+    assert "Tool result: 4" in prompt
+    assert "best passage here" in prompt
+    # Only the sentence that still fits is kept from the second passage
+    assert "It has two sentences." in prompt
+    assert "a very long second passage" not in prompt
+    assert len(prompt.split()) <= engine.config.MAX_INPUT_TOKENS
+
+
+def test_add_documents_skips_near_duplicates(capsys):
+    engine = _make_engine({})
+    engine.embedding_model = HashingEmbedder(dimension=32)
+    engine.deduplicator = NearDuplicateDetector(threshold=0.8)
+    movie = "Sci-Fi Movie: Arrival follows a linguist who talks to aliens."
+
+    engine.add_documents([movie, "Cosmos: Mars is the fourth planet.", movie])
+    assert "Skipped 1 of 3 documents as near-duplicates" in capsys.readouterr().out
+    engine.add_documents([movie])
+
+    assert engine.knowledge_base == [movie, "Cosmos: Mars is the fourth planet."]
+    assert engine.index.ntotal == 2
+    assert engine.num_documents == 2
+
+
+def _make_category_engine():
+    documents = [
+        "Cosmos: Mars is the red planet.",
+        "Sci-Fi Movie: Mars Attacks is a comedy.",
+        "Machine Learning - Overfitting: fitting noise.",
+    ]
+    vectors = {doc: [1.0, float(i)] for i, doc in enumerate(documents)}
+    vectors["mars"] = [1.0, 1.0]
+    vectors["mars planet"] = [1.0, 1.0]
+    engine = _make_engine(vectors)
+    engine.config.CHUNK_TOKENS = 0
+    engine.config.RETRIEVAL_MODE = "dense"
+    return engine, documents
+
+
+@pytest.mark.parametrize("partitioned", [False, True])
+def test_retrieve_context_with_filters(partitioned):
+    engine, documents = _make_category_engine()
+    engine.config.PARTITION_INDEX = partitioned
+    engine.add_documents(documents)
+
+    assert isinstance(engine.index, PartitionedIndex) == partitioned
+    assert engine.chunk_metadata[0]["category"] == "cosmos"
+    assert engine.retrieve_context("mars") == [documents[1]]
+    assert engine.retrieve_context("mars", {"category": "cosmos"}) == [documents[0]]
+    assert engine.retrieve_context("mars", {"source": "wikipedia"}) == [documents[2]]
+    # Filters that match nothing return nothing instead of other documents
+    assert engine.retrieve_context("mars", {"category": "missing"}) == []
+
+    engine.config.RETRIEVAL_MODE = "lexical"
+    assert engine.retrieve_context("mars", {"category": "scifi"}) == [documents[1]]
+
+
+def test_partition_router_restricts_queries_to_named_category():
+    engine, documents = _make_category_engine()
+    engine.config.PARTITION_INDEX = True
+    engine.add_documents(documents)
+
+    assert engine.retrieve_context("mars planet") == [documents[1]]
+    engine.config.PARTITION_ROUTER = True
+    assert engine.retrieve_context("mars planet") == [documents[0]]
+
+
+def test_partitions_train_on_the_whole_sample(capsys):
+    rng = np.random.default_rng(0)
+    prefixes = ["Cosmos: ", "Sci-Fi Movie: "]
+    documents = [f"{prefixes[i % 2]}doc{i}" for i in range(160)]
+    vectors = {doc: rng.random(8).tolist() for doc in documents}
+    vectors["nearest query"] = vectors[documents[41]]
+    engine = _make_engine(vectors)
+    engine.config.CHUNK_TOKENS = 0
+    engine.config.RETRIEVAL_MODE = "dense"
+    engine.config.PARTITION_INDEX = True
+    engine.config.INDEX_TYPE = "ivf"
+    engine.config.INDEX_NLIST = 2
+    engine.config.EMBED_BATCH_SIZE = 32
+
+    engine.add_documents(documents)
+
+    # Each partition holds 80 documents, enough for 2 lists, though no single
+    # embedding batch is
+    assert "too few" not in capsys.readouterr().out
+    assert all(
+        isinstance(index, faiss.IndexIVFFlat) for index in engine.index.sub_indexes()
+    )
+    assert engine.index.ntotal == 160
+    assert engine.retrieve_context("nearest query") == [documents[41]]
+
+
+def test_add_documents_streams_embedding_batches():
+    rng = np.random.default_rng(0)
+    documents = [f"doc{i}" for i in range(7)]
+    vectors = {doc: rng.random(4).tolist() for doc in documents}
+    vectors["query"] = vectors["doc5"]
+    engine = _make_engine(vectors)
+    engine.config.EMBED_BATCH_SIZE = 3
+
+    engine.add_documents(documents)
+
+    batches = [call.args[0] for call in engine.embedding_model.encode.call_args_list]
+    assert batches == [documents[:3], documents[3:6], documents[6:]]
+    assert engine.index.ntotal == 7
+    assert engine.retrieve_context("query") == ["doc5"]
+
+
+def test_add_documents_starts_encoding_workers_once():
+    documents = [f"doc{i}" for i in range(6)]
+    engine = _make_engine({doc: [1.0, float(i)] for i, doc in enumerate(documents)})
+    engine.config.KB_BATCH_SIZE = 2
+    engine.config.EMBED_BATCH_SIZE = 1
+    engine.config.EMBED_WORKERS = 2
+    model = engine.embedding_model
+    model.encode_multi_process.side_effect = lambda batch, pool, chunk_size: (
+        model.encode(batch)
+    )
+
+    engine.add_documents(documents)
+
+    # One worker pool serves all three knowledge base batches
+    model.start_multi_process_pool.assert_called_once_with(["cpu", "cpu"])
+    model.stop_multi_process_pool.assert_called_once()
+    assert model.encode_multi_process.call_count == 6
+    assert engine.index.ntotal == 6
+
+
+def test_load_knowledge_base_streams_jsonl(tmp_path):
+    documents = [f"doc{i}" for i in range(5)]
+    vectors = {doc: [1.0, float(i)] for i, doc in enumerate(documents)}
+    vectors["query"] = vectors["doc3"]
+    (tmp_path / "kb.jsonl").write_text(
+        "\n".join(json.dumps(doc) for doc in documents) + "\n"
+    )
+    engine = _make_engine(vectors)
+    engine.config.DATASET_DIR = str(tmp_path)
+    engine.config.KNOWLEDGE_BASE_FILE = "kb.jsonl"
+    engine.config.INDEX_SNAPSHOT = False
+    engine.config.KB_BATCH_SIZE = 2
+
+    engine.load_knowledge_base()
+
+    batches = [call.args[0] for call in engine.embedding_model.encode.call_args_list]
+    assert batches == [documents[:2], documents[2:4], documents[4:]]
+    assert engine.knowledge_base == documents
+    assert engine.index.ntotal == 5
+    assert engine.retrieve_context("query") == ["doc3"]
+
+
+def test_add_documents_accepts_a_stream():
+    vectors = {"doc1": [1.0, 0.0], "doc2": [0.0, 1.0], "query": [0.1, 0.9]}
+    engine = _make_engine(vectors)
+    engine.config.KB_BATCH_SIZE = 1
+
+    engine.add_documents(doc for doc in ["doc1", "doc2"])
+
+    assert engine.knowledge_base == ["doc1", "doc2"]
+    assert engine.index.ntotal == 2
+    assert engine.retrieve_context("query") == ["doc2"]
+
+
+def test_add_documents_with_int8_storage():
+    rng = np.random.default_rng(0)
+    documents = [f"doc{i}" for i in range(50)]
+    vectors = {doc: rng.random(8).tolist() for doc in documents}
+    vectors["query"] = vectors["doc17"]
+    engine = _make_engine(vectors)
+    engine.config.INDEX_STORAGE = "int8"
+    engine.config.EMBED_BATCH_SIZE = 16
+
+    engine.add_documents(documents)
+
+    assert isinstance(engine.index, faiss.IndexScalarQuantizer)
+    assert engine.index.ntotal == 50
+    assert engine.retrieve_context("query") == ["doc17"]
+
+
+def test_generate_response_reuses_answers_to_similar_queries():
+    engine = _make_engine(
+        {
+            "doc1": [1.0, 0.0],
+            "doc2": [0.0, 1.0],
+            "what is ml": [1.0, 0.0],
+            "what's ml": [0.99, 0.05],
+            "what is two times two": [0.0, 1.0],
+        }
+    )
+    engine.add_documents(["doc1"])
+    engine.config.MAX_ITERATIONS = 1
+    engine.config.MAX_LENGTH = 50
+    engine.config.GENERATION_BATCH_SIZE = 8
+    engine.config.MAX_INPUT_TOKENS = 512
+    engine.tool_executor = Mock()
+    engine.tool_executor.get_available_tools.return_value = "tools"
+    engine.tokenizer = Mock(side_effect=_tokenize)
+    engine.tokenizer.encode.side_effect = lambda text, **kwargs: text.split()
+    engine.generator = Mock()
+    engine.tokenizer.batch_decode.side_effect = [
+        ["Machine learning learns from data"],
+        ["Two times two is four"],
+        ["Machine learning is statistics at scale"],
+    ]
+
+    assert engine.generate_response("what is ml") == (
+        "Machine learning learns from data"
+    )
+    engine.retrieve_context_batch = Mock(wraps=engine.retrieve_context_batch)
+
+    # A paraphrase is answered from the cache without retrieval or generation
+    assert engine.generate_response("what's ml") == (
+        "Machine learning learns from data"
+    )
+    engine.retrieve_context_batch.assert_not_called()
+    assert engine.generator.generate.call_count == 1
+
+    # An unrelated query still runs the full pipeline
+    assert engine.generate_response("what is two times two") == (
+        "Two times two is four"
+    )
+
+    # Changing the knowledge base invalidates cached answers
+    engine.add_documents(["doc2"])
+    assert len(engine.response_cache) == 0
+    assert engine.generate_response("what's ml") == (
+        "Machine learning is statistics at scale"
+    )
+
+
+@pytest.mark.parametrize(
+    "decoding, expected",
+    [
+        ("sample", {"do_sample": True, "temperature": 0.7}),
+        ("greedy", {"do_sample": False, "num_beams": 1}),
+        ("beam", {"do_sample": False, "num_beams": 4}),
+    ],
+)
+def test_decode_params(decoding, expected):
+    engine = _make_engine({})
+    engine.config.DECODING = decoding
+    engine.config.MAX_LENGTH = 50
+    params = engine._decode_params()
+    assert params["max_length"] == 50
+    assert expected.items() <= params.items()
+
+
+def test_deterministic_decoding_uses_exact_cache(tmp_path):
+    engine = _make_engine({"doc1": [1.0, 0.0], "what is ml": [1.0, 0.0]})
+    engine.add_documents(["doc1"])
+    engine.response_cache = SemanticResponseCache(max_size=0)
+    engine.exact_cache = ExactResponseCache(cache_file=tmp_path / "responses.jsonl")
+    engine.config.DECODING = "greedy"
+    engine.config.MAX_ITERATIONS = 1
+    engine.config.MAX_LENGTH = 50
+    engine.config.GENERATION_BATCH_SIZE = 8
+    engine.config.MAX_INPUT_TOKENS = 512
+    engine.config.GENERATOR_MODEL = "test-gen"
+    engine.tool_executor = Mock()
+    engine.tool_executor.get_available_tools.return_value = "tools"
+    engine.tokenizer = Mock(side_effect=_tokenize)
+    engine.tokenizer.encode.side_effect = lambda text, **kwargs: text.split()
+    engine.generator = Mock()
+    engine.tokenizer.batch_decode.return_value = ["Machine learning learns from data"]
+
+    assert engine.generate_response("what is ml") == (
+        "Machine learning learns from data"
+    )
+    assert engine.generate_response("  What is ML ") == (
+        "Machine learning learns from data"
+    )
+    assert engine.generator.generate.call_count == 1
+    assert engine.generator.generate.call_args.kwargs["do_sample"] is False
+
+    # The cache is persisted and reloaded
+    assert len(ExactResponseCache(cache_file=tmp_path / "responses.jsonl")) == 1
+
+
+def test_agent_loop_reuses_encoder_states():
+    torch = pytest.importorskip("torch")
+
+    def tokenize(texts, **kwargs):
+        rows = [[len(word) for word in text.split()] for text in texts]
+        length = max(len(row) for row in rows)
+        padding = [[0] * (length - len(row)) for row in rows]
+        return {
+            "input_ids": torch.tensor([row + pad for row, pad in zip(rows, padding)]),
+            "attention_mask": torch.tensor(
+                [[1] * len(row) + pad for row, pad in zip(rows, padding)]
+            ),
+        }
+
+    def encode(input_ids, attention_mask):
+        return Mock(last_hidden_state=input_ids.unsqueeze(-1).float())
+
+    engine = _make_engine({"doc1": [1.0, 0.0], "what is two times two": [1.0, 0.0]})
+    engine.add_documents(["doc1"])
+    engine.config.ENCODER_REUSE = True
+    engine.config.MAX_ITERATIONS = 2
+    engine.config.MAX_LENGTH = 50
+    engine.config.GENERATION_BATCH_SIZE = 8
+    engine.config.MAX_INPUT_TOKENS = 512
+    engine.tool_executor = Mock()
+    engine.tool_executor.get_available_tools.return_value = "tools"
+    engine.tool_executor.execute_tool.return_value = "Result: 4"
+    engine.tokenizer = Mock(side_effect=tokenize)
+    engine.tokenizer.encode.side_effect = lambda text, **kwargs: text.split()
+    engine.tokenizer.batch_decode.side_effect = [
+        ["CALC: 2*2"],
+        ["The answer is four"],
+    ]
+    engine.generator = Mock()
+    engine.generator.get_encoder.return_value = Mock(side_effect=encode)
+
+    assert engine.generate_response("what is two times two") == "The answer is four"
+
+    # The prompt is encoded once; the second step only encodes the tool result
+    encoded_texts = [call.args[0] for call in engine.tokenizer.call_args_list]
+    assert len(encoded_texts) == 2
+    assert encoded_texts[0][0] == RAGEngine.CONTEXT_LABEL
+    assert encoded_texts[1] == ["Tool result: Result: 4"]
+
+    # The tool result's states go right after the context label's
+    first, second = [
+        call.kwargs["encoder_outputs"].last_hidden_state
+        for call in engine.generator.generate.call_args_list
+    ]
+    assert second.shape[1] == first.shape[1] + 4
+    assert torch.equal(second[0, :2], first[0, :2])
+    assert torch.equal(second[0, 6:], first[0, 2:])
+
+
+def test_prompt_segments_fit_the_input_budget():
+    engine = _make_engine({})
+    engine.tool_executor = Mock()
+    engine.tool_executor.get_available_tools.return_value = "tools"
+    engine.tokenizer = Mock()
+    engine.tokenizer.encode.side_effect = lambda text, **kwargs: text.split()
+    query = "what is two times two"
+    empty_prompt = engine._build_prompt("", query)
+    engine.config.MAX_INPUT_TOKENS = engine._count_tokens(empty_prompt) + 5
+
+    segments = engine._prompt_segments(["one two three"], [], query)
+    assert segments[0] == RAGEngine.CONTEXT_LABEL
+    assert segments[1].startswith("one two three")
+
+    # The tool result leaves no room for the passage
+    segments = engine._prompt_segments(["one two three"], ["four"], query)
+    assert segments == [
+        RAGEngine.CONTEXT_LABEL,
+        "Tool result: four",
+        empty_prompt[len(RAGEngine.CONTEXT_LABEL) + 1 :],
+    ]
+    total = sum(engine._count_tokens(segment) for segment in segments)
+    assert total <= engine.config.MAX_INPUT_TOKENS
+
+
+def test_generate_response_stream_yields_pieces_after_tool_call():
+    engine = _make_engine({"doc1": [1.0, 0.0], "what is two times two": [1.0, 0.0]})
+    engine.add_documents(["doc1"])
+    engine.config.MAX_ITERATIONS = 2
+    engine.config.MAX_INPUT_TOKENS = 512
+    engine.tool_executor = Mock()
+    engine.tool_executor.get_available_tools.return_value = "tools"
+    engine.tool_executor.execute_tool.return_value = "Result: 4"
+    engine.tokenizer = Mock()
+    engine.tokenizer.encode.side_effect = lambda text, **kwargs: text.split()
+    engine.generator = Mock()
+    engine._stream_generate = Mock(
+        side_effect=[
+            iter(["CA", "LC: 2*2"]),
+            iter(["The ", "answer ", "is ", "four", "."]),
+        ]
+    )
+
+    pieces = list(engine.generate_response_stream("what is two times two"))
+
+    # Tool commands are never shown; the answer streams once it is 3 words long
+    assert pieces == ["The answer is ", "four", "."]
+    engine.tool_executor.execute_tool.assert_called_once_with("CALC: 2*2")
+    second_prompt = engine.tokenizer.call_args_list[1].args[0]
+    assert "Result: 4" in second_prompt
+
+
+def test_generate_response_stream_short_answer_and_shortcuts():
+    engine = _make_engine({"doc1": [1.0, 0.0], "what is ml": [1.0, 0.0]})
+    engine.add_documents(["doc1"])
+    engine.config.MAX_ITERATIONS = 1
+    engine.config.MAX_INPUT_TOKENS = 512
+    engine.tool_executor = Mock()
+    engine.tool_executor.get_available_tools.return_value = "tools"
+    engine.tokenizer = Mock()
+    engine.tokenizer.encode.side_effect = lambda text, **kwargs: text.split()
+    engine.generator = Mock()
+    engine._stream_generate = Mock(return_value=iter(["ok"]))
+
+    assert list(engine.generate_response_stream("what is ml")) == [
+        RAGEngine.FALLBACK_RESPONSE
+    ]
+    (greeting,) = engine.generate_response_stream("hello there")
+    assert greeting.startswith("Hello!")
+
+
+def test_streamed_and_batched_answers_share_the_caches():
+    engine = _make_engine({"doc1": [1.0, 0.0], "what is ml": [1.0, 0.0]})
+    engine.add_documents(["doc1"])
+    engine.response_cache = SemanticResponseCache(max_size=0)
+    engine.config.DECODING = "greedy"
+    engine.config.MAX_ITERATIONS = 1
+    engine.config.MAX_LENGTH = 50
+    engine.config.MAX_INPUT_TOKENS = 512
+    engine.config.GENERATOR_MODEL = "test-gen"
+    engine.tool_executor = Mock()
+    engine.tool_executor.get_available_tools.return_value = "tools"
+    engine.tokenizer = Mock(side_effect=_tokenize)
+    engine.tokenizer.encode.side_effect = lambda text, **kwargs: text.split()
+    engine.generator = Mock()
+    engine._stream_generate = Mock(
+        return_value=iter(["Machine ", "learning ", "rocks"])
+    )
+
+    assert "".join(engine.generate_response_stream("what is ml")) == (
+        "Machine learning rocks"
+    )
+    assert engine.generate_response("What is ML") == "Machine learning rocks"
+    assert list(engine.generate_response_stream("what is ml")) == [
+        "Machine learning rocks"
+    ]
+    engine._stream_generate.assert_called_once()
+    engine.generator.generate.assert_not_called()
+
+
+def test_backend_and_precision_qualify_cache_keys():
+    engine = _make_engine({})
+    assert engine._model_key("gen") == "gen"
+    engine.model_precision = "int8"
+    assert engine._model_key("gen") == "gen:int8"
+    engine.inference_backend = "onnx"
+    engine.model_precision = "float32"
+    assert engine._model_key("gen") == "gen:onnx"
@@ -0,0 +1,129 @@
+"""
+Unit tests for response_cache.py
+"""
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+import numpy as np  # noqa: E402
+
+from src.rag.response_cache import (  # noqa: E402
+    ExactResponseCache,
+    SemanticResponseCache,
+)
+
+
+def test_similar_queries_hit():
+    cache = SemanticResponseCache(max_size=4, threshold=0.95)
+    assert cache.get(np.array([1.0, 0.0])) is None
+
+    cache.put(np.array([2.0, 0.0]), "answer")
+    # Similarity is cosine, so the scale of the embedding does not matter
+    assert cache.get(np.array([0.5, 0.01])) == "answer"
+    assert cache.get(np.array([1.0, 1.0])) is None
+    assert cache.get_batch(np.array([[1.0, 0.0], [0.0, 1.0]])) == ["answer", None]
+    assert cache.stats()["hits"] == 2
+
+
+def test_evicts_least_recently_used():
+    cache = SemanticResponseCache(max_size=2, threshold=0.99)
+    cache.put(np.array([1.0, 0.0, 0.0]), "x")
+    cache.put(np.array([0.0, 1.0, 0.0]), "y")
+    assert cache.get(np.array([1.0, 0.0, 0.0])) == "x"
+
+    cache.put(np.array([0.0, 0.0, 1.0]), "z")
+
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+    assert cache.get(np.array([0.0, 1.0, 0.0])) is None
+    assert cache.get(np.array([1.0, 0.0, 0.0])) == "x"
+    assert cache.get(np.array([0.0, 0.0, 1.0])) == "z"
+
+
+def test_clear_and_disabled_cache():
+    cache = SemanticResponseCache()
+    cache.put(np.array([1.0, 0.0]), "answer")
+    cache.clear()
+    assert cache.get(np.array([1.0, 0.0])) is None
+
+    disabled = SemanticResponseCache(max_size=0)
+    disabled.put(np.array([1.0, 0.0]), "answer")
+    assert disabled.get(np.array([1.0, 0.0])) is None
+    assert len(disabled) == 0
+
+
+def test_dimension_change_resets_cache():
+    cache = SemanticResponseCache()
+    cache.put(np.array([1.0, 0.0]), "two")
+    assert cache.get(np.array([1.0, 0.0, 0.0])) is None
+    cache.put(np.array([1.0, 0.0, 0.0]), "three")
+    assert cache.get(np.array([1.0, 0.0, 0.0])) == "three"
+    assert len(cache) == 1
+
+
+def test_exact_cache_key_covers_inputs():
+    key = ExactResponseCache.make_key("What is ML?", ["doc"], "m", {"num_beams": 1})
+    assert key == ExactResponseCache.make_key(
+        " what is  ml? ", ["doc"], "m", {"num_beams": 1}
+    )
+    assert key != ExactResponseCache.make_key("What is ML?", ["other"], "m", {})
+    assert key != ExactResponseCache.make_key(
+        "What is ML?", ["doc"], "m", {"num_beams": 4}
+    )
+    assert key != ExactResponseCache.make_key(
+        "What is ML?", ["doc"], "other", {"num_beams": 1}
+    )
+
+
+def test_exact_cache_evicts_and_persists(tmp_path):
+    cache_file = tmp_path / "responses.jsonl"
+    cache = ExactResponseCache(max_size=2, cache_file=cache_file)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    reloaded = ExactResponseCache(max_size=2, cache_file=cache_file)
+    assert reloaded.get("a") == "1"
+    assert reloaded.get("c") == "3"
+
+    reloaded.clear()
+    assert len(ExactResponseCache(cache_file=cache_file)) == 0
+
+
+def test_exact_cache_appends_and_compacts_its_log(tmp_path):
+    cache_file = tmp_path / "responses.jsonl"
+    cache = ExactResponseCache(max_size=2, cache_file=cache_file)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.put("c", "3")  # evicts "a"
+    assert cache_file.read_text().splitlines() == [
+        '["a", "1"]',
+        '["b", "2"]',
+        '["c", "3"]',
+        '["a", null]',
+    ]
+
+    for i in range(10):
+        cache.put(f"k{i}", str(i))
+    records = cache_file.read_text().splitlines()
+    assert len(records) <= ExactResponseCache.COMPACT_FACTOR * cache.max_size
+    reloaded = ExactResponseCache(max_size=2, cache_file=cache_file)
+    assert reloaded.get("k8") == "8" and reloaded.get("k9") == "9"
+    assert len(reloaded) == 2
+
+
+def test_exact_cache_skips_a_truncated_record(tmp_path, capsys):
+    cache_file = tmp_path / "responses.jsonl"
+    cache_file.write_text('["a", "1"]\n["b", "2')
+    cache = ExactResponseCache(cache_file=cache_file)
+    assert "Skipped 1 unreadable" in capsys.readouterr().out
+    assert cache.get("a") == "1" and cache.get("b") is None
+
+    cache.put("c", "3")
+    reloaded = ExactResponseCache(cache_file=cache_file)
+    assert reloaded.get("a") == "1" and reloaded.get("c") == "3"
@@ -0,0 +1,115 @@
+"""
+Unit tests for server.py
+"""
+
+import socket
+import threading
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+from src.rag.server import (  # noqa: E402
+    QueryServer,
+    connect,
+    parse_address,
+    stream_response,
+)
+
+
+class FakeEngine:
+    """Streams the query back in two pieces, or fails on 'boom'"""
+
+    def __init__(self):
+        self.queries = []
+
+    def generate_response_stream(self, query):
+        self.queries.append(query)
+        if query == "boom":
+            raise ValueError("generation failed")
+        yield "Answer to "
+        yield query
+
+
+@pytest.fixture(params=["unix", "tcp"])
+def server(request, tmp_path):
+    if request.param == "unix":
+        if not hasattr(socket, "AF_UNIX"):
+            pytest.skip("Unix sockets not supported")
+        address = str(tmp_path / "run" / "rag.sock")
+    else:
+        address = "127.0.0.1:0"
+    query_server = QueryServer(FakeEngine(), address)
+    thread = threading.Thread(target=query_server.serve_forever, daemon=True)
+    thread.start()
+    yield query_server
+    query_server.shutdown()
+    thread.join()
+
+
+def test_parse_address():
+    assert parse_address("localhost:8765") == ("localhost", 8765)
+    assert parse_address("127.0.0.1:8765") == ("127.0.0.1", 8765)
+    assert parse_address("[::1]:8765") == ("::1", 8765)
+    assert parse_address("/tmp/rag.sock") == "/tmp/rag.sock"
+
+
+@pytest.mark.parametrize(
+    "address", ["0.0.0.0:9000", "192.168.1.20:9000", "example.com:80", "[::]:9000"]
+)
+def test_parse_address_rejects_non_loopback_hosts(address):
+    with pytest.raises(ValueError, match="not on localhost"):
+        parse_address(address)
+    with pytest.raises(ValueError):
+        QueryServer(FakeEngine(), address)
+
+
+def test_query_round_trip(server):
+    sock = connect(server.server_address)
+    assert sock is not None
+    assert list(stream_response(sock, "what is ml")) == ["Answer to ", "what is ml"]
+    assert server.engine.queries == ["what is ml"]
+
+
+def test_server_errors_are_raised(server):
+    sock = connect(server.server_address)
+    with pytest.raises(RuntimeError, match="generation failed"):
+        list(stream_response(sock, "boom"))
+    # The server keeps answering after a failed query
+    sock = connect(server.server_address)
+    assert "".join(stream_response(sock, "again")) == "Answer to again"
+
+
+def test_connect_without_server(tmp_path):
+    assert connect(str(tmp_path / "missing.sock")) is None
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+    assert connect(f"127.0.0.1:{port}") is None
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_stale_socket_is_replaced(tmp_path):
+    path = tmp_path / "rag.sock"
+    with socket.socket(socket.AF_UNIX) as stale:
+        stale.bind(str(path))
+    assert path.exists()
+
+    query_server = QueryServer(FakeEngine(), str(path))
+    thread = threading.Thread(target=query_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(OSError, match="already running"):
+            QueryServer(FakeEngine(), str(path))
+    finally:
+        query_server.shutdown()
+        thread.join()
+    assert not path.exists()
+
+
+def test_existing_file_is_not_replaced(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("keep me")
+    with pytest.raises(OSError, match="not a socket"):
+        QueryServer(FakeEngine(), str(path))
+    assert path.read_text() == "keep me"
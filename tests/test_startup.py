@@ -0,0 +1,61 @@
+"""
+Start-up tests: the CLI must not import the engine's heavy dependencies
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("faiss", "numpy", "sentence_transformers", "torch", "transformers")
+
+
+def _loaded_modules(code):
+    """Top-level modules imported by running code in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", f"{code}\nimport sys\nprint(' '.join(sys.modules))"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return {name.split(".")[0] for name in result.stdout.split()}
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["--version"]])
+def test_help_and_version_stay_light(argv):
+    code = (
+        "import contextlib, io\n"
+        "from src.rag import main\n"
+        "with contextlib.suppress(SystemExit), "
+        "contextlib.redirect_stdout(io.StringIO()):\n"
+        f"    main({argv!r})"
+    )
+    loaded = _loaded_modules(code)
+    assert not loaded & set(HEAVY_MODULES)
+    assert "subprocess" not in loaded
+
+
+def test_version_resolves_on_first_access(monkeypatch):
+    monkeypatch.setenv("RAG_VERSION", "9.9.9")
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import src.rag, src.rag.__version__; print(src.rag.__version__)",
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "9.9.9"
+
+
+def test_engine_import_defers_index_libraries():
+    loaded = _loaded_modules("import src.rag.rag_engine")
+    assert not loaded & set(HEAVY_MODULES) - {"numpy"}